@@ -16,6 +16,10 @@ This version is set up, as far as the Python paths are concerned, to the particu
 
    If running at W3C, a specific, local script is also invoked via :py:func:`uri_test` (see :py:func:`~rdfa_md.__init__.brett_test`)
 
+.. py:data:: cache_dir
+
+   The directory of the caches and of the state shared by the processes (see :py:mod:`~rdfa_md.pyrdfa.cachedir`)
+
 
 **Global functions:**
 """
@@ -32,18 +36,19 @@ import sys, os
 if sys.platform == "darwin" :
 	# this is my local machine
 	sys.path.insert(0,"/Users/ivan/Library/Python")
-	os.environ['PyRdfaCacheDir'] = '/Users/ivan/.pyrdfa-cache'
+	cache_dir      = '/Users/ivan/.pyrdfa-cache'
 	running_at_w3c = False
 	cgitb.enable()
 else :
 	# this is the server on W3C
 	sys.path.insert(0,"/usr/local/lib/python2.4/site-packages/PythonLib-IH")
 	sys.path.insert(0,"/usr/local/lib/python2.4/site-packages/PythonLib-IH/rdfa-1.1")
-	os.environ['PyRdfaCacheDir'] = '/usr/local/apache/cgi/cgi-bin-other/RDFa/data-local'
+	cache_dir      = '/usr/local/apache/cgi/cgi-bin-other/RDFa/data-local'
 	running_at_w3c = True
 	cgitb.enable(display=0, logdir="/home/nobody/tracebacks/")
 
-from rdfa_md import extract_microdata, err_message, brett_test
+from rdfa_md import extract_microdata, err_message, brett_test, page_from_cursor, write_response, admitted, request_class, metrics_response, SafetyCheck, set_cache_directory
+set_cache_directory(cache_dir)
 
 
 def uri_test(uri) :
@@ -62,11 +67,24 @@ def process_input(form):
 	:param form: keyword arguments of the HTTP call
 	:type form: cgi.FieldStorage
 
-	If the uri is fine, the script calls out to :py:func:`~rdfa_md.mdata.extract_microdata`. That function is also responsible to “respond”, i.e., to print the HTTP response to the standard output.
+	If the uri is fine, the script calls out to :py:func:`~rdfa_md.mdata.extract_microdata`. That function is also responsible to “respond”, i.e., to produce the HTTP response, which is written to the standard output (compressed, if the client accepts it) via :py:func:`~rdfa_md.compression.write_response`.
+
+	If the form includes a ``cursor`` key, the corresponding page of a stored result is returned instead (see :py:func:`~rdfa_md.pages.page_from_cursor`).
+
+	The processing is subject to the admission control and priority scheduling of :py:mod:`~rdfa_md.admission` (the validator and the requests from the forms of the service take precedence over the bulk requests), i.e., the response may also be a ``503`` if the host is overloaded. If the form includes a ``metrics`` key, the metrics of the admission control are returned instead, provided the client is allowed to get them (see :py:data:`~rdfa_md.admission.metrics_clients`).
 
 	This function also takes care of an HTTP_REFERER header, leading to a 307 response (triggering the client to re-issue the call with a proper URI).
 	"""
 
+	if "metrics" in form :
+		write_response( metrics_response() )
+		return
+
+	# Subsequent pages of a stored result do not need any source
+	if "cursor" in form :
+		write_response( admitted(request_class(form), lambda: page_from_cursor(form)) )
+		return
+
 	uri = ""
 	# The 'uri' term is modified to be turned into a 'fake' value to denote the upload and text cases.
 	if "uploaded" in form and form["uploaded"].file :
@@ -122,10 +140,17 @@ def process_input(form):
 			print("")
 		else :
 			# last point of check: use Brett's script to check the validity of the URI
+			# The check runs while the request waits for admission, but the source is retrieved only if it passed
 			# Note that if the test reveals any problems, the script returns a message and exists
-			if not (uri == 'text:' or uri == 'uploaded:') : uri_test(uri)
+			check = SafetyCheck(uri) if running_at_w3c and not (uri == 'text:' or uri == 'uploaded:') else None
+
+			def process() :
+				if check is not None and not check.passed() :
+					err_message(uri, check.message)
+					sys.exit(1)
+				return extract_microdata(uri, form)
 
-			print( extract_microdata(uri, form) )
+			write_response( admitted(request_class(form), process) )
 	except Exception as e :
 		l = len(e.args)
 		msg = "" if l == 0 else (e.args[0] if l == 1 else repr(e.args))
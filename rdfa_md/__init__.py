@@ -24,7 +24,12 @@ else :
 
 from .rdfa  import extract_rdf, validate_rdfa
 from .mdata import extract_microdata
-import traceback, cgi
+from .pages import page_from_cursor
+from .compression import write_response
+from .admission import admitted, request_class, metrics_response
+from .urlsafety import SafetyCheck
+from .pyrdfa.cachedir import set_cache_directory, using_cache_directory
+import traceback
 
 
 #########################################################################################
@@ -69,29 +74,10 @@ def brett_test(uri):
 
 	If the the test does not pass, ie an exception is raised somewhere down the line, an error message is sent back (via HTTP) to the caller.
 
-	Contributed by Brett Smith, W3C, and relying on an external library (``check_url_safety``) running at the W3C. *This method runs only on the W3C site and its invocation must be preceded by an appropriate check*.
+	Contributed by Brett Smith, W3C, and relying on an external library (``check_url_safety``) running at the W3C. *This method runs only on the W3C site and its invocation must be preceded by an appropriate check*. The results of the check are cached per host (see :py:mod:`~.urlsafety`).
 	"""
-	from checkremote import check_url_safety, UnsupportedResourceError
-	if PY3:
-		from urllib.error import HTTPError, URLError
-	else:
-		from urllib2 import HTTPError, URLError
-	try:
-		check_url_safety(uri)
-		# If we got here, there have been no issues; Brett's script simply raises exceptions
-		return True
-	except HTTPError as e:
-		err_message(uri, 'HTTP Error with the error code: %s and the error message: "%s"' (e.code, e.reason))
-	except URLError as e:
-		err_message(uri, 'URL Error with the error message: "%s"' % e.reason)
-	except UnsupportedResourceError as e:
-		msg = e.args[0] + ": " + e.args[1]
-		err_message(uri, 'Unsupported Resource Error with the error message "%s"' % msg)
-	except Exception as e:
-		args = len(e.args)
-		msg = "" if args == 0 else (e.args[0] if args == 1 else repr(e.args))
-		err_message(uri, 'Exception raised: "%s"' % msg)
-
-	# If we got here one of the exceptions were handled, ie, the result of the check
-	# is False...
-	return False
+	check = SafetyCheck(uri, start = False)
+	if not check.passed():
+		err_message(uri, check.message)
+		return False
+	return True
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Command line entry point of the package (``python -m rdfa_md``); see :py:mod:`~.bulk`.
+"""
+import sys
+from .bulk import main
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Admission control and priority scheduling for the services: a limit on the number of requests processed at the same time, bounded queues of waiting requests, and fast ``503 Service Unavailable`` responses (with a ``Retry-After`` header) when the host is overloaded.
+
+The requests are classified (see :py:func:`request_class`) into priority classes, listed in :py:data:`priorities` from the highest to the lowest priority:
+
+- ``validator``: the (interactive) use of the validator;
+- ``interactive``: extraction requests coming from the forms of the service, i.e., with a ``Referer`` header listed in :py:data:`interactive_referers`;
+- ``bulk``: all the other requests, typically issued by scripts, crawlers, or other services.
+
+The ``User-Agent`` header is not used for the classification: most crawlers and HTTP libraries send a browser-like value.
+
+Each CGI invocation is a separate process, i.e., the limits are enforced through files shared by all the processes on the host (in the ``admission`` subdirectory of the cache directory, see :py:mod:`~.pyrdfa.cachedir`). A slot is a lock file, taken by holding an exclusive (``fcntl``) lock on it; the operating system releases the lock even if the process dies. The scheduling is as follows:
+
+- a request first takes a slot in the queue of its class (each class has :py:data:`max_queued` queue slots); if all of them are taken, the request is rejected right away;
+- while holding its queue slot, the request tries to get a slot of its class (the share of the class, see :py:data:`class_shares`) and one of the :py:data:`max_running` slots shared by all classes; a request does not take a shared slot while a request of a higher priority class is waiting for one (strict priority); a request waiting because the share of its own class is full does not count, i.e., it does not hold back the lower classes. If it does not succeed before the timeout of its class (see :py:data:`queue_timeouts`), the request is rejected; otherwise it releases its queue slot and is processed.
+
+The shares bound the number of shared slots a class can use; e.g., with the default values, the validator and interactive requests together may use at most 5 of the 6 shared slots, i.e., the bulk requests are never starved, while the bulk requests can never use more than 4 slots, i.e., some slots are always left for the interactive requests.
+
+The number of admitted and rejected requests (per class and per reason) and histograms of the latency of the admitted requests (per class, including the waiting time) are collected in a shared file; these, as well as the number of running and waiting requests, are available via :py:func:`metrics` and, in the Prometheus text format, via :py:func:`metrics_response` (to the clients listed in :py:data:`metrics_clients` only).
+
+The admission control relies on ``fcntl``; if it is not available (e.g., on Windows), all requests are admitted.
+
+**Module constants:**
+
+.. py:data:: priorities
+
+   The request classes, from the highest to the lowest priority
+
+.. py:data:: max_running
+
+   The maximum number of requests processed at the same time
+
+.. py:data:: class_shares
+
+   Dictionary from the request classes to the maximum number of requests of that class processed at the same time
+
+.. py:data:: max_queued
+
+   The maximum number of requests of a class waiting for processing
+
+.. py:data:: queue_timeouts
+
+   Dictionary from the request classes to the maximum time (in seconds) a request of that class may wait for processing
+
+.. py:data:: retry_after
+
+   The value of the ``Retry-After`` header of the rejections, in seconds
+
+.. py:data:: latency_buckets
+
+   The upper bounds (in seconds) of the buckets of the latency histograms
+
+.. py:data:: interactive_referers
+
+   The prefixes of the ``Referer`` headers of the interactive requests, i.e., the addresses of the forms of the services
+
+.. py:data:: metrics_clients
+
+   The addresses of the clients that may get the metrics; an empty list means that the metrics are not available over HTTP
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+import os
+import json
+import time
+import random
+
+from .pyrdfa.cachedir import cache_directory
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+priorities      = ("validator", "interactive", "bulk")
+max_running     = 6
+class_shares    = {
+	"validator"   : 2,
+	"interactive" : 3,
+	"bulk"        : 4,
+}
+max_queued      = 16
+queue_timeouts  = {
+	"validator"   : 20,
+	"interactive" : 10,
+	"bulk"        : 5,
+}
+retry_after     = 10
+latency_buckets = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+interactive_referers = (
+	"http://www.w3.org/2012/pyRdfa/", "https://www.w3.org/2012/pyRdfa/",
+	"http://www.w3.org/2012/pyMicrodata/", "https://www.w3.org/2012/pyMicrodata/",
+)
+metrics_clients = ("127.0.0.1", "::1")
+
+# Interval, in seconds, between two attempts to get a run slot
+_poll_interval = 0.05
+
+
+class Overloaded(Exception):
+	"""
+	Raised when a request is rejected.
+
+	:param str reason: ``queue_full`` or ``timeout``
+	"""
+	def __init__(self, reason):
+		self.reason = reason
+		Exception.__init__(self, "Service overloaded (%s)" % reason)
+
+	def response(self):
+		"""
+		The HTTP response of the rejection.
+
+		:rtype: str
+		"""
+		return ('Content-Type: text/plain; charset=utf-8\nStatus: 503 Service Unavailable\nRetry-After: %d\n\n'
+				'The service is overloaded, please try again later.\n' % retry_after)
+
+
+def request_class(form, environ = None):
+	"""
+	Classify a request.
+
+	:param cgi.FieldStorage form: the query parameters of the request
+	:param dict environ: the CGI variables of the request (i.e., its headers); if ``None``, the environment of the process is used
+	:return: ``validator`` if the validator is used, ``interactive`` if the request comes from the forms of the service (i.e., its ``Referer`` header starts with one of :py:data:`interactive_referers`), ``bulk`` otherwise
+	:rtype: str
+	"""
+	if "validate" in form:
+		return "validator"
+	environ = environ if environ is not None else os.environ
+	if environ.get("HTTP_REFERER", "").startswith(tuple(interactive_referers)):
+		return "interactive"
+	return "bulk"
+
+
+def _directory():
+	return cache_directory("admission")
+
+
+def _slot_path(directory, prefix, i):
+	return os.path.join(directory, "%s-%d.lock" % (prefix, i))
+
+
+def _try_slot(directory, prefix, count):
+	"""
+	Try to take one of the slots with a prefix.
+
+	:return: the open file of the slot (holding the lock), or ``None`` if all the slots are taken
+	"""
+	for i in random.sample(range(count), count):
+		slot = open(_slot_path(directory, prefix, i), "a")
+		try:
+			fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+			return slot
+		except (IOError, OSError):
+			slot.close()
+	return None
+
+
+def _is_taken(path):
+	with open(path, "a") as slot:
+		try:
+			fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+			fcntl.flock(slot, fcntl.LOCK_UN)
+			return False
+		except (IOError, OSError):
+			return True
+
+
+def _taken(directory, prefix, count):
+	"""The number of slots with a prefix taken by some process"""
+	return len([i for i in range(count) if _is_taken(_slot_path(directory, prefix, i))])
+
+
+def _higher_waiting(directory, request_class):
+	"""Check whether a request of a class with a higher priority is waiting for a shared slot, i.e., it is queued while the share of its class is not full"""
+	for higher in priorities[:priorities.index(request_class)]:
+		if _taken(directory, "run-" + higher, class_shares[higher]) >= class_shares[higher]:
+			continue
+		for i in range(max_queued):
+			if _is_taken(_slot_path(directory, "queue-" + higher, i)):
+				return True
+	return False
+
+
+def _try_run(directory, request_class):
+	"""
+	Try to take a slot of the class and a shared slot.
+
+	:return: the open files of the two slots, or ``None``
+	"""
+	own = _try_slot(directory, "run-" + request_class, class_shares[request_class])
+	if own is None:
+		return None
+	if not _higher_waiting(directory, request_class):
+		shared = _try_slot(directory, "run", max_running)
+		if shared is not None:
+			return (own, shared)
+	own.close()
+	return None
+
+
+def _record(directory, update):
+	"""Update the shared metrics file through a function modifying the metrics dictionary"""
+	with open(os.path.join(directory, "metrics.lock"), "a") as lock:
+		fcntl.flock(lock, fcntl.LOCK_EX)
+		try:
+			path = os.path.join(directory, "metrics.json")
+			try:
+				with open(path) as f:
+					values = json.load(f)
+			except (IOError, OSError, ValueError):
+				values = {}
+			update(values)
+			with open(path, "w") as f:
+				json.dump(values, f)
+		finally:
+			fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _count_shed(directory, request_class, reason):
+	def update(values):
+		shed = values.setdefault("shed", {}).setdefault(request_class, {})
+		shed[reason] = shed.get(reason, 0) + 1
+	_record(directory, update)
+
+
+def _count_latency(directory, request_class, latency):
+	def update(values):
+		admitted = values.setdefault("admitted", {})
+		admitted[request_class] = admitted.get(request_class, 0) + 1
+		histogram = values.setdefault("latency", {}).setdefault(request_class, {"buckets" : [0] * len(latency_buckets), "sum" : 0.0})
+		for (i, bound) in enumerate(latency_buckets):
+			if latency <= bound:
+				histogram["buckets"][i] += 1
+		histogram["sum"] += latency
+	_record(directory, update)
+
+
+def admitted(request_class, function):
+	"""
+	Run a function if the request is admitted, return a ``503`` response otherwise.
+
+	:param str request_class: the class of the request, one of :py:data:`priorities` (see :py:func:`request_class`)
+	:param function: the function doing the work; it must return an HTTP response
+	:return: the result of the function, or the ``503`` response
+	:rtype: str
+	"""
+	if fcntl is None:
+		return function()
+	arrival   = time.time()
+	directory = _directory()
+	queued    = _try_slot(directory, "queue-" + request_class, max_queued)
+	if queued is None:
+		_count_shed(directory, request_class, "queue_full")
+		return Overloaded("queue_full").response()
+
+	slots    = None
+	deadline = arrival + queue_timeouts[request_class]
+	try:
+		while True:
+			slots = _try_run(directory, request_class)
+			if slots is not None or time.time() >= deadline:
+				break
+			time.sleep(_poll_interval)
+	finally:
+		queued.close()
+	if slots is None:
+		_count_shed(directory, request_class, "timeout")
+		return Overloaded("timeout").response()
+
+	try:
+		return function()
+	finally:
+		for slot in slots:
+			slot.close()
+		_count_latency(directory, request_class, time.time() - arrival)
+
+
+def metrics():
+	"""
+	The current state of the admission control.
+
+	:return: dictionary with the ``running`` and ``queued`` numbers of requests, the ``admitted`` counts, the ``shed`` counts (keyed by the reasons), and the ``latency`` histograms (with the cumulative ``buckets`` counts and the ``sum`` of the latencies), each keyed by the classes
+	:rtype: dict
+	"""
+	if fcntl is None:
+		return {}
+	directory = _directory()
+	try:
+		with open(os.path.join(directory, "metrics.json")) as f:
+			retval = json.load(f)
+	except (IOError, OSError, ValueError):
+		retval = {}
+	retval["running"] = dict((c, _taken(directory, "run-" + c, class_shares[c])) for c in priorities)
+	retval["queued"]  = dict((c, _taken(directory, "queue-" + c, max_queued)) for c in priorities)
+	return retval
+
+
+def metrics_response(environ = None):
+	"""
+	The metrics of the admission control, as an HTTP response in the Prometheus text format.
+
+	:param dict environ: the CGI variables of the request; if ``None``, the environment of the process is used
+	:return: the response, or a ``403`` response if the client (i.e., the ``REMOTE_ADDR`` variable) is not listed in :py:data:`metrics_clients`
+	:rtype: str
+	"""
+	environ = environ if environ is not None else os.environ
+	if environ.get("REMOTE_ADDR") not in metrics_clients:
+		return 'Content-Type: text/plain; charset=utf-8\nStatus: 403 Forbidden\n\nThe metrics are not available to this client\n'
+	values = metrics()
+	lines  = []
+	if values:
+		lines.append("# TYPE rdfa_md_running gauge")
+		for c in priorities:
+			lines.append('rdfa_md_running{class="%s"} %d' % (c, values["running"][c]))
+		lines.append("# TYPE rdfa_md_queue_depth gauge")
+		for c in priorities:
+			lines.append('rdfa_md_queue_depth{class="%s"} %d' % (c, values["queued"][c]))
+		lines.append("# TYPE rdfa_md_admitted_total counter")
+		for (c, value) in sorted(values.get("admitted", {}).items()):
+			lines.append('rdfa_md_admitted_total{class="%s"} %d' % (c, value))
+		lines.append("# TYPE rdfa_md_shed_total counter")
+		for (c, reasons) in sorted(values.get("shed", {}).items()):
+			for (reason, value) in sorted(reasons.items()):
+				lines.append('rdfa_md_shed_total{class="%s",reason="%s"} %d' % (c, reason, value))
+		lines.append("# TYPE rdfa_md_latency_seconds histogram")
+		for (c, histogram) in sorted(values.get("latency", {}).items()):
+			count = values["admitted"][c]
+			for (bound, value) in zip(latency_buckets, histogram["buckets"]):
+				lines.append('rdfa_md_latency_seconds_bucket{class="%s",le="%s"} %d' % (c, bound, value))
+			lines.append('rdfa_md_latency_seconds_bucket{class="%s",le="+Inf"} %d' % (c, count))
+			lines.append('rdfa_md_latency_seconds_sum{class="%s"} %.3f' % (c, histogram["sum"]))
+			lines.append('rdfa_md_latency_seconds_count{class="%s"} %d' % (c, count))
+	return "Content-Type: text/plain; version=0.0.4; charset=utf-8\n\n" + "\n".join(lines) + "\n"
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Programmatic interface of the services, independent of CGI and of HTTP.
+
+The options of a request are collected in a :py:class:`ServiceOptions` instance; it is immutable and hashable, i.e., it can be used, e.g., as a key of a cache. The functions take a source, which may be:
+
+- ``bytes``: the content itself;
+- a file-like object (binary or text);
+- a URI (``http``, ``https``, or ``ftp``), retrieved through the local HTTP cache (see :py:class:`~.pyrdfa.utils.URIOpener`);
+- a ``file:`` URI, or the path of a local file.
+
+The local files are accessible for the programmatic interface only: the HTTP interfaces accept ``http`` and ``https`` URIs only (see :py:func:`~.utils.acceptable_source`).
+
+and return the results directly:
+
+- :py:func:`rdfa_graph` and :py:func:`microdata_graph` return a :py:class:`Result`, i.e., the graph (filtered, etc., as set in the options) and the RDFa processor graph;
+- :py:func:`serialized_chunks` returns the serialization of a graph as an iterator of byte strings;
+- :py:func:`validate` returns a :py:class:`ValidationReport`, i.e., the messages of the RDFa processor as records.
+
+The HTTP interfaces of the package (see :py:func:`~.rdfa.extract_rdf`, :py:func:`~.mdata.extract_microdata`, and the CGI scripts or :py:mod:`~.wsgi`) are adapters over these functions: they turn the form of the request into options (see :py:meth:`~.utils.FormValues.service_options`), and the results into HTTP responses. The functions raise the exceptions of the processors (e.g., :py:class:`~.pyrdfa.HTTPError` or :py:class:`~.pyrdfa.FailedSource` if the source cannot be retrieved).
+
+For example::
+
+	from rdfa_md.api import ServiceOptions, rdfa_graph, serialized_chunks
+	options = ServiceOptions(output_format = "nt", types = "Product")
+	result  = rdfa_graph("https://example.org/shop.html", options)
+	for chunk in serialized_chunks(result.graph, options.output_format):
+		output.write(chunk)
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import os
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from io import BytesIO
+	from urllib.parse import urlsplit
+	from urllib.request import url2pathname
+else:
+	from StringIO import StringIO as BytesIO
+	from urlparse import urlsplit
+	from urllib import url2pathname
+
+from collections import namedtuple
+
+from rdflib import URIRef
+
+from .store            import compact_graph
+from .filters          import GraphFilter, parse_iri_list, expand_iri
+from .serializers      import serialize, NTriplesWriter
+from .pyrdfa           import pyRdfa
+from .pyrdfa.options   import Options
+from .pyrdfa.utils     import Deadline
+from .pymicrodata      import pyMicrodata
+from .rdfa_stream      import STREAMING_MEDIA_TYPES, graph_from_stream
+from .validator_errors import validation_messages
+from .pages            import default_page_size
+
+# Size of the chunks returned by serialized_chunks
+_chunk_size = 64 * 1024
+
+_option_fields = ("media_type", "rdfa_version", "check_lite", "embedded_rdf", "space_preserve",
+				  "vocab_expansion", "vocab_cache", "vocab_cache_report", "refresh_vocab_cache", "streaming",
+				  "output_format", "graphs", "types", "predicates", "depth", "scope", "paged", "page_size", "timeout")
+
+
+def _iri_set(value):
+	"""Turn the types or predicates given by the user (a string, or an iterable of strings or IRIs) into a frozenset of IRIs, or ``None``"""
+	if not value:
+		return None
+	if isinstance(value, str):
+		return parse_iri_list(value)
+	return frozenset(item if isinstance(item, URIRef) else expand_iri(item) for item in value) or None
+
+
+class ServiceOptions(namedtuple("ServiceOptions", _option_fields)):
+	"""
+	The options of a request; the meaning of the values is the same as for the corresponding form values (see :py:class:`~.utils.FormValues`). The instances are immutable and hashable.
+
+	:param str media_type: the media type of the source, one of the values of :py:class:`~.pyrdfa.host.MediaTypes`; if empty, it is set from the source
+	:param str rdfa_version: ``1.1`` or ``1.0``
+	:param bool check_lite: whether warnings should be generated for non RDFa Lite attributes
+	:param bool embedded_rdf: whether embedded Turtle or RDF/XML content should be added to the output graph
+	:param bool space_preserve: whether the white spaces of the literals are preserved
+	:param bool vocab_expansion: whether the RDFa vocabulary expansion should be performed
+	:param bool vocab_cache: whether the vocabularies are cached locally
+	:param bool vocab_cache_report: whether the vocabulary cache should be reported in the processor graph
+	:param bool refresh_vocab_cache: whether the vocabulary cache should be refreshed
+	:param bool streaming: whether the XML content should be processed in streaming mode, if possible (see :py:func:`use_streaming`)
+	:param str output_format: the serialization format (see :py:func:`~.serializers.serialize`)
+	:param str graphs: the graphs in the result of :py:func:`rdfa_graph`: ``output``, ``processor``, or ``output,processor``
+	:param types: the types selecting the resources (see :py:mod:`~.filters`); a string (IRIs, CURIEs or terms, separated by commas or spaces), or an iterable of IRIs; stored as a frozenset, or ``None``
+	:param predicates: the predicates of the triples to keep, in the same form as ``types``
+	:param int depth: maximum number of steps followed from the resources selected by ``types``; ``None`` means no limit
+	:param str scope: an element id or a simple CSS selector (see :py:mod:`~.pyrdfa.scope`)
+	:param bool paged: whether the result should be stored and returned page by page (used by the HTTP interface only)
+	:param int page_size: number of triples in a page
+	:param float timeout: the time budget of a request, in seconds; ``None`` means no limit
+	"""
+	__slots__ = ()
+
+	def __new__(cls, media_type = "", rdfa_version = "1.1", check_lite = False, embedded_rdf = False, space_preserve = True,
+				vocab_expansion = False, vocab_cache = True, vocab_cache_report = False, refresh_vocab_cache = False, streaming = False,
+				output_format = "turtle", graphs = "output", types = None, predicates = None, depth = None, scope = None,
+				paged = False, page_size = default_page_size, timeout = None):
+		if graphs == "processor,output":
+			graphs = "output,processor"
+		return super(ServiceOptions, cls).__new__(cls, media_type or "", rdfa_version, check_lite, embedded_rdf, space_preserve,
+												  vocab_expansion, vocab_cache, vocab_cache_report, refresh_vocab_cache, streaming,
+												  output_format, graphs, _iri_set(types), _iri_set(predicates), depth, scope or None,
+												  paged, page_size, timeout)
+
+	@property
+	def output_default_graph(self):
+		"""Whether the output graph is part of the result"""
+		return self.graphs != "processor"
+
+	@property
+	def output_processor_graph(self):
+		"""Whether the processor graph is part of the result (also if the vocabulary cache is reported)"""
+		return "processor" in self.graphs or self.vocab_cache_report
+
+	@property
+	def graph_filter(self):
+		"""The :py:class:`~.filters.GraphFilter` built from the ``types``, ``predicates``, and ``depth`` values"""
+		return GraphFilter(self.types, self.predicates, self.depth)
+
+
+class Result(namedtuple("Result", "graph processor_graph truncated")):
+	"""
+	The result of an extraction.
+
+	.. py:attribute:: graph
+
+	   the graph, as requested by the options: the output graph (filtered by the types and predicates, if any) and/or the processor graph
+
+	.. py:attribute:: processor_graph
+
+	   the processor graph of the RDFa processor (warnings, errors); empty for microdata
+
+	.. py:attribute:: truncated
+
+	   whether the time budget ran out, i.e., the graph is incomplete; the processor graph (which is then always added to the graph, for RDFa) says so
+	"""
+	__slots__ = ()
+
+
+class ValidationReport(namedtuple("ValidationReport", "valid messages graph")):
+	"""
+	The result of a validation.
+
+	.. py:attribute:: valid
+
+	   whether there is no error
+
+	.. py:attribute:: messages
+
+	   the errors, warnings, and informational messages, a list of :py:class:`~.validator_errors.ValidationMessage`
+
+	.. py:attribute:: graph
+
+	   the output graph
+	"""
+	__slots__ = ()
+
+
+def use_streaming(options):
+	"""
+	Decide whether the RDFa content should be processed in streaming mode. This is the case if the user asked for it, the host language is one of the XML languages listed in :py:data:`~.rdfa_stream.STREAMING_MEDIA_TYPES`, and none of the features requiring a DOM tree (RDFa 1.0, vocabulary expansion, embedded RDF, RDFa Lite checks, vocabulary cache reports, processing scope) is requested.
+
+	:param options: the options of the request (a :py:class:`~.utils.FormValues` instance has the same attributes)
+	:type options: :py:class:`ServiceOptions`
+	:rtype: bool
+	"""
+	return (options.streaming and options.media_type in STREAMING_MEDIA_TYPES and
+			options.rdfa_version == "1.1" and not options.scope and
+			not (options.vocab_expansion or options.embedded_rdf or options.check_lite or options.vocab_cache_report))
+
+
+def _open(source, base):
+	"""
+	Turn a source into what the processors accept (a URI or a file-like object).
+
+	:return: a (source, base, opened) tuple, where opened is the file opened by the function (to be closed by the caller), or ``None``
+	"""
+	if hasattr(source, "read"):
+		return (source, base, None)
+	if PY3 and isinstance(source, bytes):
+		return (BytesIO(source), base, None)
+	if hasattr(os, "fspath"):
+		# e.g., a pathlib.Path instance
+		source = os.fspath(source)
+	if source.startswith("http:") or source.startswith("https:") or source.startswith("ftp:"):
+		return (source, base, None)
+	if source.startswith("file:"):
+		# the URI remains the (default) base
+		opened = open(url2pathname(urlsplit(source).path), "rb")
+		return (opened, base or source, opened)
+	opened = open(source, "rb")
+	return (opened, base or source, opened)
+
+
+def rdfa_graph(source, options = None, base = "", deadline = None):
+	"""
+	Extract the RDFa content of a source.
+
+	:param source: the source: bytes, a file-like object, a URI, or a file name (a string or a path-like object)
+	:param options: the options; if ``None``, the defaults are used
+	:type options: :py:class:`ServiceOptions`
+	:param str base: the base URI of the content; if empty, the URI (or the file name) of the source is used
+	:param deadline: the time budget; if ``None``, it is set from the ``timeout`` option
+	:type deadline: :py:class:`~.pyrdfa.utils.Deadline`
+	:rtype: :py:class:`Result`
+	"""
+	options  = options if options is not None else ServiceOptions()
+	deadline = deadline if deadline is not None else Deadline(options.timeout)
+	output_graph    = compact_graph()
+	processor_graph = compact_graph()
+	(source, base, opened) = _open(source, base)
+	try:
+		if use_streaming(options):
+			truncated = graph_from_stream(source, base, graph = output_graph, pgraph = processor_graph, media_type = options.media_type, deadline = deadline)
+		else:
+			pyrdfa_options = Options(output_default_graph   = True,
+									 output_processor_graph = True,
+									 space_preserve         = options.space_preserve,
+									 embedded_rdf           = options.embedded_rdf,
+									 vocab_expansion        = options.vocab_expansion,
+									 vocab_cache            = options.vocab_cache,
+									 refresh_vocab_cache    = options.refresh_vocab_cache,
+									 vocab_cache_report     = options.vocab_cache_report,
+									 check_lite             = options.check_lite,
+									 deadline               = deadline)
+			processor = pyRdfa(pyrdfa_options, base = base, media_type = options.media_type, rdfa_version = options.rdfa_version, scope = options.scope)
+			processor.graph_from_source(source, graph = output_graph, pgraph = processor_graph)
+			truncated = pyrdfa_options.truncated
+	finally:
+		if opened is not None:
+			opened.close()
+
+	# The filter on types and predicates (if any) applies to the output graph only;
+	# an incomplete result is always returned with the processor graph, which explains why
+	graph = compact_graph()
+	# The prefixes of the document are reused by the serializers
+	for (prefix, namespace) in output_graph.namespaces():
+		graph.bind(prefix, namespace)
+	if options.output_default_graph:
+		graph_filter = options.graph_filter
+		if graph_filter.active:
+			graph_filter.filter(output_graph, graph)
+		else:
+			for t in output_graph: graph.add(t)
+	if options.output_processor_graph or truncated:
+		for t in processor_graph: graph.add(t)
+	return Result(graph, processor_graph, truncated)
+
+
+def microdata_graph(source, options = None, base = "", deadline = None):
+	"""
+	Extract the microdata content of a source.
+
+	:param source: the source: bytes, a file-like object, a URI, or a file name (a string or a path-like object)
+	:param options: the options; if ``None``, the defaults are used (only the vocabulary expansion, the scope, the filter, and the time budget are relevant)
+	:type options: :py:class:`ServiceOptions`
+	:param str base: the base URI of the content; if empty, the URI (or the file name) of the source is used
+	:param deadline: the time budget; if ``None``, it is set from the ``timeout`` option
+	:type deadline: :py:class:`~.pyrdfa.utils.Deadline`
+	:rtype: :py:class:`Result`
+	"""
+	options  = options if options is not None else ServiceOptions()
+	deadline = deadline if deadline is not None else Deadline(options.timeout)
+	graph    = compact_graph()
+	(source, base, opened) = _open(source, base)
+	try:
+		processor = pyMicrodata(base            = base,
+								vocab_expansion = options.vocab_expansion,
+								vocab_cache     = options.vocab_cache,
+								scope           = options.scope,
+								deadline        = deadline)
+		processor.graph_from_source(source, graph = graph)
+	finally:
+		if opened is not None:
+			opened.close()
+	graph_filter = options.graph_filter
+	if graph_filter.active:
+		graph = graph_filter.filter(graph, compact_graph())
+	return Result(graph, compact_graph(), processor.truncated)
+
+
+def serialized_chunks(graph, output_format, chunk_size = _chunk_size):
+	"""
+	Serialize a graph, as an iterator of UTF-8 encoded byte strings. The ``nt`` serialization is generated while it is consumed (in chunks of the buffer size of :py:class:`~.serializers.ntriples.NTriplesWriter`), i.e., it is never kept in memory as a whole; the other formats are serialized first.
+
+	:param graph: the ``RDFLib`` Graph
+	:param str output_format: the serialization format (see :py:func:`~.serializers.serialize`)
+	:param int chunk_size: the (approximate) size of the chunks
+	:return: iterator of ``bytes``
+	"""
+	if output_format == "nt":
+		chunks = []
+		class _Output(object):
+			def write(self, data):
+				chunks.append(data)
+		writer = NTriplesWriter(_Output())
+		for triple in graph:
+			writer.write(triple)
+			if chunks:
+				data = "".join(chunks).encode("utf-8")
+				del chunks[:]
+				yield data
+		writer.flush()
+		if chunks:
+			yield "".join(chunks).encode("utf-8")
+	else:
+		data = serialize(graph, output_format).encode("utf-8")
+		for start in range(0, len(data), chunk_size):
+			yield data[start:start + chunk_size]
+
+
+def validate(source, options = None, base = ""):
+	"""
+	Validate the RDFa content of a source.
+
+	:param source: the source: bytes, a file-like object, a URI, or a file name (a string or a path-like object)
+	:param options: the options; if ``None``, the defaults are used (only the media type, the vocabulary expansion, the RDFa Lite checks, and the embedded RDF are relevant)
+	:type options: :py:class:`ServiceOptions`
+	:param str base: the base URI of the content; if empty, the URI (or the file name) of the source is used
+	:rtype: :py:class:`ValidationReport`
+	"""
+	from .validator import Validator
+	options = options if options is not None else ServiceOptions()
+	(source, base, opened) = _open(source, base)
+	try:
+		validator = Validator(source, base,
+							  media_type      = options.media_type,
+							  vocab_expansion = options.vocab_expansion,
+							  check_lite      = options.check_lite,
+							  embedded_rdf    = options.embedded_rdf)
+		validator.parse()
+	finally:
+		if opened is not None:
+			opened.close()
+	messages = validation_messages(validator.processor_graph)
+	return ValidationReport(not any(message.severity == "error" for message in messages), messages, validator.default_graph)
@@ -0,0 +1,576 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Bulk extraction of RDFa and microdata from local files and WARC archives, typically from the result of a crawl, run from the command line::
+
+	python -m rdfa_md -o output-directory [options] directory-or-glob ...
+
+The directories are walked recursively (only the files with one of the extensions of :py:data:`default_extensions` are processed); the glob patterns are expanded. Each file is memory mapped and processed by a worker of a process pool (by default, one per core) through the functions of :py:mod:`~.api`. The triples of a file form one graph in the output, named by the ``file:`` URI of the file (which is also the base of the content).
+
+The files with one of the extensions of :py:data:`archive_extensions` are read as WARC archives, while they are iterated over (see :py:mod:`~.warc`): the HTML, XHTML, and SVG payloads of the (successful) ``response`` records are dispatched to the workers, and the graph of a record is named by its target URI (which is also the base). The other records are skipped. The number, and the total size, of the records in the hands of the workers are limited (see :py:data:`max_in_flight`), i.e., the memory use does not depend on the size of the archives.
+
+The output is a series of N-Quads “shards” in the output directory (``part-00000.nq``, ``part-00001.nq``, etc.), each with the results of :py:data:`default_shard_size` files; with the ``--gzip`` option each shard is compressed (the files are compressed by the workers, and the shards are concatenations of gzip members). A shard is written under a temporary name and is renamed when it is complete; the files it contains are then added to a checkpoint file in the output directory. If the run is interrupted, re-running the same command skips the files (and the archive records) that are already in a complete shard. The outcome for each file and archive record of a complete shard (``ok``, ``incomplete``, ``skipped``, or ``error``, the number of triples, and the error message or the reason of the skip) is added to a status log in the output directory, a tab separated line per file or record.
+
+The throughput of the run (documents, triples, and megabytes per second) is printed regularly on the standard error, and at the end on the standard output.
+
+**Module constants:**
+
+.. py:data:: default_extensions
+
+   The extensions of the files processed in a directory
+
+.. py:data:: archive_extensions
+
+   The extensions of the files read as WARC archives
+
+.. py:data:: max_in_flight
+
+   The maximum total size (in bytes) of the archive records handed over to the workers, but not yet processed
+
+.. py:data:: default_shard_size
+
+   The number of files in a shard
+
+.. py:data:: progress_interval
+
+   The time (in seconds) between two reports on the throughput
+
+.. py:data:: checkpoint_name
+
+   The name of the checkpoint file in the output directory
+
+.. py:data:: status_log_name
+
+   The name of the status log in the output directory
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from io import StringIO, BytesIO
+	from urllib.request import pathname2url
+else:
+	from StringIO import StringIO
+	from StringIO import StringIO as BytesIO
+	from urllib import pathname2url
+
+import os
+import re
+import glob
+import mmap
+import time
+import zlib
+import signal
+import argparse
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from rdflib import URIRef
+
+from .api import ServiceOptions, rdfa_graph, microdata_graph
+from .serializers import NTriplesWriter
+from .compression import compression_level
+from .pyrdfa.host import MediaTypes, media_type_from_name
+from .warc import open_archive, read_records, http_head, http_payload
+from .utils import default_timeout
+
+archive_extensions = (".warc", ".warc.gz")
+default_extensions = (".html", ".htm", ".xhtml", ".xht", ".svg", ".xml") + archive_extensions
+max_in_flight      = 256 * 1024 * 1024
+default_shard_size = 1000
+progress_interval  = 10
+checkpoint_name    = "checkpoint.txt"
+status_log_name    = "status.log"
+
+_shard = re.compile(r"^part-(\d+)\.nq(\.gz)?$")
+_charset = re.compile(r"charset\s*=\s*[\"']?([^\"';\s]+)", re.IGNORECASE)
+
+# The media types of the archive records that are processed
+_record_media_types = {
+	"text/html"             : MediaTypes.html,
+	"application/xhtml+xml" : MediaTypes.xhtml,
+	"image/svg+xml"         : MediaTypes.svg,
+}
+
+
+class FileResult(namedtuple("FileResult", "path uri data triples size truncated error skipped")):
+	"""
+	The result of the extraction from one file, or from one archive record.
+
+	.. py:attribute:: path
+
+	   the path of the file; for an archive record, the path of the archive and the record id, separated by ``#``
+
+	.. py:attribute:: uri
+
+	   the URI of the file or of the record, i.e., the name of its graph in the output
+
+	.. py:attribute:: data
+
+	   the N-Quads, UTF-8 encoded (and compressed, if requested)
+
+	.. py:attribute:: triples
+
+	   the number of triples
+
+	.. py:attribute:: size
+
+	   the size of the file or of the record, in bytes
+
+	.. py:attribute:: truncated
+
+	   whether the time budget ran out, i.e., the result is incomplete
+
+	.. py:attribute:: error
+
+	   the error message if the extraction failed, ``None`` otherwise
+
+	.. py:attribute:: skipped
+
+	   the reason if the file or record has not been processed, ``None`` otherwise
+	"""
+	__slots__ = ()
+
+	@property
+	def status(self):
+		"""The outcome: ``ok``, ``incomplete``, ``skipped``, or ``error``"""
+		if self.error:
+			return "error"
+		if self.skipped:
+			return "skipped"
+		return "incomplete" if self.truncated else "ok"
+
+	def log_line(self):
+		"""The line of the status log"""
+		message = (self.error or self.skipped or "").replace("\t", " ").replace("\n", " ")
+		return "%s\t%s\t%s\t%d\t%s\n" % (self.path, self.uri, self.status, self.triples, message)
+
+
+def find_files(patterns, extensions = default_extensions):
+	"""
+	The files to process, in a reproducible order.
+
+	:param patterns: file names, directory names, or glob patterns
+	:param extensions: the extensions of the files collected from the directories
+	:return: iterator of paths
+	"""
+	extensions = tuple(extensions)
+	for pattern in patterns:
+		paths = sorted(glob.glob(pattern)) if re.search(r"[*?\[]", pattern) else [pattern]
+		for path in paths:
+			if os.path.isdir(path):
+				for (root, dirs, files) in os.walk(path):
+					dirs.sort()
+					for name in sorted(files):
+						if name.lower().endswith(extensions):
+							yield os.path.join(root, name)
+			elif os.path.isfile(path):
+				yield path
+
+
+def file_uri(path):
+	"""The ``file:`` URI of a path"""
+	return "file://" + pathname2url(os.path.abspath(path))
+
+
+def _extract(source, path, uri, media_type, size, extract, options, compress):
+	"""The extraction shared by :py:func:`extract_file` and :py:func:`extract_record`"""
+	options   = options._replace(media_type = media_type)
+	graph     = None
+	truncated = False
+	if "rdfa" in extract:
+		result    = rdfa_graph(source, options, uri)
+		graph     = result.graph
+		truncated = result.truncated
+	if "microdata" in extract and media_type == MediaTypes.html:
+		source.seek(0)
+		result = microdata_graph(source, options, uri)
+		if graph is None:
+			graph = result.graph
+		else:
+			for t in result.graph: graph.add(t)
+		truncated = truncated or result.truncated
+	if graph is None or len(graph) == 0:
+		return FileResult(path, uri, b"", 0, size, truncated, None, None)
+
+	output = StringIO()
+	writer = NTriplesWriter(output, URIRef(uri))
+	writer.write_triples(graph)
+	writer.flush()
+	data = output.getvalue().encode("utf-8")
+	if compress:
+		# wbits = 31: gzip format; the shards are concatenations of gzip members
+		encoder = zlib.compressobj(compression_level, zlib.DEFLATED, 31)
+		data    = encoder.compress(data) + encoder.flush()
+	return FileResult(path, uri, data, writer.count, size, truncated, None, None)
+
+
+def extract_file(path, extract = ("rdfa", "microdata"), options = None, compress = False):
+	"""
+	Extract the content of one file. This function is run by the workers of the process pool; it does not raise exceptions, the errors are reported in the result.
+
+	:param str path: the path of the file
+	:param extract: the extractions, ``rdfa`` and/or ``microdata`` (the latter applies to HTML files only)
+	:param options: the options of the extraction; the media type is set from the file name
+	:type options: :py:class:`~.api.ServiceOptions`
+	:param bool compress: whether the N-Quads should be gzip compressed
+	:rtype: :py:class:`FileResult`
+	"""
+	options = options if options is not None else ServiceOptions()
+	uri     = file_uri(path)
+	try:
+		size = os.path.getsize(path)
+		if size == 0:
+			return FileResult(path, uri, b"", 0, 0, False, None, None)
+		media_type = media_type_from_name(path) or MediaTypes.html
+		with open(path, "rb") as f:
+			source = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+			try:
+				return _extract(source, path, uri, media_type, size, extract, options, compress)
+			finally:
+				source.close()
+	except Exception as e:
+		return FileResult(path, uri, b"", 0, 0, False, "%s: %s" % (e.__class__.__name__, e), None)
+
+
+def extract_record(key, uri, block, media_type, extract = ("rdfa", "microdata"), options = None, compress = False):
+	"""
+	Extract the content of the HTTP response stored in an archive record. This function is run by the workers of the process pool; it does not raise exceptions, the errors are reported in the result.
+
+	:param str key: the key of the record (see :py:attr:`FileResult.path`)
+	:param str uri: the target URI of the record
+	:param bytes block: the block of the record
+	:param str media_type: the media type of the payload
+	:param extract: the extractions, ``rdfa`` and/or ``microdata`` (the latter applies to HTML payloads only)
+	:param options: the options of the extraction
+	:type options: :py:class:`~.api.ServiceOptions`
+	:param bool compress: whether the N-Quads should be gzip compressed
+	:rtype: :py:class:`FileResult`
+	"""
+	options = options if options is not None else ServiceOptions()
+	try:
+		(status, headers, offset) = http_head(block)
+		payload = http_payload(block, headers, offset)
+		charset = _charset.search(headers.get("content-type", ""))
+		source  = None
+		if charset is not None and media_type == MediaTypes.html:
+			# the encoding set by the HTTP header takes precedence over the one in the content (XML content is self describing)
+			try:
+				source = StringIO(payload.decode(charset.group(1), "replace"))
+			except LookupError:
+				pass
+		source = source if source is not None else BytesIO(payload)
+		return _extract(source, key, uri, media_type, len(block), extract, options, compress)
+	except Exception as e:
+		return FileResult(key, uri, b"", 0, len(block), False, "%s: %s" % (e.__class__.__name__, e), None)
+
+
+def _archive_tasks(path, done):
+	"""
+	The tasks of the records of an archive, see :py:func:`_tasks`
+	"""
+	stream = open_archive(path)
+	try:
+		for record in read_records(stream, path):
+			if record.type != "response":
+				continue
+			key = "%s#%s" % (path, record.record_id)
+			if key in done:
+				continue
+			uri = record.target_uri
+			if record.block is None:
+				yield FileResult(key, uri, b"", 0, record.length, False, None, "record too large")
+				continue
+			try:
+				(status, headers, offset) = http_head(record.block)
+			except ValueError:
+				yield FileResult(key, uri, b"", 0, record.length, False, None, "not an HTTP response")
+				continue
+			media_type = _record_media_types.get(headers.get("content-type", "").split(";")[0].strip().lower())
+			if not uri:
+				yield FileResult(key, uri, b"", 0, record.length, False, None, "no target URI")
+			elif status < 200 or status >= 300:
+				yield FileResult(key, uri, b"", 0, record.length, False, None, "HTTP status %d" % status)
+			elif media_type is None:
+				yield FileResult(key, uri, b"", 0, record.length, False, None, "content type %s" % headers.get("content-type", "unknown"))
+			else:
+				yield (record.length, extract_record, (key, uri, record.block, media_type))
+	finally:
+		stream.close()
+
+
+def _tasks(patterns, extensions, done):
+	"""
+	The work to be done: for each file or archive record that is not in the checkpoint, either a (size, function, arguments) tuple, for the extraction to be done by a worker (the extraction options are added to the arguments), or a :py:class:`FileResult`, if it is skipped.
+	"""
+	for path in find_files(patterns, extensions):
+		if path in done:
+			continue
+		if path.lower().endswith(archive_extensions):
+			try:
+				for task in _archive_tasks(path, done):
+					yield task
+			except (IOError, OSError, ValueError, EOFError, zlib.error) as e:
+				# an unreadable or corrupted archive: the records read so far are processed, the rest is lost
+				yield FileResult(path, file_uri(path), b"", 0, 0, False, "%s: %s" % (e.__class__.__name__, e), None)
+		else:
+			yield (0, extract_file, (path,))
+
+
+def _ignore_interrupts():
+	"""Initializer of the workers: an interruption is handled by the main process (which completes the current shard)"""
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class ShardWriter(object):
+	"""
+	Writer of the output shards, and of the checkpoint.
+
+	:param str directory: the output directory
+	:param int shard_size: the number of files in a shard
+	:param bool compress: whether the shards are gzip compressed
+
+	**Class attributes:**
+
+	.. py:attribute:: done
+
+	   the set of paths (see :py:attr:`FileResult.path`) in the checkpoint, i.e., of the files and archive records of a previous run that need not be processed again
+
+	**Class methods:**
+	"""
+	def __init__(self, directory, shard_size = default_shard_size, compress = False):
+		self.directory  = directory
+		self.shard_size = shard_size
+		self.suffix     = ".nq.gz" if compress else ".nq"
+		self.checkpoint = os.path.join(directory, checkpoint_name)
+		self.status_log = os.path.join(directory, status_log_name)
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+
+		numbers = [-1]
+		for name in os.listdir(directory):
+			if name.endswith(".tmp"):
+				# the incomplete shard of an interrupted run
+				os.remove(os.path.join(directory, name))
+			else:
+				match = _shard.match(name)
+				if match is not None:
+					numbers.append(int(match.group(1)))
+		self.number = max(numbers) + 1
+
+		self.done = set()
+		if os.path.exists(self.checkpoint):
+			with open(self.checkpoint) as f:
+				self.done = set(line.rstrip("\n") for line in f if line.strip())
+
+		self.current = None
+		self.results = []
+
+	def _name(self):
+		return os.path.join(self.directory, "part-%05d%s" % (self.number, self.suffix))
+
+	def add(self, result):
+		"""
+		Add the result of a file or of an archive record to the current shard, and complete the shard if it is full.
+
+		:param result: the result of the file or of the record
+		:type result: :py:class:`FileResult`
+		"""
+		if self.current is None:
+			self.current = open(self._name() + ".tmp", "wb")
+		if result.data:
+			self.current.write(result.data)
+		# the data is not kept in memory
+		self.results.append(result._replace(data = b""))
+		if len(self.results) >= self.shard_size:
+			self.commit()
+
+	def commit(self):
+		"""Complete the current shard: rename it to its final name, and add its files and records to the status log and to the checkpoint"""
+		if self.current is None:
+			return
+		self.current.flush()
+		os.fsync(self.current.fileno())
+		self.current.close()
+		os.rename(self._name() + ".tmp", self._name())
+		with open(self.status_log, "a") as f:
+			f.write("".join(result.log_line() for result in self.results))
+		with open(self.checkpoint, "a") as f:
+			f.write("".join(result.path + "\n" for result in self.results))
+			f.flush()
+			os.fsync(f.fileno())
+		self.done.update(result.path for result in self.results)
+		self.number  += 1
+		self.current  = None
+		self.results  = []
+
+
+class Throughput(object):
+	"""
+	Statistics of a run.
+
+	**Class attributes:**
+
+	.. py:attribute:: documents
+
+	   the number of files and archive records processed
+
+	.. py:attribute:: triples
+
+	   the number of triples extracted
+
+	.. py:attribute:: size
+
+	   the size of the files and records processed, in bytes
+
+	.. py:attribute:: truncated
+
+	   the number of files whose processing ran out of time
+
+	.. py:attribute:: errors
+
+	   the number of files whose processing failed
+
+	.. py:attribute:: skipped
+
+	   the number of archive records that have not been processed (not included in the other numbers)
+
+	**Class methods:**
+	"""
+	def __init__(self):
+		self.start     = time.time()
+		self.documents = 0
+		self.triples   = 0
+		self.size      = 0
+		self.truncated = 0
+		self.errors    = 0
+		self.skipped   = 0
+
+	def add(self, result):
+		"""
+		Add the result of a file or of an archive record.
+
+		:param result: the result of the file or of the record
+		:type result: :py:class:`FileResult`
+		"""
+		if result.skipped:
+			self.skipped += 1
+			return
+		self.documents += 1
+		self.triples   += result.triples
+		self.size      += result.size
+		self.truncated += 1 if result.truncated else 0
+		self.errors    += 1 if result.error else 0
+
+	def report(self):
+		"""The statistics, in a human readable form"""
+		elapsed = max(time.time() - self.start, 1e-6)
+		return ("%d documents, %d triples, %.1f MB in %.1f s: %.1f docs/s, %.1f triples/s, %.2f MB/s (%d errors, %d incomplete, %d skipped)" %
+				(self.documents, self.triples, self.size / 1e6, elapsed,
+				 self.documents / elapsed, self.triples / elapsed, self.size / 1e6 / elapsed, self.errors, self.truncated, self.skipped))
+
+
+def run(patterns, directory, extract = ("rdfa", "microdata"), options = None, jobs = None, shard_size = default_shard_size,
+		compress = False, extensions = default_extensions):
+	"""
+	Process the files and the archives, skipping the files and the archive records in the checkpoint of a previous run.
+
+	:param patterns: file names, directory names, or glob patterns
+	:param str directory: the output directory
+	:param extract: the extractions, ``rdfa`` and/or ``microdata``
+	:param options: the options of the extraction
+	:type options: :py:class:`~.api.ServiceOptions`
+	:param int jobs: the number of worker processes; if ``None``, the number of cores
+	:param int shard_size: the number of files in a shard
+	:param bool compress: whether the shards are gzip compressed
+	:param extensions: the extensions of the files collected from the directories
+	:return: the statistics of the run
+	:rtype: :py:class:`Throughput`
+	"""
+	jobs       = jobs or multiprocessing.cpu_count()
+	writer     = ShardWriter(directory, shard_size, compress)
+	statistics = Throughput()
+	last       = [time.time()]
+	sizes      = {}
+
+	def collect(results):
+		for result in results:
+			if result.error:
+				print("%s: %s" % (result.path, result.error), file = sys.stderr)
+			writer.add(result)
+			statistics.add(result)
+		if time.time() - last[0] >= progress_interval:
+			print(statistics.report(), file = sys.stderr)
+			last[0] = time.time()
+
+	def finished(pending):
+		(done, pending) = wait(pending, return_when = FIRST_COMPLETED)
+		collect(future.result() for future in done)
+		for future in done:
+			del sizes[future]
+		return pending
+
+	pool    = ProcessPoolExecutor(max_workers = jobs, initializer = _ignore_interrupts)
+	pending = set()
+	try:
+		for task in _tasks(patterns, extensions, writer.done):
+			if isinstance(task, FileResult):
+				collect([task])
+				continue
+			(size, function, arguments) = task
+			future = pool.submit(function, *(arguments + (extract, options, compress)))
+			pending.add(future)
+			sizes[future] = size
+			# Only a few files, and a limited amount of archive content, are queued: the list of files and the archives may be huge
+			while len(pending) >= 4 * jobs or (pending and sum(sizes.values()) > max_in_flight):
+				pending = finished(pending)
+		while pending:
+			pending = finished(pending)
+	finally:
+		for future in pending:
+			future.cancel()
+		pool.shutdown()
+		# The files whose results have been collected are not processed again
+		writer.commit()
+	return statistics
+
+
+def main(argv = None):
+	"""
+	The command line interface; see the module documentation, or run with ``--help``.
+
+	:param argv: the arguments; if ``None``, those of the command line are used
+	:return: the exit status
+	"""
+	parser = argparse.ArgumentParser(prog = "python -m rdfa_md", description = "Extract RDFa and/or microdata from local files and WARC archives into N-Quads")
+	parser.add_argument("paths", nargs = "+", help = "files, WARC archives, directories, or glob patterns")
+	parser.add_argument("-o", "--output", required = True, help = "output directory (also used for the checkpoint)")
+	parser.add_argument("-e", "--extract", default = "rdfa,microdata", help = "rdfa, microdata, or rdfa,microdata (default)")
+	parser.add_argument("-j", "--jobs", type = int, default = None, help = "number of worker processes (default: number of cores)")
+	parser.add_argument("--shard-size", type = int, default = default_shard_size, help = "number of files in an output shard (default: %(default)s)")
+	parser.add_argument("--gzip", action = "store_true", help = "compress the output shards")
+	parser.add_argument("--extensions", default = ",".join(default_extensions), help = "extensions of the files collected from the directories (default: %(default)s)")
+	parser.add_argument("--timeout", type = float, default = default_timeout, help = "time budget of a file, in seconds (default: %(default)s)")
+	parser.add_argument("--vocab-expansion", action = "store_true", help = "perform the RDFa vocabulary expansion")
+	parser.add_argument("--types", default = None, help = "keep the resources of these types only (see the filters of the service)")
+	parser.add_argument("--predicates", default = None, help = "keep the triples with these predicates only")
+	args = parser.parse_args(argv)
+
+	extract = tuple(e.strip() for e in args.extract.split(",") if e.strip())
+	if not extract or any(e not in ("rdfa", "microdata") for e in extract):
+		parser.error("invalid extraction: %s" % args.extract)
+	extensions = tuple("." + e.strip().lstrip(".").lower() for e in args.extensions.split(",") if e.strip())
+	options    = ServiceOptions(vocab_expansion = args.vocab_expansion, types = args.types, predicates = args.predicates,
+								timeout = args.timeout if args.timeout > 0 else None)
+	try:
+		statistics = run(args.paths, args.output, extract, options, args.jobs, args.shard_size, args.gzip, extensions)
+	except KeyboardInterrupt:
+		print("Interrupted; run the same command again to resume", file = sys.stderr)
+		return 130
+	print(statistics.report())
+	return 0
@@ -14,7 +14,11 @@ than Python's string interpolation.
 """
 
 from __future__ import print_function
-from cgi import escape
+try:
+    from html import escape
+except ImportError:
+    # Python 2
+    from cgi import escape
 from itertools import chain
 
 __all__ = ['clean_str', 'clean_strs', 'multi_format', 'clean_format',
@@ -43,7 +47,7 @@ def multi_format(s, *params):
 
 
 def clean_format(s, *args):
-    """Interpolate a string after passing arguments through cgi.escape.
+    """Interpolate a string after passing arguments through escape.
 
     Pass in a format string and any number of arguments.  The extra arguments
     will be run through clean_strs and then used to format the string."""
@@ -58,7 +62,7 @@ def multi_print(s, *params):
 
 
 def clean_print(s, *args):
-    """Print a string after passing arguments through cgi.escape.
+    """Print a string after passing arguments through escape.
 
     This is a convenience function that prints clean_format(s, *args)."""
     print(clean_format(s, *args))
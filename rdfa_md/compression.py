@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Compression of the HTTP responses, negotiated through the ``Accept-Encoding`` header of the request.
+
+The serializations of the extracted graphs (Turtle, N-Triples, JSON-LD) compress very well, typically 10 to 20 times. The :py:func:`write_response` function, used by the CGI scripts instead of a simple ``print``, chooses an encoding (``br`` if the `brotli <https://pypi.org/project/Brotli/>`_ package is installed, ``gzip`` otherwise) that the client accepts, and writes the response through an incremental encoder (:py:class:`CompressingStream`): the body is compressed, and written, in chunks, i.e., the compressed form of the full response is never built in memory. Note that the body itself is a complete string: the services produce their responses as strings, which are also shared by the coalesced requests and kept by the cache of failures (see :py:mod:`~.singleflight` and :py:mod:`~.failures`). The encoder is also usable as an output stream for the serializers of :py:mod:`~.serializers`.
+
+Responses smaller than a threshold are not compressed: compression would not make a noticeable difference for them.
+
+The ``ETag`` of a response (if any) identifies the variant chosen by the negotiation: the encoding is appended to it, and ``Accept-Encoding`` is added to the ``Vary`` header, whenever the client accepts an encoding, regardless of the size of the body. The ``304 Not Modified`` responses go through the same negotiation, i.e., they repeat the ``ETag`` and the ``Vary`` header of the full response.
+
+**Module constants:**
+
+.. py:data:: compression_threshold
+
+   The size of the body (in characters) below which the response is not compressed
+
+.. py:data:: chunk_size
+
+   The size (in characters) of the chunks of the body handed over to the encoder
+
+.. py:data:: compression_level
+
+   The compression level used for ``gzip``
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+import os
+import re
+import zlib
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+compression_threshold = 4096
+chunk_size            = 64 * 1024
+compression_level     = 6
+
+_vary = re.compile(r"^Vary:\s*(.*)$", re.IGNORECASE | re.MULTILINE)
+_etag = re.compile(r'^(ETag:\s*.*)"\s*$', re.IGNORECASE | re.MULTILINE)
+
+
+def available_encodings():
+	"""
+	The encodings supported by this installation, in order of preference.
+
+	:rtype: list of str
+	"""
+	return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding):
+	"""
+	Choose the content encoding of a response.
+
+	:param str accept_encoding: the value of the ``Accept-Encoding`` header of the request; may be ``None``
+	:return: the chosen encoding (``br`` or ``gzip``), or ``None`` if the response should not be compressed
+	"""
+	if not accept_encoding:
+		return None
+	accepted = {}
+	for item in accept_encoding.split(","):
+		parts  = item.strip().split(";")
+		coding = parts[0].strip().lower()
+		q = 1.0
+		for param in parts[1:]:
+			(key, _, value) = param.strip().partition("=")
+			if key.strip().lower() == "q":
+				try:
+					q = float(value)
+				except ValueError:
+					q = 0.0
+		if coding:
+			accepted[coding] = q
+	for encoding in available_encodings():
+		q = accepted.get(encoding, accepted.get("x-gzip") if encoding == "gzip" else None)
+		if q is None:
+			q = accepted.get("*")
+		if q:
+			return encoding
+	return None
+
+
+class CompressingStream(object):
+	"""
+	Incremental encoder: a writable stream (accepting unicode strings) that encodes its input in UTF-8, compresses it, and writes the result into a binary stream.
+
+	:param output: the binary output stream
+	:param str encoding: ``gzip`` or ``br``
+
+	The :py:meth:`close` method must be called after the last write; it does not close the output stream.
+
+	**Class methods:**
+	"""
+	def __init__(self, output, encoding):
+		self.output = output
+		if encoding == "br":
+			compressor   = brotli.Compressor()
+			self._feed   = compressor.process
+			self._finish = compressor.finish
+		else:
+			# wbits = 16 + 15: gzip header and trailer
+			compressor   = zlib.compressobj(compression_level, zlib.DEFLATED, 31)
+			self._feed   = compressor.compress
+			self._finish = compressor.flush
+
+	def write(self, data):
+		"""
+		Compress, and write, a piece of the content.
+
+		:param str data: the content
+		"""
+		compressed = self._feed(data.encode("utf-8") if not isinstance(data, bytes) else data)
+		if compressed:
+			self.output.write(compressed)
+
+	def close(self):
+		"""Write the remaining compressed data"""
+		self.output.write(self._finish())
+
+
+def _add_header(header, encoding, compressed = True):
+	"""Add the ``Vary`` header (and, if the body is compressed, the ``Content-Encoding`` header), and mark the ETag (if any) as specific to the encoding"""
+	match = _vary.search(header)
+	if match is None:
+		header += "Vary: Accept-Encoding\n"
+	elif "accept-encoding" not in match.group(1).lower():
+		header = header[:match.end(1)] + ", Accept-Encoding" + header[match.end(1):]
+	header = _etag.sub(lambda m: '%s-%s"' % (m.group(1), encoding), header)
+	return header + "Content-Encoding: %s\n" % encoding if compressed else header
+
+
+def write_response(response, stream = None, accept_encoding = None):
+	"""
+	Write an HTTP response (as produced, e.g., by :py:func:`~.rdfa.extract_rdf`) to the output, compressing the body if the client accepts it and the body is large enough.
+
+	:param str response: the response, i.e., the header lines, an empty line, and the body
+	:param stream: binary output stream; if ``None``, the (binary) standard output is used
+	:param str accept_encoding: the value of the ``Accept-Encoding`` header of the request; if ``None``, the ``HTTP_ACCEPT_ENCODING`` environment variable is used
+	"""
+	if stream is None:
+		stream = sys.stdout.buffer if PY3 else sys.stdout
+	if accept_encoding is None:
+		accept_encoding = os.environ.get("HTTP_ACCEPT_ENCODING")
+	# Anything printed before must precede the response
+	sys.stdout.flush()
+
+	(header, separator, body) = response.partition("\n\n")
+	encoding = negotiate_encoding(accept_encoding) if separator else None
+	if encoding is None or re.search(r"^Content-Encoding:", header, re.IGNORECASE | re.MULTILINE):
+		stream.write(response.encode("utf-8"))
+		stream.flush()
+		return
+
+	if len(body) < compression_threshold:
+		# a 304 response, or a small body: the headers are those of the negotiated variant, but the body is not compressed
+		stream.write((_add_header(header + "\n", encoding, compressed = False) + "\n" + body).encode("utf-8"))
+		stream.flush()
+		return
+
+	stream.write((_add_header(header + "\n", encoding) + "\n").encode("utf-8"))
+	encoder = CompressingStream(stream, encoding)
+	for start in range(0, len(body), chunk_size):
+		encoder.write(body[start:start + chunk_size])
+	encoder.close()
+	stream.flush()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Entity tags and conditional responses for the extraction results.
+
+The ``ETag`` of a response is derived from a digest of the result graph (see :py:func:`graph_digest`) and of the output format. The digest does not depend on the order of the triples, nor on the labels of the blank nodes: parsing an unchanged page again yields a graph with new blank node labels, but with the same digest. If the ``If-None-Match`` header of the request (available to a CGI script as the ``HTTP_IF_NONE_MATCH`` environment variable) matches the tag, a ``304 Not Modified`` response is returned without serializing the graph.
+
+Because the serializations of two such graphs differ in the blank node labels, the tag is a *weak* validator (i.e., the two responses are semantically, but not byte by byte, equivalent); the comparison for ``If-None-Match`` is weak anyway.
+
+The ``Cache-Control`` and ``Vary`` headers added to the responses are set by the module constants below; they can be changed, e.g., by the CGI scripts.
+
+An incomplete result, i.e., when the time budget of the request ran out (see :py:class:`~.pyrdfa.utils.Deadline`), gets no ``ETag``; it is marked by a ``Warning`` header instead, and must not be cached (see :py:func:`incomplete_response`).
+
+**Module constants:**
+
+.. py:data:: cache_control
+
+   The value of the ``Cache-Control`` header of the responses; ``None`` means no such header
+
+.. py:data:: vary
+
+   The value of the ``Vary`` header of the responses; ``None`` means no such header
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+import os
+import re
+import hashlib
+
+from rdflib import BNode
+
+from .serializers import serialize_graph, NTriplesWriter
+
+cache_control = "public, max-age=600"
+vary          = None
+
+# Maximum number of refinement rounds for the blank node signatures
+_max_rounds = 8
+_encoding_suffix = re.compile(r'-(gzip|br)"$')
+
+
+def _sha1(value):
+	return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+
+def graph_digest(graph):
+	"""
+	Compute a digest of a graph that does not depend on the order of the triples nor on the labels of the blank nodes.
+
+	Each blank node gets a signature, computed through iterative refinement: the initial signature is the same for all blank nodes, and each round combines the signature of a blank node with the (sorted) signatures of its triples, where the other blank node of a triple (if any) is replaced by its signature from the previous round. The refinement stops when the number of different signatures does not grow any more. The digest is then the SHA-1 hash of the sorted lines of the N-Triples serialization of the graph, with the blank nodes replaced by their signatures.
+
+	Isomorphic graphs have the same digest. Non isomorphic graphs may only have the same digest if some of their blank nodes cannot be distinguished by the refinement, which requires very regular blank node structures that do not occur in practice.
+
+	:param graph: the ``RDFLib`` Graph
+	:return: the hexadecimal digest
+	:rtype: str
+	"""
+	encode  = NTriplesWriter(None).term
+	ground  = []
+	triples = []
+	colors  = {}
+	for (s, p, o) in graph:
+		s_blank = type(s) is BNode
+		o_blank = type(o) is BNode
+		if s_blank or o_blank:
+			triples.append((s if s_blank else encode(s), s_blank, encode(p), o if o_blank else encode(o), o_blank))
+			if s_blank: colors[s] = ""
+			if o_blank: colors[o] = ""
+		else:
+			ground.append("%s %s %s" % (encode(s), encode(p), encode(o)))
+
+	distinct = 1
+	for i in range(_max_rounds):
+		if not colors:
+			break
+		signatures = dict((bnode, []) for bnode in colors)
+		for (s, s_blank, p, o, o_blank) in triples:
+			if s_blank:
+				signatures[s].append("+%s %s" % (p, colors[o] if o_blank else o))
+			if o_blank:
+				signatures[o].append("-%s %s" % (p, colors[s] if s_blank else s))
+		colors = dict((bnode, _sha1(colors[bnode] + "|" + "|".join(sorted(signatures[bnode])))) for bnode in colors)
+		count = len(set(colors.values()))
+		if count == distinct and i > 0:
+			break
+		distinct = count
+
+	lines = ground
+	for (s, s_blank, p, o, o_blank) in triples:
+		lines.append("%s %s %s" % (colors[s] if s_blank else s, p, colors[o] if o_blank else o))
+	lines.sort()
+	return _sha1("\n".join(lines))
+
+
+def graph_etag(graph, output_format):
+	"""
+	The (weak) entity tag of the serialization of a graph.
+
+	:param graph: the ``RDFLib`` Graph
+	:param str output_format: the output format (see :py:func:`~.serializers.serialize_graph`)
+	:return: the value of the ``ETag`` header
+	:rtype: str
+	"""
+	return 'W/"%s"' % _sha1("%s %s" % (graph_digest(graph), output_format))
+
+
+def etag_matches(etag, if_none_match):
+	"""
+	Check whether an entity tag matches the value of an ``If-None-Match`` header, using the weak comparison. The tags of the compressed versions of the response (i.e., with ``-gzip`` or ``-br`` appended) also match.
+
+	:param str etag: the entity tag
+	:param str if_none_match: the value of the header; may be ``None``
+	:rtype: bool
+	"""
+	if not if_none_match:
+		return False
+	if if_none_match.strip() == "*":
+		return True
+	opaque = etag[2:] if etag.startswith("W/") else etag
+	for candidate in if_none_match.split(","):
+		candidate = candidate.strip()
+		if candidate.startswith("W/"):
+			candidate = candidate[2:]
+		# The tag of a compressed response has the encoding appended (see :py:mod:`~.compression`)
+		if _encoding_suffix.sub('"', candidate) == opaque:
+			return True
+	return False
+
+
+def cache_headers(etag):
+	"""
+	The caching related headers of a response.
+
+	:param str etag: the entity tag
+	:return: the header lines, each terminated by a new line
+	:rtype: str
+	"""
+	retval = "ETag: %s\n" % etag
+	if cache_control:
+		retval += "Cache-Control: %s\n" % cache_control
+	if vary:
+		retval += "Vary: %s\n" % vary
+	return retval
+
+
+def conditional_response(graph, output_format, if_none_match = None):
+	"""
+	Serialize a graph into an HTTP response with caching headers, or return a ``304 Not Modified`` response if the client has the same result already.
+
+	:param graph: the ``RDFLib`` Graph
+	:param str output_format: the format requested by the user (see :py:func:`~.serializers.serialize_graph`)
+	:param str if_none_match: the value of the ``If-None-Match`` header of the request; if ``None``, the ``HTTP_IF_NONE_MATCH`` environment variable is used
+	:return: the HTTP response
+	:rtype: str
+	"""
+	if if_none_match is None:
+		if_none_match = os.environ.get("HTTP_IF_NONE_MATCH")
+	etag = graph_etag(graph, output_format)
+	if etag_matches(etag, if_none_match):
+		return "Status: 304 Not Modified\n" + cache_headers(etag) + "\n"
+	return cache_headers(etag) + serialize_graph(graph, output_format)
+
+
+def incomplete_headers():
+	"""
+	The headers of an incomplete response.
+
+	:return: the header lines, each terminated by a new line
+	:rtype: str
+	"""
+	return 'Warning: 199 - "Incomplete result: the time budget of the request ran out"\nCache-Control: no-store\n'
+
+
+def incomplete_response(graph, output_format):
+	"""
+	Serialize an incomplete graph (i.e., the time budget of the request ran out) into an HTTP response; the response is marked by a ``Warning`` header, and must not be cached.
+
+	:param graph: the ``RDFLib`` Graph
+	:param str output_format: the format requested by the user (see :py:func:`~.serializers.serialize_graph`)
+	:return: the HTTP response
+	:rtype: str
+	"""
+	return incomplete_headers() + serialize_graph(graph, output_format)
+
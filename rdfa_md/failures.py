@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Negative caching of failing requests.
+
+Sources that cannot be retrieved (e.g., because the server returns a ``404`` status) or cannot be parsed lead to an HTML error page, which includes a formatted traceback (see :py:func:`~.utils.handle_general_exception` and :py:func:`~.utils.handle_http_exception`). Misbehaving clients tend to retry such requests in tight loops; with :py:func:`negative_cached`, the error response is kept, ready to be returned, for a short time (:py:data:`failure_ttl`), i.e., a retry of the same request gets the same response, with the same status, without retrieving and parsing the source again.
+
+Only the lasting failures are kept, i.e., the responses with a ``4xx`` status and without a ``Cache-Control: no-store`` header. That header is set for the failures that may not happen again (network errors, upstream errors other than ``404`` and ``410``, and the time budget of the request running out, see :py:func:`~.utils.handle_general_exception` and :py:func:`~.utils.handle_http_exception`); the ``5xx`` responses are never kept either. The responses are kept in memory, for the threads of a process, and on disk, in the ``failures`` subdirectory of the cache directory (see :py:mod:`~.pyrdfa.cachedir`), for the separate CGI processes. The requests are identified by the same key as for the coalescing of requests (see :py:func:`~.singleflight.request_key`), i.e., by the URI and all the options; requests with uploaded or direct text input are not cached.
+
+**Module constants:**
+
+.. py:data:: failure_ttl
+
+   The time, in seconds, a failure response is kept
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+import os
+import re
+import time
+import tempfile
+import threading
+
+from .pyrdfa.cachedir import cache_directory
+
+failure_ttl = 30
+
+_status   = re.compile(r"^Status:\s*(\d{3})", re.IGNORECASE | re.MULTILINE)
+_no_store = re.compile(r"^Cache-Control:.*\bno-store\b", re.IGNORECASE | re.MULTILINE)
+
+_memo = {}
+_lock = threading.Lock()
+
+
+def is_failure(response):
+	"""
+	Check whether an HTTP response reports a lasting failure, i.e., one that may be kept.
+
+	:param str response: the response, i.e., the header lines, an empty line, and the body
+	:rtype: bool
+	"""
+	header = response.partition("\n\n")[0]
+	match  = _status.search(header)
+	return match is not None and 400 <= int(match.group(1)) < 500 and _no_store.search(header) is None
+
+
+def _directory():
+	return cache_directory("failures")
+
+
+def _sweep(directory, now):
+	"""Remove the expired responses"""
+	for name in os.listdir(directory):
+		path = os.path.join(directory, name)
+		try:
+			if name.endswith(".response") and os.path.getmtime(path) < now - failure_ttl:
+				os.remove(path)
+		except OSError:
+			pass
+
+
+def cached_failure(key):
+	"""
+	The cached failure response for a request.
+
+	:param str key: the key of the request
+	:return: the response, or ``None`` if there is no (valid) cached failure
+	:rtype: str
+	"""
+	now = time.time()
+	with _lock:
+		entry = _memo.get(key)
+	if entry is not None:
+		if entry[0] >= now - failure_ttl:
+			return entry[1]
+		with _lock:
+			_memo.pop(key, None)
+	path = os.path.join(_directory(), key + ".response")
+	try:
+		stored = os.path.getmtime(path)
+		if stored < now - failure_ttl:
+			return None
+		with open(path, "rb") as f:
+			response = f.read().decode("utf-8")
+	except (IOError, OSError):
+		return None
+	with _lock:
+		_memo[key] = (stored, response)
+	return response
+
+
+def remember_failure(key, response):
+	"""
+	Cache a failure response.
+
+	:param str key: the key of the request
+	:param str response: the response
+	"""
+	now = time.time()
+	with _lock:
+		_memo[key] = (now, response)
+	try:
+		directory = _directory()
+		(fd, tmp) = tempfile.mkstemp(dir = directory)
+		with os.fdopen(fd, "wb") as f:
+			f.write(response.encode("utf-8"))
+		os.rename(tmp, os.path.join(directory, key + ".response"))
+		_sweep(directory, now)
+	except (IOError, OSError):
+		# the response is still cached in memory
+		pass
+
+
+def negative_cached(key, function):
+	"""
+	Return the cached failure response of a request, if any; otherwise run a function, and cache its result if it is a failure.
+
+	:param str key: the key of the request (see :py:func:`~.singleflight.request_key`); if ``None``, the function is simply called
+	:param function: the function doing the work; it must return an HTTP response
+	:return: the HTTP response
+	:rtype: str
+	"""
+	if key is None:
+		return function()
+	retval = cached_failure(key)
+	if retval is None:
+		retval = function()
+		if is_failure(retval):
+			remember_failure(key, retval)
+	return retval
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Filtering of the extracted graphs by types and predicates.
+
+Users are often interested in a small part of the data only (e.g., the ``schema:Product`` resources of a shop page, without the navigation or the tracking data). A :py:class:`GraphFilter` selects, once the source has been parsed (i.e., before serialization):
+
+- the resources with one of the requested types (or all subjects, if no type is requested), and
+- their "closure", i.e., the resources reachable from them via the objects of their triples, up to an optional depth.
+
+The filter is applied to the complete graph of the source, and not while the parser generates the triples: the type of a resource may only be known from a triple generated after the other triples of that resource, and the closure can only be computed when all triples are known. The selected triples are copied into the graph that is serialized, i.e., the filter does not reduce the memory used for the parsing, only the size of the output.
+
+If predicates are requested, only the triples with these predicates are kept (and followed); ``rdf:type`` and the ``rdf:first``/``rdf:rest`` triples of lists are always kept, so that the types of the resources and the lists used as values remain visible.
+
+The types and predicates are given as absolute IRIs, as CURIEs using the prefixes of the `RDFa initial context <https://www.w3.org/2011/rdfa-context/rdfa-1.1>`_ (e.g., ``schema:Product``), or as simple terms, which are interpreted as schema.org terms (e.g., ``Product``); see :py:func:`expand_iri`.
+
+**Module constants:**
+
+.. py:data:: default_vocabulary
+
+   The vocabulary used for simple terms
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+import re
+from collections import deque
+
+from rdflib import URIRef, Literal, RDF
+
+from .pyrdfa.initialcontext import initial_prefixes
+
+default_vocabulary = "http://schema.org/"
+
+# These predicates are kept even if they are not among the requested ones
+_STRUCTURAL = frozenset([RDF.type, RDF.first, RDF.rest])
+_separator  = re.compile(r"[\s,]+")
+
+
+def expand_iri(value):
+	"""
+	Expand a type or a predicate, as given by the user, into an IRI.
+
+	:param str value: an absolute IRI (e.g., ``http://schema.org/Product``), a CURIE using a prefix of the RDFa initial context (e.g., ``schema:Product``), or a term (e.g., ``Product``)
+	:rtype: URIRef
+	"""
+	if ":" in value:
+		prefix, reference = value.split(":", 1)
+		if not reference.startswith("//") and prefix in initial_prefixes:
+			return URIRef(initial_prefixes[prefix] + reference)
+		return URIRef(value)
+	return URIRef(default_vocabulary + value)
+
+
+def parse_iri_list(value):
+	"""
+	Expand a list of types or predicates, as given by the user.
+
+	:param str value: the IRIs, CURIEs, or terms (see :py:func:`expand_iri`), separated by white spaces or commas; may be ``None``
+	:return: the expanded IRIs, or ``None`` if there is none
+	:rtype: frozenset of URIRef or None
+	"""
+	if not value:
+		return None
+	retval = frozenset(expand_iri(item) for item in _separator.split(value.strip()) if item)
+	return retval if retval else None
+
+
+class GraphFilter(object):
+	"""
+	Filter of a graph, selecting the triples of the resources with the requested types and their closure.
+
+	:param types: the requested types; if ``None``, all subjects are selected
+	:type types: set of URIRef or None
+	:param predicates: the requested predicates; if ``None``, all predicates are kept
+	:type predicates: set of URIRef or None
+	:param depth: maximum number of steps followed from the selected resources to the resources in their closure; 0 means only the triples of the selected resources are kept, ``None`` means no limit
+	:type depth: int or None
+
+	**Class methods:**
+	"""
+	def __init__(self, types = None, predicates = None, depth = None):
+		self.types      = frozenset(types) if types else None
+		self.predicates = (frozenset(predicates) | _STRUCTURAL) if predicates else None
+		self.depth      = depth
+
+	@property
+	def active(self):
+		"""Whether the filter removes anything at all"""
+		return self.types is not None or self.predicates is not None
+
+	def _keep(self, triple):
+		return self.predicates is None or triple[1] in self.predicates
+
+	def roots(self, graph):
+		"""
+		The resources selected by type.
+
+		:param graph: the ``RDFLib`` Graph
+		:return: list of the selected resources, in the order they appear in the graph
+		"""
+		retval = []
+		seen   = set()
+		for t in self.types:
+			for (s, p, o) in graph.triples((None, RDF.type, t)):
+				if s not in seen:
+					seen.add(s)
+					retval.append(s)
+		return retval
+
+	def triples(self, graph):
+		"""
+		Generate the triples of the graph that pass the filter.
+
+		:param graph: the ``RDFLib`` Graph
+		:return: generator of (subject, predicate, object) tuples
+		"""
+		if self.types is None:
+			# Every subject is selected, i.e., the closure is the full graph; only the predicates matter
+			for triple in graph.triples((None, None, None)):
+				if self._keep(triple):
+					yield triple
+			return
+
+		roots   = self.roots(graph)
+		visited = set(roots)
+		queue   = deque((root, 0) for root in roots)
+		while queue:
+			(resource, level) = queue.popleft()
+			for triple in graph.triples((resource, None, None)):
+				if not self._keep(triple):
+					continue
+				yield triple
+				o = triple[2]
+				if not isinstance(o, Literal) and o not in visited and (self.depth is None or level < self.depth):
+					visited.add(o)
+					queue.append((o, level + 1))
+
+	def filter(self, graph, target):
+		"""
+		Add the triples of a graph that pass the filter to another graph. The prefixes bound in the graph are also bound in the target graph.
+
+		:param graph: the ``RDFLib`` Graph to be filtered
+		:param target: the ``RDFLib`` Graph to which the triples are added
+		:return: the target graph
+		"""
+		for (prefix, namespace) in graph.namespaces():
+			target.bind(prefix, namespace)
+		for triple in self.triples(graph):
+			target.add(triple)
+		return target
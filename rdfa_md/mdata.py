@@ -9,16 +9,13 @@ from __future__ import print_function
 import sys
 PY3 = (sys.version_info[0] >= 3)
 
-if PY3:
-	from urllib.error import HTTPError
-else:
-	from urllib2 import HTTPError
-
-# The import to cgi is necessary for the proper documentation!
-import cgi
-from rdflib import Graph
-from rdflib.plugins.parsers.pyRdfa.host import MediaTypes
-from .utils import FormValues, handle_http_exception, handle_general_exception
+from .pages import serialize_paged
+from .etag import conditional_response, incomplete_response
+from .singleflight import coalesce, request_key
+from .failures import negative_cached
+from .pyrdfa import HTTPError
+from .api import microdata_graph
+from .utils import FormValues, acceptable_source, handle_http_exception, handle_general_exception, handle_invalid_uri
 
 #########################################################################################
 # RDF Extraction:  use the RDFLib parser to extract the RDF graph, serialize it and
@@ -26,66 +23,46 @@ from .utils import FormValues, handle_http_exception, handle_general_exception
 # In case or problems, an HTTP response is generated incorporating the Exception data and
 # some basic information on the calling parameters.
 #########################################################################################
-def extract_microdata(uri, form) :
+def extract_microdata(uri, form, environ = None) :
 	"""
 	Extract microdata data from HTML and returns the resulting RDF data.
 
 	:param str uri: URI for the HTML data. Note that the ``text:`` and ``uploaded`` fake URI values are treated separately; the former is for textual intput (in which case a ``StringIO`` instance is used to get the data) and the latter is for uploaded file, where the form gives access to the file directly.
 
 	:param cgi.FieldStorage form: the query parameters of the original request
+
+	:param dict environ: the CGI variables of the request; if ``None``, the environment of the process is used (see :py:func:`~.rdfa.extract_rdf`)
 	
 	:return: HTTP response, containing the RDF data encoded in the format requested by the user (default: ``turtle``), or an error message if applicable
 	:rtype: str
 
-	The function parses the HTML content using the built-in ``RDFLib`` microdata parser, and serializes the resulting RDF data using the serializaiton format requested by the user and returns the results. Serialization relies on the built-in ``RDFLib`` serializer for ``turtle``, ``nt``, or ``RDF/XML``, and on an ``RDFLib`` extension package (``rdflib_jsonld``) for ``JSON-LD``.
+	Only the ``http`` and ``https`` URIs are retrieved (see :py:func:`~.utils.acceptable_source`); for any other URI a ``400`` response is returned. The function parses the HTML content using the microdata parser of the package (see :py:mod:`~rdfa_md.pymicrodata`), through :py:func:`~.api.microdata_graph` (i.e., this function is the HTTP adapter around it), and serializes the resulting RDF data using the serializaiton format requested by the user and returns the results. Serialization is done by :py:func:`~.serializers.serialize_graph`. If the ``types`` or ``predicates`` options are used, only the selected triples are serialized (see :py:mod:`~.filters`). If ``paged=true`` is used, the result is stored on the server and only its first page is returned (see :py:mod:`~.pages`). Otherwise the response carries an ``ETag`` (and the configured ``Cache-Control`` and ``Vary`` headers); if it matches the ``If-None-Match`` header of the request, a ``304 Not Modified`` response is returned without serializing the graph (see :py:mod:`~.etag`). Identical requests for the same URI arriving while the first one is processed wait for, and share, its result (see :py:mod:`~.singleflight`). If the request fails, the error response is kept for a short time, and returned right away if the same request is repeated (see :py:mod:`~.failures`). If the time budget of the request (see the ``timeout`` option of :py:class:`~.utils.FormValues`) runs out after the parsing, the items converted so far are returned, with a ``Warning`` header (see :py:func:`~.etag.incomplete_response`).
 	"""
+	if not acceptable_source(uri):
+		return handle_invalid_uri(uri, "Error in extracting microdata")
+	form_values = FormValues(form, environ)
+	key = request_key("microdata", uri, form, environ)
+	return negative_cached(key, lambda: coalesce(key, lambda: _extract_microdata(uri, form_values), form_values.deadline))
 
-	form_values = FormValues(form)
+
+def _extract_microdata(uri, form_values) :
+	"""The real work of :py:func:`extract_microdata`, with the values of the form (see :py:class:`~.utils.FormValues`); the time budget of the request includes the wait for an identical request in flight"""
 
 	# Collect the data, depending on what mechanism is used in the form
 	input, base = form_values.get_source_and_base(uri)
 
-	# Almost ready to work; creating the two RDF Graphs
-	output_graph    = Graph()
-
 	# The graph is serialized in the required format, and returned
 	try :
-		# This is the real meat: calling out to the RDFa parser.
-		output_graph.parse(input,
-						   format              = "microdata",
-						   vocab_expansion     = form_values.vocab_expansion,
-						   vocab_cache         = form_values.vocab_cache
-						   )
+		# This is the real meat: calling out to the microdata parser, see the api module
+		options = form_values.service_options()
+		result  = microdata_graph(input, options, base, form_values.deadline)
 
-		# "header" collects the HTTP response; first the header with the content type,
-		# then the real data
-		if form_values.output_format == "nt":
-			header = 'Content-Type: application/n-triples; charset=utf-8\n'
-			format = "nt"
-		elif form_values.output_format == "turtle":
-			header = 'Content-Type: text/turtle; charset=utf-8\n'
-			format = "turtle"
-		elif form_values.output_format == "json-ld" or form_values.output_format == "json":
-			# This requires extra care, because the JSON-LD serializer is a separate
-			# plugin for RDFLib (alas...)
-			# If this is not successful, we are falling back on turtle
-			try:
-				# check if the json-ld parser can be registered in the first place
-				from rdflib.plugin import register
-				from rdflib.serializer import Serializer
-				from rdflib_jsonld.serializer import JsonLDSerializer
-				register("json-ld", Serializer, "rdflib_jsonld.serializer", "JsonLDSerializer")
-				header = 'Content-Type: application/ld+json; charset=utf-8\n'
-				format = "json-ld"
-			except:
-				# There is no JSON-LD serializer, falling back on turtle
-				header = 'Content-Type: text/turtle; charset=utf-8\n'
-				format = "turtle"
-		else:
-			header = 'Content-Type: application/rdf+xml; charset=utf-8\n'
-			format = "pretty-xml"
-		# Extra empty line to end the HTTP response header
-		return header + "\n" + output_graph.serialize(format=format)
+		output_format = form_values.serialization_format()
+		if options.paged:
+			return serialize_paged(result.graph, output_format, options.page_size)
+		if result.truncated:
+			return incomplete_response(result.graph, output_format)
+		return conditional_response(result.graph, output_format, form_values.environ.get("HTTP_IF_NONE_MATCH", ""))
 	except HTTPError:
 		return handle_http_exception(uri, "HTTP Error in extracting microdata")
 	except Exception as e:
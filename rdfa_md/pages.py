@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Paged retrieval of large extraction results.
+
+A document yielding hundreds of thousands of triples leads to a response that may take longer to produce and to transfer than what the proxies in front of the services accept. If the ``paged=true`` option is used (with the ``nt`` or ``json-ld`` formats), the extraction result is stored on the server, and only its first page is returned. The response includes a ``Link`` header, with the ``next`` relation, referring to the next page through a ``cursor`` query parameter; the subsequent pages are served from the stored result, i.e., without retrieving and parsing the source again.
+
+The results are stored, in N-Triples, in a directory (see :py:class:`ResultStore`); the byte offsets of the pages are stored alongside, i.e., a page is retrieved by reading a single slice of a file. All files are written atomically (via a rename), i.e., the store can be shared by concurrent CGI processes. A result expires after a fixed time; expired results are removed, and the oldest results are removed if the total size of the stored results exceeds a limit.
+
+**Module constants:**
+
+.. py:data:: default_page_size
+
+   Default number of triples in a page
+
+.. py:data:: default_ttl
+
+   Default lifetime of a stored result, in seconds
+
+.. py:data:: default_max_size
+
+   Default limit, in bytes, of the total size of the stored results
+
+.. py:data:: paged_formats
+
+   The formats for which paging is available
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+import os
+import re
+import json
+import time
+import uuid
+import tempfile
+
+from rdflib import Graph
+
+from .serializers import serialize_graph, serialize_jsonld, NTriplesWriter
+from .utils       import FormValues
+from .pyrdfa.cachedir import cache_directory
+
+default_page_size = 10000
+default_ttl       = 15 * 60
+default_max_size  = 256 * 1024 * 1024
+paged_formats     = ("nt", "json-ld", "json")
+
+_cursor = re.compile(r"^([0-9a-f]{32})-(\d+)$")
+
+
+class _CountingFile(object):
+	"""Binary file accepting (unicode) strings, and counting the bytes written"""
+	def __init__(self, f):
+		self.f    = f
+		self.size = 0
+
+	def write(self, data):
+		data = data.encode("utf-8")
+		self.f.write(data)
+		self.size += len(data)
+
+
+class _SameLabels(dict):
+	"""Blank node context for the N-Triples parser keeping the labels of the blank nodes, i.e., the same blank node has the same label in all the pages"""
+	def get(self, key, default = None):
+		return key
+
+
+class ResultStore(object):
+	"""
+	File based store of extraction results. Each result is stored in two files: ``<token>.nt`` for the triples and ``<token>.json`` for the metadata (expiration time, output format, and the byte offsets of the pages). The metadata file is written last, i.e., a result is visible only when it is complete.
+
+	:param str directory: the directory of the stored results; if ``None``, the ``results`` subdirectory of the cache directory (see :py:mod:`~.pyrdfa.cachedir`) is used
+	:param int ttl: lifetime of a result, in seconds
+	:param int max_size: limit of the total size of the stored results, in bytes
+
+	**Class methods:**
+	"""
+	def __init__(self, directory = None, ttl = default_ttl, max_size = default_max_size):
+		self.directory = directory if directory is not None else cache_directory("results")
+		self.ttl       = ttl
+		self.max_size  = max_size
+		if not os.path.isdir(self.directory):
+			os.makedirs(self.directory)
+
+	def _path(self, token, extension):
+		return os.path.join(self.directory, token + extension)
+
+	def _remove(self, token):
+		for extension in (".json", ".nt"):
+			try:
+				os.remove(self._path(token, extension))
+			except OSError:
+				pass
+
+	def _write_meta(self, token, meta):
+		(fd, tmp) = tempfile.mkstemp(dir = self.directory)
+		with os.fdopen(fd, "w") as f:
+			json.dump(meta, f)
+		os.rename(tmp, self._path(token, ".json"))
+
+	def sweep(self, needed = 0):
+		"""
+		Remove the expired results and, if the total size of the results (plus ``needed``) is above the limit, the results closest to their expiration.
+
+		:param int needed: the size of a result about to be stored
+		"""
+		now     = time.time()
+		entries = []
+		for name in os.listdir(self.directory):
+			if not name.endswith(".json"):
+				continue
+			token = name[:-5]
+			try:
+				with open(os.path.join(self.directory, name)) as f:
+					meta = json.load(f)
+			except (IOError, OSError, ValueError):
+				continue
+			if meta["expires"] < now:
+				self._remove(token)
+			else:
+				entries.append((meta["expires"], meta["size"], token))
+		total = sum(entry[1] for entry in entries) + needed
+		for (expires, size, token) in sorted(entries):
+			if total <= self.max_size:
+				break
+			self._remove(token)
+			total -= size
+
+	def store(self, graph, output_format, page_size = default_page_size):
+		"""
+		Store a graph.
+
+		:param graph: the ``RDFLib`` Graph
+		:param str output_format: the format of the pages, used if the cursor request does not specify another one
+		:param int page_size: number of triples in a page
+		:return: the token of the stored result, or ``None`` if the result is larger than the size limit of the store
+		:rtype: str
+		"""
+		token = uuid.uuid4().hex
+		(fd, tmp) = tempfile.mkstemp(dir = self.directory)
+		offsets = [0]
+		with os.fdopen(fd, "wb") as f:
+			output = _CountingFile(f)
+			writer = NTriplesWriter(output, buffer_lines = page_size)
+			for triple in graph:
+				writer.write(triple)
+				if writer.count % page_size == 0:
+					writer.flush()
+					offsets.append(output.size)
+			writer.flush()
+		if offsets[-1] != output.size or len(offsets) == 1:
+			offsets.append(output.size)
+
+		if output.size > self.max_size:
+			os.remove(tmp)
+			return None
+		self.sweep(output.size)
+		os.rename(tmp, self._path(token, ".nt"))
+		self._write_meta(token, {
+			"expires" : time.time() + self.ttl,
+			"format"  : output_format,
+			"size"    : output.size,
+			"offsets" : offsets,
+		})
+		return token
+
+	def meta(self, token):
+		"""
+		The metadata of a stored result.
+
+		:param str token: the token of the result
+		:return: the metadata dictionary, or ``None`` if the result does not exist or has expired
+		"""
+		try:
+			with open(self._path(token, ".json")) as f:
+				meta = json.load(f)
+		except (IOError, OSError, ValueError):
+			return None
+		if meta["expires"] < time.time():
+			self._remove(token)
+			return None
+		return meta
+
+	def page(self, token, number):
+		"""
+		Get a page of a stored result.
+
+		:param str token: the token of the result
+		:param int number: the page number, starting with 0
+		:return: (N-Triples content of the page, metadata) tuple, or ``None`` if the result or the page does not exist
+		"""
+		meta = self.meta(token)
+		if meta is None or number + 1 >= len(meta["offsets"]):
+			return None
+		(start, end) = meta["offsets"][number], meta["offsets"][number + 1]
+		try:
+			with open(self._path(token, ".nt"), "rb") as f:
+				f.seek(start)
+				return f.read(end - start).decode("utf-8"), meta
+		except (IOError, OSError):
+			return None
+
+
+def _page_response(content, output_format, token, number, pages):
+	"""The HTTP response for a page: the content type, the link to the next page (if any), and the page itself"""
+	if output_format == "nt":
+		header = 'Content-Type: application/n-triples; charset=utf-8\n'
+		body   = content
+	else:
+		header = 'Content-Type: application/ld+json; charset=utf-8\n'
+		body   = serialize_jsonld(Graph().parse(data = content, format = "nt", bnode_context = _SameLabels()))
+	if number + 1 < pages:
+		header += 'Link: <?cursor=%s-%d&format=%s>; rel="next"\n' % (token, number + 1, output_format)
+	return header + "\n" + body
+
+
+def serialize_paged(graph, output_format, page_size = default_page_size, store = None):
+	"""
+	Store a graph in a result store and return its first page as an HTTP response.
+
+	:param graph: the ``RDFLib`` Graph
+	:param str output_format: the format requested by the user
+	:param int page_size: number of triples in a page
+	:param store: the result store; if ``None``, the default :py:class:`ResultStore` is used
+	:return: the HTTP response; if the format is not one of :py:data:`paged_formats`, or if the result is too large to be stored, the full serialization of the graph (see :py:func:`~.serializers.serialize_graph`)
+	:rtype: str
+	"""
+	if output_format not in paged_formats:
+		return serialize_graph(graph, output_format)
+	store = store if store is not None else ResultStore()
+	token = store.store(graph, output_format, page_size)
+	if token is None:
+		return serialize_graph(graph, output_format)
+	(content, meta) = store.page(token, 0)
+	return _page_response(content, output_format, token, 0, len(meta["offsets"]) - 1)
+
+
+def page_from_cursor(form, store = None):
+	"""
+	Return a page of a stored result, identified by the ``cursor`` value of the form.
+
+	:param cgi.FieldStorage form: the query parameters of the request; the ``format`` value, if it is one of :py:data:`paged_formats`, overrides the format of the original request
+	:param store: the result store; if ``None``, the default :py:class:`ResultStore` is used
+	:return: the HTTP response; a 404 response if the cursor is invalid, or if the result has expired
+	:rtype: str
+	"""
+	form_values = FormValues(form)
+	match = _cursor.match(form_values.get_value("cursor", ""))
+	page  = None
+	if match is not None:
+		store = store if store is not None else ResultStore()
+		page  = store.page(match.group(1), int(match.group(2)))
+	if page is None:
+		return 'Content-Type: text/plain; charset=utf-8\nStatus: 404 Not Found\n\nUnknown or expired cursor\n'
+	(content, meta) = page
+	output_format = form_values.output_format if "format" in form_values.keys and form_values.output_format in paged_formats else meta["format"]
+	return _page_response(content, output_format, match.group(1), int(match.group(2)), len(meta["offsets"]) - 1)
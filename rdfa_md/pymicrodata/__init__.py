@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Microdata to RDF converter, shipped as part of the ``rdfa_md`` package (the microdata parser plugin is not part of the ``RDFLib`` distribution any more).
+
+The converter implements the `Microdata to RDF <https://www.w3.org/TR/microdata-rdf/>`_ W3C Interest Group Note. The algorithm of the Note, if implemented literally, walks the tree for every ``@itemref`` and every item; instead, this implementation:
+
+- indexes every ``@id`` and every ``@itemscope`` element in one pass over the DOM tree (see :py:class:`~.microdata.DocumentIndex`);
+- resolves the properties of an item (including the ``@itemref`` references) in linear time, with cycle detection (see :py:meth:`~.microdata.MicrodataConversion.properties`);
+- caches the vocabulary registry lookups per ``@itemtype`` value (see :py:class:`~.registry.Registry`).
+
+The access to the source (and the HTTP errors) is shared with the RDFa processor of :py:mod:`~rdfa_md.pyrdfa`.
+
+**Module constants:**
+
+.. py:data:: ns_md
+
+   Namespace of the microdata vocabulary (used for the ``md:item`` triples)
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+from rdflib import Graph
+
+from ..pyrdfa       import FailedSource, HTTPError
+from ..pyrdfa.utils import URIOpener
+from ..pyrdfa.scope import select_element
+from .microdata     import MicrodataConversion, ns_md
+from .registry      import Registry, default_registry
+
+
+class pyMicrodata(object):
+	"""
+	Main processing class for the distillation of microdata.
+
+	:param str base: the base URI of the content; if empty, the URI of the source (if any) is used
+	:param bool vocab_expansion: whether the vocabulary expansion (based on the vocabulary registry) should be performed
+	:param bool vocab_cache: kept for compatibility with the former ``RDFLib`` plugin; the registry is part of the package, i.e., no vocabulary is retrieved from the Web
+	:param registry: the vocabulary registry; if ``None``, the default one is used
+	:type registry: :py:class:`~.registry.Registry`
+	:param str scope: if not ``None``, an ``@id`` value or a simple CSS selector (see :py:mod:`~rdfa_md.pyrdfa.scope`); only the items in the subtree of the (first) matching element are converted
+	:param deadline: the time budget of the processing; if it runs out after the parsing, the remaining items are not converted. ``None`` means no limit
+	:type deadline: :py:class:`~rdfa_md.pyrdfa.utils.Deadline`
+
+	**Class attributes:**
+
+	.. py:attribute:: truncated
+
+	   whether the conversion has been stopped because the time budget ran out, i.e., the output graph is incomplete
+
+	**Class methods:**
+	"""
+	def __init__(self, base = "", vocab_expansion = False, vocab_cache = True, registry = None, scope = None, deadline = None):
+		self.base            = base
+		self.required_base   = base
+		self.vocab_expansion = vocab_expansion
+		self.vocab_cache     = vocab_cache
+		self.registry        = registry if registry is not None else default_registry
+		self.scope           = scope
+		self.charset         = None
+		self.deadline        = deadline
+		self.truncated       = False
+
+	def _get_input(self, name):
+		"""
+		Get the content of the source; the base is also set, if it has not been provided by the caller.
+
+		:param name: a URI, a file name, or a file-like object
+		:return: the content (bytes or str)
+		"""
+		if hasattr(name, "read"):
+			return name.read()
+		elif isinstance(name, str) and (name.startswith("http:") or name.startswith("https:") or name.startswith("ftp:")):
+			opener = URIOpener(name, {"Accept" : "text/html, application/xhtml+xml;q=0.9, */*;q=0.1"}, markup_only = True, deadline = self.deadline)
+			if not self.required_base or self.required_base == name:
+				self.base = opener.location
+			self.charset = opener.charset
+			return opener.data.read()
+		else:
+			if not self.base:
+				self.base = name
+			try:
+				with open(name, "rb") as f:
+					return f.read()
+			except IOError as e:
+				raise FailedSource("Could not open %s: %s" % (name, e))
+
+	def graph_from_DOM(self, dom, graph = None):
+		"""
+		Extract the RDF triples from a DOM tree.
+
+		:param dom: DOM Document node
+		:param graph: RDFLib Graph for the output triples; if ``None``, a new graph is created
+		:return: the output graph
+		:raises ProcessingError: if a scope is set but no element matches it
+		"""
+		if graph is None:
+			graph = Graph()
+		graph.bind("md", ns_md)
+		scope = select_element(dom, self.scope) if self.scope else None
+		conversion = MicrodataConversion(dom, graph, self.base, self.vocab_expansion, self.registry, scope, self.deadline)
+		conversion.convert()
+		self.truncated = conversion.truncated
+		return graph
+
+	def graph_from_source(self, name, graph = None):
+		"""
+		Extract the RDF triples from a source.
+
+		:param name: a URI, a file name, or a file-like object
+		:param graph: RDFLib Graph for the output triples; if ``None``, a new graph is created
+		:return: the output graph
+		"""
+		import html5lib
+		data = self._get_input(name)
+		if self.charset and not isinstance(data, str):
+			# the encoding set by the HTTP header takes precedence over the one in the content
+			dom = html5lib.parse(data, treebuilder = "dom", transport_encoding = self.charset)
+		else:
+			dom = html5lib.parse(data, treebuilder = "dom")
+		return self.graph_from_DOM(dom, graph)
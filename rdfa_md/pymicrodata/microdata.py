@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+The conversion of microdata into RDF, following the `Microdata to RDF <https://www.w3.org/TR/microdata-rdf/>`_ W3C Interest Group Note (second edition).
+
+The conversion starts with one traversal of the DOM tree, collecting, in document order:
+
+- the elements with an ``@id`` (i.e., the possible targets of ``@itemref``);
+- the top level items (elements with ``@itemscope`` but without ``@itemprop``);
+- the document position and the language of the elements with ``@itemprop``.
+
+The properties of an item are then collected through a walk that starts with the children of the item and the elements referred to by ``@itemref``, and that never enters the same element twice. Each element is therefore visited at most once per item, cyclic ``@itemref`` chains terminate, and an item referring (directly or indirectly) to itself gets the subject already assigned to it instead of being converted again.
+"""
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from urllib.parse import urljoin
+else:
+	from urlparse import urljoin
+
+import re
+from collections import deque
+from xml.dom import Node
+
+from rdflib import URIRef, BNode, Literal, Namespace, RDF
+
+from ..pyrdfa        import ns_xsd
+from ..pyrdfa.parse  import DOMContent, datetime_type
+from ..pyrdfa.scope  import ancestors
+from .registry       import default_registry, RDF_TYPE
+
+ns_md = Namespace("http://www.w3.org/ns/md#")
+
+_absolute_url = re.compile(r"^[A-Za-z][A-Za-z0-9+.\-]*:")
+_integer      = re.compile(r"^[+\-]?\d+$")
+_double       = re.compile(r"^[+\-]?(\d+(\.\d*)?|\.\d+)([eE][+\-]?\d+)?$")
+
+# Elements whose property value is a URL, and the attribute holding it
+_url_attributes = {
+	"a"      : "href",
+	"area"   : "href",
+	"link"   : "href",
+	"audio"  : "src",
+	"embed"  : "src",
+	"iframe" : "src",
+	"img"    : "src",
+	"source" : "src",
+	"track"  : "src",
+	"video"  : "src",
+	"object" : "data",
+}
+
+
+def _local_name(node):
+	return node.nodeName.split(":")[-1].lower()
+
+
+def _language(node, language):
+	"""The language of an element, given the language of its parent"""
+	if node.hasAttribute("lang"):
+		return node.getAttribute("lang") or None
+	elif node.hasAttribute("xml:lang"):
+		return node.getAttribute("xml:lang") or None
+	return language
+
+
+def _html_base(top):
+	"""The value of the ``<base>`` element among the children of ``<head>``, or ``None``"""
+	for head in top.childNodes:
+		if head.nodeType == Node.ELEMENT_NODE and _local_name(head) == "head":
+			for base in head.childNodes:
+				if base.nodeType == Node.ELEMENT_NODE and _local_name(base) == "base" and base.hasAttribute("href"):
+					return base.getAttribute("href")
+	return None
+
+
+class DocumentIndex(object):
+	"""
+	The result of the single traversal of the DOM tree.
+
+	:param dom: the DOM Document node
+	:param scope: if not ``None``, the DOM Element node whose subtree is traversed; the language is then initialized from its ancestors, and the ``<base>`` element is looked for in the ``<head>`` of the document. Within a scope, an item is also taken as top level if it has an ``@itemprop`` but no enclosing item in the scope, and ``@itemref`` can only refer to elements in the scope.
+
+	**Class attributes:**
+
+	.. py:attribute:: ids
+
+	   dictionary from ``@id`` values to the (first) element with that id
+
+	.. py:attribute:: top_level_items
+
+	   the top level items, in document order
+
+	.. py:attribute:: position
+
+	   dictionary from the elements with ``@itemprop`` to their position in document order
+
+	.. py:attribute:: language
+
+	   dictionary from the elements with ``@itemprop`` to their language (possibly ``None``)
+
+	.. py:attribute:: base
+
+	   the value of the ``<base>`` element, or ``None``
+	"""
+	def __init__(self, dom, scope = None):
+		self.ids             = {}
+		self.top_level_items = []
+		self.position        = {}
+		self.language        = {}
+		self.base            = None
+
+		ELEMENT = Node.ELEMENT_NODE
+		count = 0
+		if scope is None:
+			todo = [(dom.documentElement, None, False)]
+		else:
+			language = None
+			for node in ancestors(scope):
+				language = _language(node, language)
+			self.base = _html_base(dom.documentElement)
+			todo = [(scope, language, False)]
+		while todo:
+			node, language, in_item = todo.pop()
+			count += 1
+			language = _language(node, language)
+			if node.hasAttribute("id"):
+				self.ids.setdefault(node.getAttribute("id"), node)
+			if node.hasAttribute("itemprop"):
+				self.position[node] = count
+				self.language[node] = language
+				if scope is not None and not in_item and node.hasAttribute("itemscope"):
+					self.top_level_items.append(node)
+			elif node.hasAttribute("itemscope"):
+				self.top_level_items.append(node)
+			if self.base is None and _local_name(node) == "base" and node.hasAttribute("href"):
+				self.base = node.getAttribute("href")
+			in_item = in_item or node.hasAttribute("itemscope")
+			for child in reversed(node.childNodes):
+				if child.nodeType == ELEMENT:
+					todo.append((child, language, in_item))
+
+
+class MicrodataConversion(object):
+	"""
+	Conversion of the microdata items of a DOM tree into RDF.
+
+	:param dom: the DOM Document node
+	:param graph: the RDFLib Graph receiving the triples
+	:param str base: the base URI of the document
+	:param bool vocab_expansion: whether the ``subPropertyOf`` and ``equivalentProperty`` triples of the vocabulary registry should be used to add extra triples
+	:param registry: the vocabulary registry
+	:type registry: :py:class:`~.registry.Registry`
+	:param scope: if not ``None``, the DOM Element node whose subtree is converted (see :py:class:`DocumentIndex`)
+	:param deadline: the time budget of the conversion, checked before each top level item; ``None`` means no limit
+	:type deadline: :py:class:`~rdfa_md.pyrdfa.utils.Deadline`
+
+	**Class methods:**
+	"""
+	def __init__(self, dom, graph, base = "", vocab_expansion = False, registry = default_registry, scope = None, deadline = None):
+		self.index           = DocumentIndex(dom, scope)
+		self.graph           = graph
+		self.base            = urljoin(base, self.index.base) if self.index.base is not None else base
+		self.vocab_expansion = vocab_expansion
+		self.registry        = registry
+		self.deadline        = deadline
+		# set if the conversion is stopped by the deadline
+		self.truncated       = False
+		# item element -> subject; an item is converted only once
+		self.memory          = {}
+		self.uris            = {}
+
+	def uri(self, value):
+		"""Return the (interned) URIRef for a string"""
+		try:
+			return self.uris[value]
+		except KeyError:
+			retval = self.uris[value] = URIRef(value)
+			return retval
+
+	def absolute(self, value):
+		"""Resolve a URL against the base of the document"""
+		return self.uri(urljoin(self.base, value.strip()))
+
+	def convert(self):
+		"""Convert all the top level items; each of them is also linked to the document through ``md:item``"""
+		document = URIRef(self.base) if self.base else None
+		for item in self.index.top_level_items:
+			if self.deadline is not None and self.deadline.expired():
+				self.truncated = True
+				return
+			subject = self.generate_triples(item, None)
+			if document is not None:
+				self.graph.add((document, ns_md["item"], subject))
+
+	def properties(self, item):
+		"""
+		Collect the properties of an item, i.e., the elements with ``@itemprop`` that belong to it, in document order.
+
+		:param item: the item element
+		:return: list of elements
+		"""
+		ids     = self.index.ids
+		visited = set([item])
+		pending = deque(child for child in item.childNodes if child.nodeType == Node.ELEMENT_NODE)
+		for ref in item.getAttribute("itemref").split():
+			if ref in ids:
+				pending.append(ids[ref])
+		results = []
+		while pending:
+			current = pending.popleft()
+			if current in visited:
+				continue
+			visited.add(current)
+			if not current.hasAttribute("itemscope"):
+				pending.extend(child for child in current.childNodes if child.nodeType == Node.ELEMENT_NODE)
+			if current.getAttribute("itemprop").strip():
+				results.append(current)
+		position = self.index.position
+		results.sort(key = lambda node: position[node])
+		return results
+
+	def generate_triples(self, item, settings):
+		"""
+		Generate the triples of an item.
+
+		:param item: the item element
+		:param settings: the vocabulary settings of the enclosing item, used if this item has no type
+		:type settings: :py:class:`~.registry.VocabSettings`
+		:return: the subject of the item (URIRef or BNode)
+		"""
+		if item in self.memory:
+			return self.memory[item]
+		itemid  = item.getAttribute("itemid").strip()
+		subject = self.absolute(itemid) if itemid else BNode()
+		self.memory[item] = subject
+
+		add   = self.graph.add
+		types = [t for t in item.getAttribute("itemtype").split() if _absolute_url.match(t)]
+		for t in types:
+			add((subject, RDF.type, self.uri(t)))
+		if types:
+			settings = self.registry.lookup(types[0])
+
+		lists = {}
+		for element in self.properties(item):
+			value = self.property_value(element, settings)
+			for name in element.getAttribute("itemprop").split():
+				if _absolute_url.match(name):
+					predicate = self.uri(name)
+				elif settings is not None:
+					predicate = self.uri(settings.vocab + name)
+				else:
+					# no vocabulary to generate a URI with
+					continue
+				if settings is not None and settings.is_list(name):
+					if predicate not in lists:
+						lists[predicate] = []
+					lists[predicate].append(value)
+				else:
+					add((subject, predicate, value))
+				if self.vocab_expansion and settings is not None:
+					for extra in settings.expansion(name):
+						if extra == RDF_TYPE and isinstance(value, Literal):
+							# a type must be a resource
+							continue
+						add((subject, self.uri(extra), value))
+
+		for predicate in lists:
+			add((subject, predicate, self.rdf_list(lists[predicate])))
+		return subject
+
+	def rdf_list(self, values):
+		"""Generate an RDF list of values, and return its head"""
+		add  = self.graph.add
+		head = RDF.nil
+		for value in reversed(values):
+			node = BNode()
+			add((node, RDF.first, value))
+			add((node, RDF.rest, head))
+			head = node
+		return head
+
+	def property_value(self, element, settings):
+		"""
+		The value of a property element.
+
+		:param element: the element with ``@itemprop``
+		:param settings: vocabulary settings of the item the property belongs to
+		:return: URIRef, BNode, or Literal
+		"""
+		if element.hasAttribute("itemscope"):
+			return self.generate_triples(element, settings)
+
+		name     = _local_name(element)
+		language = self.index.language.get(element)
+		if name == "meta":
+			return Literal(element.getAttribute("content"), lang = language)
+		if name in _url_attributes:
+			attr = _url_attributes[name]
+			if element.hasAttribute(attr):
+				return self.absolute(element.getAttribute(attr))
+			return Literal("")
+		if name in ("data", "meter") and element.hasAttribute("value"):
+			value = element.getAttribute("value").strip()
+			if _integer.match(value):
+				return Literal(value, datatype = ns_xsd["integer"])
+			if _double.match(value):
+				return Literal(value, datatype = ns_xsd["double"])
+			return Literal(value, lang = language)
+		if name == "time":
+			value = element.getAttribute("datetime") if element.hasAttribute("datetime") else DOMContent(element).text()
+			datatype = datetime_type(value)
+			if datatype is not None:
+				return Literal(value.strip(), datatype = datatype)
+			return Literal(value, lang = language)
+		return Literal(DOMContent(element).text(), lang = language)
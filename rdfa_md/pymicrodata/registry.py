@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+The vocabulary registry of the `Microdata to RDF <https://www.w3.org/TR/microdata-rdf/>`_ conversion: the settings (how property URIs are generated, how multiple values are handled, extra expansion triples) that depend on the vocabulary of an item.
+
+**Module constants:**
+
+.. py:data:: registry
+
+   The default registry content: a dictionary from vocabulary URIs to their settings
+
+.. py:data:: default_registry
+
+   The default :py:class:`Registry` instance
+"""
+import threading
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+
+registry = {
+	"http://schema.org/" : {
+		"propertyURI"    : "vocabulary",
+		"multipleValues" : "unordered",
+		"properties"     : {
+			"additionalType" : {"subPropertyOf" : [RDF_TYPE]},
+			"blogPosts"      : {"equivalentProperty" : ["http://schema.org/blogPost"]},
+			"musicGroupMember" : {"equivalentProperty" : ["http://schema.org/member"]},
+			"track"          : {"multipleValues" : "list"},
+		},
+	},
+	"http://microformats.org/profile/hcalendar#" : {
+		"propertyURI"    : "vocabulary",
+		"multipleValues" : "list",
+		"properties"     : {
+			"categories" : {"multipleValues" : "list"},
+		},
+	},
+}
+
+_defaults = {
+	"propertyURI"    : "vocabulary",
+	"multipleValues" : "unordered",
+	"properties"     : {},
+}
+
+
+class VocabSettings(object):
+	"""
+	Settings of one vocabulary, as found in the registry.
+
+	:param str vocab: the vocabulary URI (used to generate the property URIs)
+	:param dict entry: the registry entry; the defaults are used for missing keys
+
+	**Class methods:**
+	"""
+	__slots__ = ("vocab", "multiple_values", "properties")
+
+	def __init__(self, vocab, entry):
+		self.vocab           = vocab
+		self.multiple_values = entry.get("multipleValues", _defaults["multipleValues"])
+		self.properties      = entry.get("properties", _defaults["properties"])
+
+	def is_list(self, name):
+		"""Whether the multiple values of a property should be collected into an RDF list"""
+		return self.properties.get(name, {}).get("multipleValues", self.multiple_values) == "list"
+
+	def expansion(self, name):
+		"""The extra predicates (``subPropertyOf`` and ``equivalentProperty``) used for the vocabulary expansion of a property"""
+		prop = self.properties.get(name)
+		if not prop:
+			return ()
+		return prop.get("subPropertyOf", []) + prop.get("equivalentProperty", [])
+
+
+class Registry(object):
+	"""
+	Lookup of the vocabulary settings for item types. The result of the lookup is cached per item type: a page typically uses the same few ``@itemtype`` values many times.
+
+	:param dict content: registry content, in the same format as :py:data:`registry`
+
+	**Class methods:**
+	"""
+	def __init__(self, content = registry):
+		# longest vocabulary URIs first, so that the most specific match wins
+		self.content = sorted(content.items(), key = lambda x: -len(x[0]))
+		self.cache   = {}
+		self.lock    = threading.Lock()
+
+	def lookup(self, itemtype):
+		"""
+		Find the vocabulary settings for an item type.
+
+		:param str itemtype: the (first) item type of the item
+		:return: the settings of the vocabulary
+		:rtype: :py:class:`VocabSettings`
+		"""
+		try:
+			return self.cache[itemtype]
+		except KeyError:
+			pass
+		retval = None
+		for (vocab, entry) in self.content:
+			if itemtype.startswith(vocab):
+				retval = VocabSettings(vocab, entry)
+				break
+		if retval is None:
+			# Not in the registry: the vocabulary is derived from the type itself
+			if "#" in itemtype:
+				vocab = itemtype[:itemtype.index("#") + 1]
+			else:
+				vocab = itemtype[:itemtype.rindex("/") + 1] if "/" in itemtype else itemtype
+			retval = VocabSettings(vocab, _defaults)
+		with self.lock:
+			self.cache[itemtype] = retval
+		return retval
+
+
+default_registry = Registry()
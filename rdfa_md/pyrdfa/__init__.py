@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+RDFa 1.1 processor, shipped as part of the ``rdfa_md`` package (the RDFa parser is not part of the ``RDFLib`` distribution any more).
+
+The processor follows the structure of the former ``RDFLib`` plugin (the :py:class:`pyRdfa` class, :py:class:`~.options.Options`, :py:class:`~.host.MediaTypes`, the processor graph vocabulary, etc.) but it has been written with performance in mind:
+
+- the DOM tree is traversed only once; that single traversal feeds both the output and the processor graphs, and performs the RDFa 1.1 Lite checks and the extraction of embedded RDF, too (see :py:mod:`~.parse`);
+- the evaluation context of an element shares the prefix, term, and vocabulary mappings of its parent, and copies them only if the element changes them (see :py:mod:`~.state`);
+- term, CURIE, and IRI resolutions are memoized, and the resulting URI references (as well as blank nodes and literals) are interned, i.e., the same term is represented by the same Python object throughout a document.
+
+The same processing rules are also used, through SAX events, by the streaming processor of :py:mod:`~rdfa_md.rdfa_stream`.
+
+**Module constants:**
+
+.. py:data:: ns_rdfa
+
+   Namespace for the RDFa vocabulary terms (used in the processor graph)
+
+.. py:data:: ns_xsd
+
+   Namespace for XML Schema datatypes
+
+.. py:data:: ns_distill
+
+   Namespace for the distiller specific terms
+
+.. py:data:: RDFA_Error
+
+   Class of the error messages in the processor graph
+
+.. py:data:: RDFA_Warning
+
+   Class of the warning messages in the processor graph
+
+.. py:data:: RDFA_Info
+
+   Class of the informational messages in the processor graph
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from io import BytesIO
+else:
+	from StringIO import StringIO as BytesIO
+
+import os
+import xml.dom.minidom
+
+from rdflib import Graph, Namespace, URIRef
+
+ns_rdfa    = Namespace("http://www.w3.org/ns/rdfa#")
+ns_xsd     = Namespace("http://www.w3.org/2001/XMLSchema#")
+ns_distill = Namespace("http://www.w3.org/2007/08/pyRdfa/vocab#")
+
+RDFA_Error   = ns_rdfa["Error"]
+RDFA_Warning = ns_rdfa["Warning"]
+RDFA_Info    = ns_rdfa["Information"]
+
+RDFA_DocumentError     = ns_rdfa["DocumentError"]
+RDFA_UnresolvedCURIE   = ns_rdfa["UnresolvedCURIE"]
+RDFA_UnresolvedTerm    = ns_rdfa["UnresolvedTerm"]
+RDFA_PrefixRedefinition = ns_rdfa["PrefixRedefinition"]
+RDFA_VocabReferenceError = ns_rdfa["VocabReferenceError"]
+# Class of the warning issued if the processing is stopped because the time budget of the request ran out
+RDFA_Deadline = ns_distill["DeadlineExceeded"]
+
+
+#########################################################################################
+# Exceptions
+#########################################################################################
+class RDFaError(Exception):
+	"""
+	Superclass of the exceptions raised by the processor.
+
+	:param str msg: the error message
+	"""
+	def __init__(self, msg):
+		self.msg = msg
+		Exception.__init__(self, msg)
+
+
+class FailedSource(RDFaError):
+	"""
+	Raised when the source cannot be accessed or parsed.
+
+	:param str msg: the error message
+	:param str http_code: HTTP return code, if relevant
+	:param bool transient: whether the failure may not happen again, e.g., for a network error or if the time budget of the request ran out
+	"""
+	def __init__(self, msg, http_code = None, transient = False):
+		self.http_code = http_code
+		self.transient = transient
+		RDFaError.__init__(self, msg)
+
+
+class HTTPError(RDFaError):
+	"""
+	Raised when the HTTP access of the source returns an error code.
+
+	:param str msg: the error message
+	:param int http_code: HTTP return code
+	"""
+	def __init__(self, msg, http_code):
+		self.http_code = http_code
+		RDFaError.__init__(self, msg)
+
+
+class ProcessingError(RDFaError):
+	"""Raised for errors in the processing itself"""
+	pass
+
+
+from .host    import MediaTypes, HostLanguage, content_to_host_language, xml_host_languages
+from .host    import media_type_from_name, media_type_from_content
+from .options import Options, ns_dc, ns_ht
+from .utils   import URIOpener
+from .parse   import RDFaCore, parse_dom
+from .scope   import select_element
+
+
+#########################################################################################
+# The processor
+#########################################################################################
+class pyRdfa(object):
+	"""
+	Main processing class for the distillation of RDFa.
+
+	:param options: processing options; if ``None``, the default options are used
+	:type options: :py:class:`~.options.Options`
+	:param str base: the base URI of the content; if empty, the URI of the source (if any) is used
+	:param str media_type: the media type of the content; if empty, it is determined from the HTTP response, the file name, or the content itself
+	:param str rdfa_version: "1.0" or "1.1"; if ``None``, the version is determined from the content (defaulting to "1.1")
+	:param str scope: if not ``None``, an ``@id`` value or a simple CSS selector (see :py:mod:`~.scope`); only the subtree of the (first) matching element is processed, in the evaluation context set by its ancestors
+
+	**Class attributes:**
+
+	.. py:attribute:: options
+
+	   the processing options; the final host language is also stored there
+
+	.. py:attribute:: rdfa_version
+
+	   the RDFa version used for the last processing
+
+	**Class methods:**
+	"""
+	def __init__(self, options = None, base = "", media_type = "", rdfa_version = None, scope = None):
+		self.options       = options if options is not None else Options()
+		self.base          = base
+		self.required_base = base
+		self.media_type    = media_type
+		self.rdfa_version  = rdfa_version if rdfa_version else "1.1"
+		self.required_version = rdfa_version
+		self.scope         = scope
+		self.charset       = None
+
+	def _get_input(self, name):
+		"""
+		Get the content of the source; the media type and the base are also set, if they have not been provided by the caller.
+
+		:param name: a URI, a file name, or a file-like object
+		:return: the content (bytes or str)
+		"""
+		if hasattr(name, "read"):
+			data = name.read()
+		elif isinstance(name, str) and (name.startswith("http:") or name.startswith("https:") or name.startswith("ftp:")):
+			opener = URIOpener(name, markup_only = True, deadline = self.options.deadline)
+			data = opener.data.read()
+			self.charset = opener.charset
+			if not self.media_type and opener.content_type:
+				self.media_type = opener.content_type
+			if not self.required_base or self.required_base == name:
+				self.base = opener.location
+		else:
+			with open(name, "rb") as f:
+				data = f.read()
+			if not self.media_type:
+				self.media_type = media_type_from_name(name) or ""
+			if not self.base:
+				self.base = name
+
+		if not self.media_type or self.media_type not in content_to_host_language:
+			head = data[:1024]
+			if not isinstance(head, str):
+				head = head.decode("latin-1")
+			self.media_type = media_type_from_content(head)
+		return data
+
+	def _parse(self, data):
+		"""
+		Parse the content into a DOM tree, using the XML parser or html5lib, depending on the host language. An XHTML5 content that is not well formed XML is parsed by html5lib as a fallback.
+
+		:param data: the content
+		:return: DOM Document node
+		"""
+		host_language = self.options.host_language
+		if host_language in xml_host_languages:
+			try:
+				return xml.dom.minidom.parseString(data)
+			except Exception as e:
+				if host_language not in (HostLanguage.xhtml, HostLanguage.xhtml5):
+					raise FailedSource("XML parsing error: %s" % e)
+				self.options.add_warning("XML parsing error, falling back on the HTML5 parser: %s" % e, RDFA_DocumentError)
+				self.options.host_language = HostLanguage.html5
+		import html5lib
+		if self.charset and not isinstance(data, str):
+			# the encoding set by the HTTP header takes precedence over the one in the content
+			return html5lib.parse(data, treebuilder = "dom", transport_encoding = self.charset)
+		return html5lib.parse(data, treebuilder = "dom")
+
+	def _set_version_and_host_language(self, dom):
+		"""Finalize the RDFa version and the host language based on the DOM tree (doctype and ``@version``)"""
+		top = dom.documentElement
+		public_id = dom.doctype.publicId if dom.doctype is not None and dom.doctype.publicId else ""
+		if self.options.host_language == HostLanguage.xhtml5 and "XHTML" in public_id:
+			self.options.host_language = HostLanguage.xhtml
+		if self.required_version:
+			self.rdfa_version = self.required_version
+		elif "RDFa 1.0" in top.getAttribute("version") or "RDFa 1.0" in public_id:
+			self.rdfa_version = "1.0"
+		else:
+			self.rdfa_version = "1.1"
+
+	def graph_from_DOM(self, dom, graph = None, pgraph = None):
+		"""
+		Extract the RDF triples from a DOM tree; the triples of the processor graph are also generated (in the same traversal).
+
+		:param dom: DOM Document node
+		:param graph: RDFLib Graph for the output triples; if ``None``, a new graph is created
+		:param pgraph: RDFLib Graph for the processor graph triples; if ``None``, those triples go to ``graph`` if the options ask for the processor graph, and they are ignored otherwise
+		:return: the output graph
+		:raises ProcessingError: if a scope is set but no element matches it
+		"""
+		if graph is None:
+			graph = Graph()
+		if pgraph is None and self.options.output_processor_graph:
+			pgraph = graph
+		self.options.processor_sink = pgraph.add if pgraph is not None else None
+		self._set_version_and_host_language(dom)
+		scope = select_element(dom, self.scope) if self.scope else None
+
+		sink = graph.add if self.options.output_default_graph else (lambda t: None)
+		core = RDFaCore(self.options, self.base, self.rdfa_version, sink, graph.bind)
+		parse_dom(core, dom, scope)
+
+		if self.options.vocab_expansion and self.options.output_default_graph:
+			if self.options.deadline is not None and self.options.deadline.expired():
+				self.options.truncate("The time budget of the request ran out; the vocabulary expansion has not been performed")
+			else:
+				from .rdfs import process_rdfa_sem
+				process_rdfa_sem(graph, self.options)
+		return graph
+
+	def graph_from_source(self, name, graph = None, rdfOutput = False, pgraph = None):
+		"""
+		Extract the RDF triples from a source.
+
+		:param name: a URI, a file name, or a file-like object
+		:param graph: RDFLib Graph for the output triples; if ``None``, a new graph is created
+		:param bool rdfOutput: if ``True``, errors (e.g., HTTP errors or parsing errors) are turned into error triples in the processor graph; otherwise the exception is raised
+		:param pgraph: RDFLib Graph for the processor graph triples, see :py:meth:`graph_from_DOM`
+		:return: the output graph
+		"""
+		if graph is None:
+			graph = Graph()
+		if pgraph is None and self.options.output_processor_graph:
+			pgraph = graph
+		self.options.processor_sink = pgraph.add if pgraph is not None else None
+		try:
+			data = self._get_input(name)
+			self.options.set_host_language(self.media_type)
+			dom = self._parse(data)
+			return self.graph_from_DOM(dom, graph, pgraph)
+		except HTTPError as e:
+			if not rdfOutput: raise
+			err = self.options.add_error(e.msg, RDFA_DocumentError, name)
+			self.options.add_http_context(err, e.http_code)
+		except Exception as e:
+			if not rdfOutput: raise
+			self.options.add_error(str(e), RDFA_DocumentError, name)
+		return graph
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+The directory of the local caches (vocabularies, HTTP responses) and of the state shared by the processes of a host (stored results, coordination of requests, admission control, etc.). Each of these is kept in its own subdirectory.
+
+The directory is, in order of precedence:
+
+- the one set for the current thread, via :py:func:`using_cache_directory` (e.g., if the threads of a server serve different sites);
+- the one set for the process, via :py:func:`set_cache_directory` (e.g., by the CGI scripts or by the set up of a server);
+- the value of the ``PyRdfaCacheDir`` environment variable (kept for compatibility with the former versions of the CGI scripts);
+- ``~/.pyRdfa-cache``.
+
+The functions of this module are thread safe; the directory is never set as a side effect of a request.
+
+**Classes and functions:**
+
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+_process_directory = None
+_local             = threading.local()
+
+
+def set_cache_directory(directory):
+	"""
+	Set the cache directory for the whole process.
+
+	:param str directory: the directory; ``None`` means the default (see the module description)
+	"""
+	global _process_directory
+	_process_directory = directory
+
+
+@contextmanager
+def using_cache_directory(directory):
+	"""
+	Context manager setting the cache directory for the current thread, e.g.::
+
+		with using_cache_directory("/var/cache/rdfa"):
+			response = extract_rdf(uri, form)
+
+	:param str directory: the directory
+	"""
+	previous = getattr(_local, "directory", None)
+	_local.directory = directory
+	try:
+		yield directory
+	finally:
+		_local.directory = previous
+
+
+def cache_directory(subdirectory = None):
+	"""
+	The cache directory (or one of its subdirectories) for the current thread; the directory is created if it does not exist yet.
+
+	:param str subdirectory: the name of the subdirectory; if ``None``, the cache directory itself is returned
+	:return: the path of the directory
+	:rtype: str
+	"""
+	directory = getattr(_local, "directory", None) or _process_directory or os.environ.get("PyRdfaCacheDir") or os.path.join(os.path.expanduser("~"), ".pyRdfa-cache")
+	if subdirectory is not None:
+		directory = os.path.join(directory, subdirectory)
+	if not os.path.isdir(directory):
+		try:
+			os.makedirs(directory)
+		except OSError:
+			# a concurrent thread or process may have created it
+			pass
+	return directory
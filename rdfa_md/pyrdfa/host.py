@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Host language related definitions: media types, host languages, and the mapping between the two.
+
+**Module constants:**
+
+.. py:data:: content_to_host_language
+
+   Mapping from media types to host languages
+
+.. py:data:: xml_host_languages
+
+   Host languages whose content is parsed as XML (as opposed to HTML5)
+
+.. py:data:: html_host_languages
+
+   Host languages for which the extra rules of HTML+RDFa apply (``@lang``, ``<head>`` and ``<body>``, ``@datetime``, etc.)
+"""
+
+
+class MediaTypes(object):
+	"""Media types used in the distiller"""
+	html  = "text/html"
+	xhtml = "application/xhtml+xml"
+	svg   = "image/svg+xml"
+	smil  = "application/smil+xml"
+	atom  = "application/atom+xml"
+	xml   = "application/xml"
+	xmlt  = "text/xml"
+	nt    = "text/plain"
+
+
+class HostLanguage(object):
+	"""Host languages, i.e., the names displayed, e.g., in the validator"""
+	rdfa_core = "RDFa Core"
+	xhtml     = "XHTML+RDFa"
+	xhtml5    = "XHTML5+RDFa"
+	html5     = "HTML5+RDFa"
+	svg       = "SVG+RDFa"
+	atom      = "Atom+RDFa"
+
+
+content_to_host_language = {
+	MediaTypes.html  : HostLanguage.html5,
+	MediaTypes.xhtml : HostLanguage.xhtml5,
+	MediaTypes.svg   : HostLanguage.svg,
+	MediaTypes.smil  : HostLanguage.rdfa_core,
+	MediaTypes.atom  : HostLanguage.atom,
+	MediaTypes.xml   : HostLanguage.rdfa_core,
+	MediaTypes.xmlt  : HostLanguage.rdfa_core,
+}
+
+xml_host_languages  = (HostLanguage.rdfa_core, HostLanguage.xhtml, HostLanguage.xhtml5, HostLanguage.svg, HostLanguage.atom)
+html_host_languages = (HostLanguage.html5, HostLanguage.xhtml5, HostLanguage.xhtml)
+
+_suffixes = {
+	".html"  : MediaTypes.html,
+	".htm"   : MediaTypes.html,
+	".xhtml" : MediaTypes.xhtml,
+	".xht"   : MediaTypes.xhtml,
+	".svg"   : MediaTypes.svg,
+	".smil"  : MediaTypes.smil,
+	".atom"  : MediaTypes.atom,
+	".xml"   : MediaTypes.xml,
+}
+
+
+def media_type_from_name(name):
+	"""
+	Guess the media type from a file name or URI, based on its suffix.
+
+	:param str name: file name or URI
+	:return: a media type, or ``None`` if the suffix is unknown
+	"""
+	name = name.split("#")[0].split("?")[0].lower()
+	for suffix in _suffixes:
+		if name.endswith(suffix):
+			return _suffixes[suffix]
+	return None
+
+
+def media_type_from_content(head):
+	"""
+	Guess the media type from the first few hundred characters of the content itself.
+
+	:param str head: the beginning of the content
+	:return: a media type
+	"""
+	lower = head.lower()
+	if "<svg" in lower:
+		return MediaTypes.svg
+	if "<feed" in lower and "http://www.w3.org/2005/atom" in lower:
+		return MediaTypes.atom
+	if "http://www.w3.org/1999/xhtml" in lower and lower.lstrip().startswith("<?xml"):
+		return MediaTypes.xhtml
+	if "<html" in lower or "<!doctype html" in lower:
+		return MediaTypes.html
+	if lower.lstrip().startswith("<?xml"):
+		return MediaTypes.xml
+	return MediaTypes.html
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Local HTTP cache of the retrieved source documents, used by :py:class:`~.utils.URIOpener`.
+
+The same source is often retrieved by the RDFa extractor, the validator, and the microdata extractor within a short time. The cache stores the successful (``200``) responses and follows the rules of `RFC 7234 <https://tools.ietf.org/html/rfc7234>`_ for a shared cache:
+
+- responses with the ``no-store`` or ``private`` cache directives, or with ``Vary: *``, are not stored;
+- the freshness lifetime of a response is set by the ``s-maxage`` or ``max-age`` directives or by the ``Expires`` header; otherwise, if the response has a ``Last-Modified`` header, a heuristic lifetime (a fraction of the time since the last modification, with an upper limit) is used. The ``Age`` header is taken into account; ``no-cache`` means that the response must always be revalidated;
+- a fresh response is used without contacting the origin server; a stale response with an ``ETag`` or a ``Last-Modified`` header is revalidated through a conditional request (``If-None-Match``, ``If-Modified-Since``), and is used, with the updated headers, if the server answers with ``304 Not Modified``;
+- the request headers listed in the ``Vary`` header of a response are stored with it; the response is used only for requests with the same values for these headers.
+
+The cache is a directory (by default the ``http`` subdirectory of the cache directory, see :py:mod:`~.cachedir`), shared by all the processes on the host; each response is stored in two files, written atomically (via a rename): ``<hash>.json`` for the metadata, and a file for the content, with a unique name recorded in the metadata (i.e., a process never combines the metadata and the content of different versions of a response). The total size of the content is bounded: a running total is kept in an index file (``total.size``), updated under an exclusive (``fcntl``) lock by each process storing a response; when the total exceeds the limit, the least recently used responses are removed, until the total is well below the limit (i.e., the directory is scanned only occasionally). Without ``fcntl`` (e.g., on Windows) the index is updated without locking, i.e., the total is approximate.
+
+**Module constants:**
+
+.. py:data:: enabled
+
+   Whether the sources are cached at all
+
+.. py:data:: default_max_size
+
+   Default limit, in bytes, of the total size of the cached content
+
+.. py:data:: max_entry_size
+
+   The size, in bytes, above which a response is not cached
+
+.. py:data:: heuristic_fraction
+
+   The fraction of the time since the last modification used as heuristic freshness lifetime
+
+.. py:data:: heuristic_limit
+
+   The upper limit, in seconds, of the heuristic freshness lifetime
+"""
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import tempfile
+import threading
+from email.utils import parsedate_tz, mktime_tz, formatdate
+
+from .cachedir import cache_directory
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+enabled            = True
+default_max_size   = 128 * 1024 * 1024
+max_entry_size     = 8 * 1024 * 1024
+heuristic_fraction = 0.1
+heuristic_limit    = 24 * 3600
+
+# Headers that are not stored with the response (see RFC 7230, section 6.1)
+_hop_by_hop = frozenset(["connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailer", "transfer-encoding", "upgrade"])
+_directive  = re.compile(r'\s*([^\s=,]+)(?:\s*=\s*("[^"]*"|[^,]*))?\s*(?:,|$)')
+
+# The file with the running total of the content size
+_index_file = "total.size"
+# A sweep removes responses until the total is below this fraction of the limit
+_sweep_target = 0.8
+
+
+def _http_date(value):
+	"""The time (seconds since the epoch) of an HTTP date, or ``None``"""
+	if not value:
+		return None
+	parsed = parsedate_tz(value)
+	return mktime_tz(parsed) if parsed is not None else None
+
+
+def _directives(value):
+	"""The directives of a ``Cache-Control`` header, as a dictionary; the directives without a value map to ``None``"""
+	retval = {}
+	for (name, argument) in _directive.findall(value or ""):
+		retval[name.lower()] = argument.strip('"') if argument else None
+	return retval
+
+
+def _header(headers, name):
+	"""The value of a header in a list of (name, value) pairs; ``None`` if it is not present"""
+	name = name.lower()
+	for (key, value) in headers:
+		if key.lower() == name:
+			return value
+	return None
+
+
+def _lifetime(headers):
+	"""The freshness lifetime, in seconds, of a response (see RFC 7234, section 4.2.1)"""
+	directives = _directives(_header(headers, "Cache-Control"))
+	if "no-cache" in directives:
+		return 0
+	for name in ("s-maxage", "max-age"):
+		if name in directives:
+			try:
+				return max(0, int(directives[name]))
+			except (TypeError, ValueError):
+				return 0
+	date    = _http_date(_header(headers, "Date")) or time.time()
+	expires = _header(headers, "Expires")
+	if expires is not None:
+		expires = _http_date(expires)
+		# an invalid date means "already expired"
+		return max(0, expires - date) if expires is not None else 0
+	modified = _http_date(_header(headers, "Last-Modified"))
+	if modified is not None and modified < date:
+		return min(heuristic_limit, (date - modified) * heuristic_fraction)
+	return 0
+
+
+def _age(headers):
+	try:
+		return max(0, int(_header(headers, "Age") or 0))
+	except ValueError:
+		return 0
+
+
+def cacheable(headers):
+	"""
+	Check whether a (``200``) response may be stored.
+
+	:param headers: the response headers, as a list of (name, value) pairs
+	:rtype: bool
+	"""
+	directives = _directives(_header(headers, "Cache-Control"))
+	if "no-store" in directives or "private" in directives:
+		return False
+	if (_header(headers, "Vary") or "").strip() == "*":
+		return False
+	# A response that can neither be fresh nor revalidated is of no use
+	return _lifetime(headers) > 0 or _header(headers, "ETag") is not None or _header(headers, "Last-Modified") is not None
+
+
+class HTTPCache(object):
+	"""
+	File based HTTP cache of the source documents.
+
+	:param str directory: the directory of the cache; if ``None``, the ``http`` subdirectory of the cache directory (see :py:mod:`~.cachedir`) is used
+	:param int max_size: limit of the total size of the cached content, in bytes
+
+	The metadata of a cached response (as returned by :py:meth:`lookup`) is a dictionary with the keys ``uri``, ``file`` (the name of the content file), ``location`` (the URI after redirections), ``headers`` (list of (name, value) pairs), ``vary`` (the values of the request headers listed in the ``Vary`` header), ``time`` (the time the response was received or revalidated), ``lifetime``, ``age``, and ``size``.
+
+	**Class methods:**
+	"""
+	def __init__(self, directory = None, max_size = default_max_size):
+		self.directory = directory if directory is not None else cache_directory("http")
+		self.max_size  = max_size
+		if not os.path.isdir(self.directory):
+			try:
+				os.makedirs(self.directory)
+			except OSError:
+				# a concurrent process may have created it
+				pass
+
+	def _key(self, uri):
+		return hashlib.sha1(uri.encode("utf-8")).hexdigest()
+
+	def _read_meta(self, path):
+		try:
+			with open(path) as f:
+				return json.load(f)
+		except (IOError, OSError, ValueError):
+			return None
+
+	def _write(self, path, content):
+		(fd, tmp) = tempfile.mkstemp(dir = self.directory)
+		with os.fdopen(fd, "wb") as f:
+			f.write(content)
+		os.rename(tmp, path)
+
+	def _remove(self, *names):
+		for name in names:
+			try:
+				os.remove(os.path.join(self.directory, name))
+			except OSError:
+				pass
+
+	def lookup(self, uri, request_headers):
+		"""
+		Get the metadata of a cached response.
+
+		:param str uri: the URI of the request
+		:param dict request_headers: the headers of the request
+		:return: the metadata, or ``None`` if there is no cached response matching the request
+		:rtype: dict
+		"""
+		meta = self._read_meta(os.path.join(self.directory, self._key(uri) + ".json"))
+		if meta is None:
+			return None
+		headers = dict((key.lower(), value) for (key, value) in request_headers.items())
+		for (name, value) in meta["vary"].items():
+			if headers.get(name) != value:
+				return None
+		return meta
+
+	def is_fresh(self, meta):
+		"""
+		Check whether a cached response is fresh, i.e., whether it can be used without revalidation.
+
+		:param dict meta: the metadata of the response
+		:rtype: bool
+		"""
+		return meta["lifetime"] > meta["age"] + (time.time() - meta["time"])
+
+	def validators(self, meta):
+		"""
+		The headers of a conditional request revalidating a cached response.
+
+		:param dict meta: the metadata of the response
+		:return: the ``If-None-Match`` and/or ``If-Modified-Since`` headers; empty if the response has no validators
+		:rtype: dict
+		"""
+		retval = {}
+		etag = _header(meta["headers"], "ETag")
+		if etag is not None:
+			retval["If-None-Match"] = etag
+		modified = _header(meta["headers"], "Last-Modified")
+		if modified is not None:
+			retval["If-Modified-Since"] = modified
+		return retval
+
+	def body(self, meta):
+		"""
+		The content of a cached response; the response is also marked as recently used.
+
+		:param dict meta: the metadata of the response
+		:return: the content, or ``None`` if it is not available any more
+		:rtype: bytes
+		"""
+		try:
+			with open(os.path.join(self.directory, meta["file"]), "rb") as f:
+				retval = f.read()
+			os.utime(os.path.join(self.directory, self._key(meta["uri"]) + ".json"), None)
+		except (IOError, OSError):
+			return None
+		return retval
+
+	def store(self, uri, request_headers, location, headers, body):
+		"""
+		Store a (``200``) response, if it is cacheable.
+
+		:param str uri: the URI of the request
+		:param dict request_headers: the headers of the request
+		:param str location: the URI of the response, i.e., after redirections
+		:param headers: the response headers, as a list of (name, value) pairs
+		:param bytes body: the content
+		"""
+		if len(body) > min(max_entry_size, self.max_size) or not cacheable(headers):
+			return
+		headers  = [(key, value) for (key, value) in headers if key.lower() not in _hop_by_hop]
+		requests = dict((key.lower(), value) for (key, value) in request_headers.items())
+		vary     = [name.strip().lower() for name in (_header(headers, "Vary") or "").split(",") if name.strip()]
+		key  = self._key(uri)
+		meta = {
+			"uri"      : uri,
+			"file"     : "%s-%s.body" % (key, uuid.uuid4().hex[:12]),
+			"location" : location,
+			"headers"  : headers,
+			"vary"     : dict((name, requests.get(name)) for name in vary),
+			"time"     : time.time(),
+			"lifetime" : _lifetime(headers),
+			"age"      : _age(headers),
+			"size"     : len(body),
+		}
+		path = os.path.join(self.directory, key + ".json")
+		try:
+			previous = self._read_meta(path)
+			self._write(os.path.join(self.directory, meta["file"]), body)
+			self._write(path, json.dumps(meta).encode("utf-8"))
+			delta = len(body)
+			if previous is not None:
+				self._remove(previous["file"])
+				delta -= previous.get("size", 0)
+			self._update_total(lambda total: self._added(total, delta))
+		except (IOError, OSError):
+			# the cache is an optimization only
+			pass
+
+	def refresh(self, meta, headers):
+		"""
+		Update a cached response after a ``304 Not Modified`` answer to its revalidation (see RFC 7234, section 4.3.4).
+
+		:param dict meta: the metadata of the response
+		:param headers: the headers of the ``304`` response, as a list of (name, value) pairs
+		:return: the updated metadata
+		:rtype: dict
+		"""
+		updated = dict((key.lower(), (key, value)) for (key, value) in headers if key.lower() not in _hop_by_hop and key.lower() != "content-length")
+		merged  = [updated.pop(key.lower(), (key, value)) for (key, value) in meta["headers"]] + list(updated.values())
+		if _header(headers, "Date") is None:
+			# the freshness is computed relative to the time of the revalidation
+			merged = [(key, value) for (key, value) in merged if key.lower() != "date"] + [("Date", formatdate(usegmt = True))]
+		meta = dict(meta, headers = merged, time = time.time(), lifetime = _lifetime(merged), age = _age(headers))
+		try:
+			self._write(os.path.join(self.directory, self._key(meta["uri"]) + ".json"), json.dumps(meta).encode("utf-8"))
+		except (IOError, OSError):
+			pass
+		return meta
+
+	def _update_total(self, update):
+		"""Replace the running total of the content size by ``update(total)``, under the lock of the index file; the total is ``None`` if the index is new (or damaged)"""
+		fd = os.open(os.path.join(self.directory, _index_file), os.O_RDWR | os.O_CREAT, 0o644)
+		with os.fdopen(fd, "r+") as index:
+			if fcntl is not None:
+				fcntl.flock(index, fcntl.LOCK_EX)
+			try:
+				try:
+					total = int(index.read().strip())
+				except ValueError:
+					total = None
+				total = update(total)
+				index.seek(0)
+				index.truncate()
+				index.write("%d" % total)
+				index.flush()
+			finally:
+				if fcntl is not None:
+					fcntl.flock(index, fcntl.LOCK_UN)
+
+	def _added(self, total, delta):
+		"""The running total after storing a response; the cache is swept if the total is unknown or exceeds the limit"""
+		if total is None:
+			return self._evict(0, self.max_size)
+		if total + delta > self.max_size:
+			return self._evict()
+		return total + delta
+
+	def sweep(self, needed = 0):
+		"""
+		Remove the least recently used responses until the total size of the cached content (plus ``needed``) is within the limit; the running total is recomputed.
+
+		:param int needed: the size of a response about to be stored
+		"""
+		try:
+			self._update_total(lambda total: self._evict(needed, self.max_size))
+		except (IOError, OSError):
+			pass
+
+	def _evict(self, needed = 0, target = None):
+		"""Remove the least recently used responses until the total size (plus ``needed``) is within ``target`` (by default a fraction of the limit); return the remaining total"""
+		target  = target if target is not None else self.max_size * _sweep_target
+		entries = []
+		for name in os.listdir(self.directory):
+			if not name.endswith(".json"):
+				continue
+			path = os.path.join(self.directory, name)
+			meta = self._read_meta(path)
+			try:
+				entries.append((os.path.getmtime(path), meta["size"], name, meta["file"]))
+			except (OSError, TypeError, KeyError):
+				continue
+		total = sum(entry[1] for entry in entries)
+		for (used, size, name, body) in sorted(entries):
+			if total + needed <= target:
+				break
+			self._remove(name, body)
+			total -= size
+		return total
+
+
+# directory -> HTTPCache instance
+_default_caches = {}
+_lock           = threading.Lock()
+
+
+def default_cache():
+	"""
+	The cache used by :py:class:`~.utils.URIOpener`, i.e., the one in the cache directory of the current thread (see :py:mod:`~.cachedir`).
+
+	:return: the :py:class:`HTTPCache` instance, or ``None`` if caching is not :py:data:`enabled`
+	"""
+	if not enabled:
+		return None
+	directory = cache_directory("http")
+	with _lock:
+		if directory not in _default_caches:
+			_default_caches[directory] = HTTPCache(directory)
+		return _default_caches[directory]
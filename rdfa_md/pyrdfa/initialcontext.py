@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+The RDFa 1.1 initial contexts, i.e., the prefixes and terms that are defined without any declaration in the document. The content is "frozen" here, instead of being retrieved from the Web at each invocation.
+
+**Module constants:**
+
+.. py:data:: initial_prefixes
+
+   Prefixes of the `RDFa Core initial context <https://www.w3.org/2011/rdfa-context/rdfa-1.1>`_
+
+.. py:data:: initial_terms
+
+   Terms of the RDFa Core initial context
+
+.. py:data:: xhtml_terms
+
+   Terms of the `XHTML+RDFa initial context <https://www.w3.org/2011/rdfa-context/xhtml-rdfa-1.1>`_
+
+"""
+from .host import HostLanguage
+
+initial_prefixes = {
+	"as"      : "https://www.w3.org/ns/activitystreams#",
+	"cc"      : "http://creativecommons.org/ns#",
+	"ctag"    : "http://commontag.org/ns#",
+	"dc"      : "http://purl.org/dc/terms/",
+	"dc11"    : "http://purl.org/dc/elements/1.1/",
+	"dcat"    : "http://www.w3.org/ns/dcat#",
+	"dcterms" : "http://purl.org/dc/terms/",
+	"dqv"     : "http://www.w3.org/ns/dqv#",
+	"duv"     : "https://www.w3.org/ns/duv#",
+	"foaf"    : "http://xmlns.com/foaf/0.1/",
+	"gr"      : "http://purl.org/goodrelations/v1#",
+	"grddl"   : "http://www.w3.org/2003/g/data-view#",
+	"ical"    : "http://www.w3.org/2002/12/cal/icaltzd#",
+	"ldp"     : "http://www.w3.org/ns/ldp#",
+	"ma"      : "http://www.w3.org/ns/ma-ont#",
+	"oa"      : "http://www.w3.org/ns/oa#",
+	"og"      : "http://ogp.me/ns#",
+	"org"     : "http://www.w3.org/ns/org#",
+	"owl"     : "http://www.w3.org/2002/07/owl#",
+	"prov"    : "http://www.w3.org/ns/prov#",
+	"qb"      : "http://purl.org/linked-data/cube#",
+	"rdf"     : "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+	"rdfa"    : "http://www.w3.org/ns/rdfa#",
+	"rdfs"    : "http://www.w3.org/2000/01/rdf-schema#",
+	"rev"     : "http://purl.org/stuff/rev#",
+	"rif"     : "http://www.w3.org/2007/rif#",
+	"rr"      : "http://www.w3.org/ns/r2rml#",
+	"schema"  : "http://schema.org/",
+	"sd"      : "http://www.w3.org/ns/sparql-service-description#",
+	"sioc"    : "http://rdfs.org/sioc/ns#",
+	"skos"    : "http://www.w3.org/2004/02/skos/core#",
+	"skosxl"  : "http://www.w3.org/2008/05/skos-xl#",
+	"sosa"    : "http://www.w3.org/ns/sosa/",
+	"ssn"     : "http://www.w3.org/ns/ssn/",
+	"time"    : "http://www.w3.org/2006/time#",
+	"v"       : "http://rdf.data-vocabulary.org/#",
+	"vcard"   : "http://www.w3.org/2006/vcard/ns#",
+	"void"    : "http://rdfs.org/ns/void#",
+	"wdr"     : "http://www.w3.org/2007/05/powder#",
+	"wdrs"    : "http://www.w3.org/2007/05/powder-s#",
+	"xhv"     : "http://www.w3.org/1999/xhtml/vocab#",
+	"xml"     : "http://www.w3.org/XML/1998/namespace",
+	"xsd"     : "http://www.w3.org/2001/XMLSchema#",
+}
+
+initial_terms = {
+	"describedby" : "http://www.w3.org/2007/05/powder-s#describedby",
+	"license"     : "http://www.w3.org/1999/xhtml/vocab#license",
+	"role"        : "http://www.w3.org/1999/xhtml/vocab#role",
+}
+
+XHTML_VOCAB = "http://www.w3.org/1999/xhtml/vocab#"
+
+xhtml_terms = dict(initial_terms)
+xhtml_terms.update(dict((t, XHTML_VOCAB + t) for t in (
+	"alternate", "appendix", "bookmark", "cite", "chapter", "contents",
+	"copyright", "first", "glossary", "help", "icon", "index",
+	"itsRules", "last", "license", "meta", "next", "p3pv1",
+	"prev", "previous", "role", "section", "start", "stylesheet",
+	"subsection", "top", "up",
+	"transformation",
+)))
+
+
+def initial_context(host_language):
+	"""
+	Return the prefix and term mappings of the initial context for a host language.
+
+	:param str host_language: one of the :py:class:`~.host.HostLanguage` values
+	:return: (prefixes, terms) tuple of dictionaries; these should not be modified by the caller
+	"""
+	if host_language == HostLanguage.xhtml:
+		return initial_prefixes, xhtml_terms
+	return initial_prefixes, initial_terms
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Options for the RDFa processing, and the generation of the processor graph messages.
+
+**Module constants:**
+
+.. py:data:: ns_dc
+
+   Dublin Core namespace, used for the descriptions and dates of the processor graph messages
+
+.. py:data:: ns_ht
+
+   Namespace of the `HTTP vocabulary <https://www.w3.org/TR/HTTP-in-RDF10/>`_, used to add the HTTP context of errors
+"""
+import datetime
+import itertools
+
+from rdflib import Namespace, URIRef, BNode, Literal, RDF
+
+from .    import ns_rdfa, ns_xsd, RDFA_Error, RDFA_Warning, RDFA_Info, RDFA_Deadline
+from .host import HostLanguage, content_to_host_language
+
+ns_dc = Namespace("http://purl.org/dc/terms/")
+ns_ht = Namespace("http://www.w3.org/2006/http#")
+
+
+class Options(object):
+	"""
+	Settable options for the RDFa processing. All parameters are also stored as class attributes.
+
+	:param bool output_default_graph: whether the output (default) graph should be generated
+	:param bool output_processor_graph: whether the processor graph should be added to the output graph, if no separate graph is provided for it
+	:param bool space_preserve: whether white spaces in plain literals should be preserved
+	:param bool embedded_rdf: whether RDF content embedded in the document (Turtle in ``<script>`` for HTML, RDF/XML in ``<metadata>`` for SVG) should be added to the output
+	:param bool vocab_expansion: whether the `vocabulary expansion <https://www.w3.org/TR/rdfa-core/#s_vocab_expansion>`_ should be performed
+	:param bool vocab_cache: whether the vocabularies used for the expansion should be cached locally
+	:param bool vocab_cache_report: whether the vocabulary cache usage should be reported in the processor graph (as informational messages)
+	:param bool refresh_vocab_cache: whether the vocabulary cache should be refreshed
+	:param bool add_informational_messages: whether informational messages should be added to the processor graph
+	:param bool check_lite: whether the RDFa 1.1 Lite restrictions should be checked; non Lite attributes generate a warning and are ignored
+	:param deadline: the time budget of the processing; if it runs out, the processing stops, and the output graph is incomplete (see :py:meth:`truncate`). ``None`` means no limit
+	:type deadline: :py:class:`~.utils.Deadline`
+
+	**Additional class attributes:**
+
+	.. py:attribute:: host_language
+
+	   the host language, one of the :py:class:`~.host.HostLanguage` values
+
+	.. py:attribute:: processor_sink
+
+	   callable receiving the triples of the processor graph; set by the processor, ``None`` means the messages are ignored
+
+	.. py:attribute:: truncated
+
+	   whether the processing has been stopped (or a step has been skipped) because the time budget ran out
+
+	**Class methods:**
+	"""
+	def __init__(self, output_default_graph = True, output_processor_graph = False, space_preserve = True,
+				 embedded_rdf = False, vocab_expansion = False, vocab_cache = True, vocab_cache_report = False,
+				 refresh_vocab_cache = False, add_informational_messages = False, check_lite = False, deadline = None):
+		self.output_default_graph       = output_default_graph
+		self.output_processor_graph     = output_processor_graph
+		self.space_preserve             = space_preserve
+		self.embedded_rdf               = embedded_rdf
+		self.vocab_expansion            = vocab_expansion
+		self.vocab_cache                = vocab_cache
+		self.vocab_cache_report         = vocab_cache_report
+		self.refresh_vocab_cache        = refresh_vocab_cache
+		self.add_informational_messages = add_informational_messages or vocab_cache_report
+		self.check_lite                 = check_lite
+		self.deadline                   = deadline
+		self.truncated                  = False
+		self.host_language              = HostLanguage.rdfa_core
+		self.processor_sink             = None
+		self._counter                   = itertools.count()
+
+	def set_host_language(self, media_type):
+		"""
+		Set the host language based on a media type.
+
+		:param str media_type: the media type
+		"""
+		self.host_language = content_to_host_language.get(media_type, HostLanguage.rdfa_core)
+
+	def _add_message(self, msg, top_class, extra_class = None, context = None):
+		"""
+		Add a message to the processor graph.
+
+		:param str msg: the human readable message
+		:param URIRef top_class: RDFA_Error, RDFA_Warning, or RDFA_Info
+		:param URIRef extra_class: additional class of the message, e.g., ``rdfa:UnresolvedTerm``
+		:param context: additional context (e.g., the URI of the source), added as ``rdfa:context``
+		:return: the subject of the message, or ``None`` if there is no processor graph
+		"""
+		sink = self.processor_sink
+		if sink is None:
+			return None
+		# The counter ensures that messages created within the same microsecond keep their order when sorted by date
+		stamp = "%s.%06d" % (datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S"), next(self._counter))
+		subj = BNode()
+		sink((subj, RDF.type, top_class))
+		if extra_class is not None:
+			sink((subj, RDF.type, extra_class))
+		sink((subj, ns_dc["description"], Literal(msg)))
+		sink((subj, ns_dc["date"], Literal(stamp, datatype = ns_xsd["dateTime"])))
+		if context is not None:
+			sink((subj, ns_rdfa["context"], URIRef(context) if isinstance(context, str) else Literal("%s" % context)))
+		return subj
+
+	def add_error(self, msg, error_type = None, context = None):
+		"""Add an error message to the processor graph; see :py:meth:`_add_message` for the parameters"""
+		return self._add_message(msg, RDFA_Error, error_type, context)
+
+	def add_warning(self, msg, warning_type = None, context = None):
+		"""Add a warning message to the processor graph; see :py:meth:`_add_message` for the parameters"""
+		return self._add_message(msg, RDFA_Warning, warning_type, context)
+
+	def add_info(self, msg, info_type = None, context = None):
+		"""Add an informational message to the processor graph, provided informational messages are required; see :py:meth:`_add_message` for the parameters"""
+		if self.add_informational_messages:
+			return self._add_message(msg, RDFA_Info, info_type, context)
+		return None
+
+	def truncate(self, msg):
+		"""
+		Record that the output graph is incomplete because the time budget ran out; a warning (with the additional class ``DeadlineExceeded``) is added to the processor graph.
+
+		:param str msg: the human readable message
+		"""
+		self.truncated = True
+		self.add_warning(msg, RDFA_Deadline)
+
+	def add_http_context(self, subj, http_code):
+		"""
+		Add the HTTP context of an error, i.e., the HTTP response code.
+
+		:param subj: the subject of the error message, as returned by :py:meth:`add_error`
+		:param http_code: the HTTP response code
+		"""
+		if subj is None or self.processor_sink is None:
+			return
+		ctx = BNode()
+		self.processor_sink((subj, ns_rdfa["context"], ctx))
+		self.processor_sink((ctx, RDF.type, ns_ht["Response"]))
+		self.processor_sink((ctx, ns_ht["responseCode"], URIRef("http://www.w3.org/2006/http#%s" % http_code)))
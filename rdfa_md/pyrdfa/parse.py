@@ -0,0 +1,757 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+The RDFa processing rules (`Section 7.5 <https://www.w3.org/TR/rdfa-core/#s_sequence>`_ of the RDFa 1.1 Core specification, plus the HTML+RDFa extensions).
+
+The rules are implemented by the :py:class:`RDFaCore` class in terms of two "events": the start of an element (:py:meth:`RDFaCore.start`) and its end (:py:meth:`RDFaCore.end`). The :py:func:`parse_dom` function generates these events through one, non-recursive, traversal of a DOM tree; the same class is used by the SAX based streaming processor of :py:mod:`~rdfa_md.rdfa_stream`, too. When a DOM node is available the content of an element (for literals) is retrieved right away; otherwise the value of the literal is finalized when the element is closed.
+"""
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from urllib.parse import urljoin
+else:
+	from urlparse import urljoin
+
+import re
+from xml.dom import Node
+
+from rdflib import Graph, URIRef, BNode, Literal, RDF
+
+from .          import ns_rdfa, ns_xsd
+from .          import RDFA_UnresolvedCURIE, RDFA_UnresolvedTerm, RDFA_PrefixRedefinition
+from .host      import HostLanguage, html_host_languages
+from .state     import Mappings, ExecutionContext, UNRESOLVED_TERM
+from .initialcontext import initial_context, xhtml_terms
+from .scope     import ancestors
+
+RDF_HTML = URIRef("http://www.w3.org/1999/02/22-rdf-syntax-ns#HTML")
+XML_NS   = "http://www.w3.org/XML/1998/namespace"
+
+_datetime_patterns = [
+	(re.compile(r"^-?P(\d+Y)?(\d+M)?(\d+D)?(T(\d+H)?(\d+M)?(\d+(\.\d+)?S)?)?$"),                       ns_xsd["duration"]),
+	(re.compile(r"^-?\d{4,}-\d{2}-\d{2}T\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+\-]\d{2}:?\d{2})?$"),          ns_xsd["dateTime"]),
+	(re.compile(r"^-?\d{4,}-\d{2}-\d{2}(Z|[+\-]\d{2}:?\d{2})?$"),                                       ns_xsd["date"]),
+	(re.compile(r"^\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+\-]\d{2}:?\d{2})?$"),                               ns_xsd["time"]),
+	(re.compile(r"^-?\d{4,}-\d{2}$"),                                                                   ns_xsd["gYearMonth"]),
+	(re.compile(r"^-?\d{4,}$"),                                                                         ns_xsd["gYear"]),
+]
+
+_lite_attributes = ("about", "rev", "datatype", "inlist", "content", "rel")
+
+# Number of elements processed between two checks of the deadline
+_deadline_check = 256
+
+
+def datetime_type(value):
+	"""
+	Find the XML Schema datatype of a ``@datetime`` (or ``<time>`` content) value, as defined in HTML+RDFa.
+
+	:param str value: the lexical value
+	:return: the datatype URI, or ``None`` if the value does not match any of the date/time formats
+	"""
+	value = value.strip()
+	if value == "P":
+		return None
+	for (pattern, datatype) in _datetime_patterns:
+		if pattern.match(value):
+			return datatype
+	return None
+
+
+def xml_text(data, attribute = False):
+	"""
+	Escape a text, or an attribute value, for the markup of an XML Literal. The escaping is the one of `Canonical XML <https://www.w3.org/TR/xml-c14n11/#ProcessingModel>`_, i.e., the result does not depend on the way the content was parsed.
+
+	:param str data: the text
+	:param bool attribute: whether the text is an attribute value (in double quotes)
+	"""
+	data = data.replace("&", "&amp;").replace("<", "&lt;")
+	if attribute:
+		return data.replace('"', "&quot;").replace("\t", "&#x9;").replace("\n", "&#xA;").replace("\r", "&#xD;")
+	return data.replace(">", "&gt;").replace("\r", "&#xD;")
+
+
+def xml_start_tag(name, attributes, xmlns = None):
+	"""
+	The start tag (without the closing ``>``) of an element in the markup of an XML Literal. The namespace declarations come first, the default namespace before the prefixes in alphabetical order, followed by the other attributes in document order; the DOM and the streaming processors generate the same markup this way.
+
+	:param str name: the (qualified) name of the element
+	:param attributes: the attributes of the element, as (qualified name, value) pairs in document order
+	:param dict xmlns: in-scope namespace declarations (prefix to URI) to be added unless the element declares the same prefix itself, i.e., for the top level elements of a literal; ``None`` otherwise
+	"""
+	declarations = {}
+	others       = []
+	for (key, value) in attributes:
+		if key == "xmlns" or key.startswith("xmlns:"):
+			declarations[key[6:]] = value
+		else:
+			others.append((key, value))
+	if xmlns:
+		for prefix in xmlns:
+			if prefix != "xml" and prefix not in declarations:
+				declarations[prefix] = xmlns[prefix]
+	tag = ["<" + name]
+	for prefix in sorted(declarations):
+		tag.append(' %s="%s"' % ("xmlns:" + prefix if prefix else "xmlns", xml_text(declarations[prefix], True)))
+	for (key, value) in others:
+		tag.append(' %s="%s"' % (key, xml_text(value, True)))
+	return "".join(tag)
+
+
+def _dom_markup(node, xmlns = None):
+	"""The markup of a DOM node, see :py:meth:`DOMContent.markup`"""
+	if node.nodeType == Node.TEXT_NODE or node.nodeType == Node.CDATA_SECTION_NODE:
+		return xml_text(node.data)
+	if node.nodeType != Node.ELEMENT_NODE:
+		return node.toxml()
+	attributes = list(node.attributes.items())
+	if xmlns is not None and "" not in xmlns and node.namespaceURI and ":" not in node.nodeName and not node.hasAttribute("xmlns"):
+		# Typically the case for an HTML5 DOM, where namespaces do not appear as attributes
+		attributes.append(("xmlns", node.namespaceURI))
+	tag = xml_start_tag(node.nodeName, attributes, xmlns)
+	if not node.childNodes:
+		return tag + "/>"
+	return "%s>%s</%s>" % (tag, "".join(_dom_markup(child) for child in node.childNodes), node.nodeName)
+
+
+class _Slot(object):
+	"""Placeholder in a list mapping for a literal whose value is known only at the end of the element"""
+	__slots__ = ("value",)
+
+
+#########################################################################################
+# Access to the content of DOM elements
+#########################################################################################
+class DOMContent(object):
+	"""
+	Access to the content of a DOM element, used to generate literals.
+
+	:param node: the DOM Element node
+	"""
+	__slots__ = ("node",)
+
+	def __init__(self, node):
+		self.node = node
+
+	def text(self):
+		"""The concatenation of all the text nodes in the subtree, in document order"""
+		retval = []
+		todo = list(reversed(self.node.childNodes))
+		while todo:
+			node = todo.pop()
+			if node.nodeType == Node.TEXT_NODE or node.nodeType == Node.CDATA_SECTION_NODE:
+				retval.append(node.data)
+			elif node.nodeType == Node.ELEMENT_NODE:
+				todo.extend(reversed(node.childNodes))
+		return "".join(retval)
+
+	def markup(self, xmlns):
+		"""
+		The XML serialization of the content. The in-scope namespace declarations are added to the top level elements, so that the result can stand on its own (as required for XML Literals); the start tags are generated by :py:func:`xml_start_tag`.
+
+		:param dict xmlns: in-scope namespace declarations (prefix to URI; the default namespace has the empty string as a key)
+		"""
+		return "".join(_dom_markup(child, xmlns) for child in self.node.childNodes)
+
+
+#########################################################################################
+# The processing rules
+#########################################################################################
+class RDFaCore(object):
+	"""
+	Implementation of the RDFa processing rules.
+
+	:param options: the processing options; the host language is taken from there, and the processor graph messages are also generated through it
+	:type options: :py:class:`~.options.Options`
+	:param str base: the base URI of the document
+	:param str rdfa_version: "1.0" or "1.1"
+	:param sink: callable receiving the triples of the output graph
+	:param bind: callable binding a prefix to a namespace in the output graph (typically the ``bind`` method of an ``RDFLib`` graph); may be ``None``
+
+	URI references, literals, and blank nodes (for ``_:`` CURIEs) are interned, i.e., the same term is represented by the same Python object. To keep the memory bounded in streaming mode, the caches are emptied when they reach :py:attr:`cache_limit` entries.
+
+	**Class methods:**
+	"""
+	cache_limit = 50000
+
+	def __init__(self, options, base, rdfa_version, sink, bind = None):
+		self.options       = options
+		self.base          = base
+		self.host_language = options.host_language
+		self.html          = self.host_language in html_host_languages
+		self.html5         = self.host_language in (HostLanguage.html5, HostLanguage.xhtml5)
+		self.xml_base      = self.host_language in (HostLanguage.rdfa_core, HostLanguage.svg, HostLanguage.atom)
+		self.rdfa_1_0      = rdfa_version == "1.0"
+		self.sink          = sink
+		self.bind          = bind
+		self._uris         = {}
+		self._literals     = {}
+		self._iris         = {}
+		self._bnodes       = {}
+		self._bound        = set()
+
+	# ---------------------------------------------------------------------------------
+	# Interning
+	# ---------------------------------------------------------------------------------
+	def uri(self, value):
+		"""Return the (interned) URI reference for a string"""
+		try:
+			return self._uris[value]
+		except KeyError:
+			if len(self._uris) > self.cache_limit: self._uris.clear()
+			retval = self._uris[value] = URIRef(value)
+			return retval
+
+	def bnode(self, label):
+		"""Return the same blank node for the same ``_:label`` within the document"""
+		try:
+			return self._bnodes[label]
+		except KeyError:
+			retval = self._bnodes[label] = BNode()
+			return retval
+
+	def iri(self, base, value):
+		"""Resolve a (possibly relative) IRI against a base, and return the (interned) URI reference"""
+		key = (base, value)
+		try:
+			return self._iris[key]
+		except KeyError:
+			if len(self._iris) > self.cache_limit: self._iris.clear()
+			resolved = urljoin(base, value) if base else value
+			# urljoin drops an empty fragment, which is significant in an IRI (e.g., vocab="http://example.org/ns#")
+			if value.endswith("#") and not resolved.endswith("#"):
+				resolved += "#"
+			retval = self._iris[key] = self.uri(resolved)
+			return retval
+
+	def literal(self, value, language = None, datatype = None):
+		"""Return the (interned) literal; an invalid language tag is dropped (with a warning) rather than making the processing fail"""
+		key = (value, language, datatype)
+		try:
+			return self._literals[key]
+		except KeyError:
+			pass
+		try:
+			retval = Literal(value, lang = language, datatype = datatype)
+		except Exception:
+			self.options.add_warning("Invalid language tag '%s'; ignored" % language)
+			retval = Literal(value, datatype = datatype)
+		if len(self._literals) > self.cache_limit: self._literals.clear()
+		self._literals[key] = retval
+		return retval
+
+	def used_prefix(self, prefix, iri):
+		"""Bind a prefix in the output graph the first time it is used"""
+		if self.bind is not None and prefix not in self._bound:
+			self._bound.add(prefix)
+			try:
+				self.bind(prefix, iri)
+			except Exception:
+				pass
+
+	# ---------------------------------------------------------------------------------
+	# Resolution of attribute values
+	# ---------------------------------------------------------------------------------
+	def _resource(self, context, value):
+		"""Resolve a SafeCURIEorCURIEorIRI value (used for ``@about`` and ``@resource``); in RDFa 1.0 only safe CURIEs are considered"""
+		if len(value) > 1 and value[0] == "[" and value[-1] == "]":
+			retval = context.mappings.curie(value[1:-1])
+			if retval is None:
+				self.options.add_warning("Unresolvable safe CURIE: '%s'" % value, RDFA_UnresolvedCURIE)
+			return retval
+		retval = None if self.rdfa_1_0 else context.mappings.curie(value)
+		return self.iri(context.base, value) if retval is None else retval
+
+	def _terms(self, context, value, predicate = True, allow_terms = True):
+		"""Resolve a whitespace separated list of TERMorCURIEorAbsIRI values (used for ``@property``, ``@rel``, ``@rev``, ``@typeof``, and ``@datatype``)"""
+		retval = []
+		mappings = context.mappings
+		for token in value.split():
+			if not allow_terms and ":" not in token:
+				continue
+			(iri, error) = mappings.term(token)
+			if iri is None:
+				if error == UNRESOLVED_TERM:
+					self.options.add_warning("Unresolvable term: '%s'" % token, RDFA_UnresolvedTerm)
+				else:
+					self.options.add_warning("Unresolvable CURIE: '%s'" % token, RDFA_UnresolvedCURIE)
+			elif predicate and isinstance(iri, BNode):
+				self.options.add_warning("Blank node is not allowed as a predicate: '%s'" % token, RDFA_UnresolvedCURIE)
+			else:
+				retval.append(iri)
+		return retval
+
+	def _content_value(self, datatype, language, text, markup):
+		"""The literal value of an element, given its (textual or markup) content"""
+		if datatype == RDF.XMLLiteral or datatype == RDF_HTML:
+			return self.literal(markup, None, datatype)
+		if datatype is not None:
+			return self.literal(text, None, datatype)
+		if not self.options.space_preserve:
+			text = " ".join(text.split())
+		return self.literal(text, language, None)
+
+	def _lite(self, name, attrs):
+		"""Remove the non RDFa Lite attributes (with a warning); plain HTML ``@rel`` values and ``@content`` on ``<meta>`` are accepted"""
+		for key in _lite_attributes:
+			if key in attrs:
+				if key == "content" and name == "meta": continue
+				if key == "rel" and ":" not in attrs["rel"]: continue
+				self.options.add_warning("Attribute @%s is not part of RDFa Lite; it has been ignored" % key)
+				del attrs[key]
+
+	def _embedded(self, name, attrs, content, context):
+		"""Add the RDF content embedded in the document (Turtle in an HTML ``<script>`` element, RDF/XML in an SVG ``<metadata>`` element)"""
+		local_name = name.split(":")[-1]
+		if self.html and local_name == "script" and attrs.get("type", "").split(";")[0].strip().lower() == "text/turtle":
+			data, format = content.text().strip(), "turtle"
+			if data.startswith("<![CDATA[") and data.endswith("]]>"):
+				data = data[9:-3]
+		elif self.host_language == HostLanguage.svg and local_name == "metadata":
+			data, format = content.markup(context.xmlns).strip(), "xml"
+		else:
+			return
+		if not data.strip():
+			return
+		try:
+			graph = Graph()
+			graph.parse(data = data, format = format, publicID = context.base or None)
+		except Exception as e:
+			self.options.add_warning("Embedded %s content could not be parsed: %s" % (format, e))
+			return
+		for t in graph:
+			self.sink(t)
+
+	# ---------------------------------------------------------------------------------
+	# The events
+	# ---------------------------------------------------------------------------------
+	def initial_context(self):
+		"""
+		Create the initial evaluation context, to be used as the parent of the top level element.
+
+		:rtype: :py:class:`~.state.ExecutionContext`
+		"""
+		prefixes, terms = initial_context(self.host_language)
+		if self.rdfa_1_0:
+			terms = xhtml_terms if self.host_language == HostLanguage.xhtml else {}
+		terms_lower = dict((key.lower(), terms[key]) for key in terms)
+		retval = ExecutionContext(self.base, None, Mappings(prefixes, terms, terms_lower, None, self), {"xml": XML_NS}, 0)
+		retval.parent_subject = retval.parent_object = self.uri(self.base)
+		retval.incomplete     = []
+		retval.list_mapping   = {}
+		return retval
+
+	def start(self, parent, name, attrs, content = None):
+		"""
+		Process the start of an element.
+
+		:param parent: the evaluation context of the parent element (or the initial context for the top level element)
+		:type parent: :py:class:`~.state.ExecutionContext`
+		:param str name: the (qualified) name of the element
+		:param dict attrs: the attributes of the element; the dictionary may be modified by the method
+		:param content: access to the content of the element (e.g., a :py:class:`DOMContent` instance) or ``None`` if the content is not available yet; in the latter case the caller must collect the content of the element and hand it over to :py:meth:`end` if the ``properties`` attribute of the returned context is set
+		:return: the evaluation context of the element, to be used for the children and for :py:meth:`end`
+		:rtype: :py:class:`~.state.ExecutionContext`
+		"""
+		options  = self.options
+		sink     = self.sink
+		is_root  = parent.depth == 0
+		rdfa_1_1 = not self.rdfa_1_0
+
+		if options.check_lite:
+			self._lite(name, attrs)
+
+		# Namespace declarations, prefixes, base, vocabulary, and language
+		base     = parent.base
+		language = parent.language
+		xmlns    = parent.xmlns
+		prefixes = parent.mappings.prefixes
+		vocab    = parent.mappings.vocab
+		for key in attrs:
+			if key == "xmlns":
+				if xmlns is parent.xmlns: xmlns = dict(xmlns)
+				xmlns[""] = attrs[key]
+			elif key.startswith("xmlns:"):
+				if xmlns is parent.xmlns: xmlns = dict(xmlns)
+				xmlns[key[6:]] = attrs[key]
+				if prefixes is parent.mappings.prefixes: prefixes = dict(prefixes)
+				prefixes[key[6:].lower()] = attrs[key]
+
+		if self.xml_base and "xml:base" in attrs:
+			base = urljoin(base, attrs["xml:base"])
+
+		if rdfa_1_1 and "prefix" in attrs:
+			tokens = attrs["prefix"].split()
+			for i in range(0, len(tokens) - 1, 2):
+				if not tokens[i].endswith(":"):
+					options.add_warning("Invalid prefix declaration: '%s'" % tokens[i], RDFA_PrefixRedefinition)
+					continue
+				prefix = tokens[i][:-1].lower()
+				if prefix == "_":
+					options.add_warning("The '_' prefix cannot be redefined", RDFA_PrefixRedefinition)
+					continue
+				if prefixes is parent.mappings.prefixes: prefixes = dict(prefixes)
+				prefixes[prefix] = tokens[i + 1]
+
+		if rdfa_1_1 and "vocab" in attrs:
+			value = attrs["vocab"].strip()
+			if value:
+				vocab = str(self.iri(base, value))
+				sink((self.uri(base), ns_rdfa["usesVocabulary"], self.uri(vocab)))
+			else:
+				vocab = None
+
+		if "xml:lang" in attrs:
+			language = attrs["xml:lang"] or None
+		elif self.html and "lang" in attrs:
+			language = attrs["lang"] or None
+
+		local = ExecutionContext(base, language, parent.mappings.derive(prefixes, vocab), xmlns, parent.depth + 1)
+
+		# HTML+RDFa specific rules: non CURIE @rel/@rev values are ignored if @property is present, @datetime
+		time_datatype = None
+		if self.html5:
+			if "property" in attrs:
+				for key in ("rel", "rev"):
+					if key in attrs:
+						tokens = [t for t in attrs[key].split() if ":" in t]
+						if tokens:
+							attrs[key] = " ".join(tokens)
+						else:
+							del attrs[key]
+				if "content" not in attrs:
+					if "datetime" in attrs:
+						attrs["content"] = attrs["datetime"]
+						time_datatype = datetime_type(attrs["content"])
+					elif name == "time" and content is not None:
+						attrs["content"] = content.text()
+						time_datatype = datetime_type(attrs["content"])
+
+		about    = attrs.get("about")
+		resource = attrs.get("resource")
+		href     = attrs.get("href")
+		src      = attrs.get("src")
+		typeof   = attrs.get("typeof")
+		prop     = attrs.get("property")
+		cont     = attrs.get("content")
+		datatype = attrs.get("datatype")
+		has_rel  = "rel" in attrs or "rev" in attrs
+		implied  = self.html and (name == "head" or name == "body")
+
+		skip           = False
+		new_subject    = None
+		current_object = None
+		typed_resource = None
+
+		if rdfa_1_1:
+			def _first_resource():
+				if resource is not None:
+					retval = self._resource(local, resource)
+					if retval is not None: return retval
+				if href is not None: return self.iri(base, href)
+				if src is not None:  return self.iri(base, src)
+				return None
+
+			if not has_rel:
+				if prop is not None and cont is None and datatype is None:
+					# Step 5.1
+					if about is not None:
+						new_subject = self._resource(local, about)
+					elif is_root:
+						new_subject = self.uri(base)
+					elif parent.parent_object is not None:
+						new_subject = parent.parent_object
+					if typeof is not None:
+						if about is not None or is_root or implied:
+							typed_resource = new_subject
+						else:
+							typed_resource = _first_resource()
+							if typed_resource is None: typed_resource = BNode()
+							current_object = typed_resource
+				else:
+					# Step 5.2
+					if about is not None:
+						new_subject = self._resource(local, about)
+					if new_subject is None:
+						new_subject = _first_resource()
+					if new_subject is None:
+						if is_root:
+							new_subject = self.uri(base)
+						elif implied:
+							new_subject = parent.parent_object
+						elif typeof is not None:
+							new_subject = BNode()
+						elif parent.parent_object is not None:
+							new_subject = parent.parent_object
+							if prop is None: skip = True
+					if typeof is not None:
+						typed_resource = new_subject
+			else:
+				# Step 6
+				if about is not None:
+					new_subject = self._resource(local, about)
+					if typeof is not None: typed_resource = new_subject
+				if new_subject is None:
+					if is_root:
+						new_subject = self.uri(base)
+					elif parent.parent_object is not None:
+						new_subject = parent.parent_object
+				current_object = _first_resource()
+				if current_object is None and typeof is not None and about is None:
+					current_object = BNode()
+				if typeof is not None and about is None:
+					typed_resource = current_object
+		else:
+			# RDFa 1.0: @src is a subject, @resource and @href are objects
+			def _first(*values):
+				for (value, safe) in values:
+					if value is not None:
+						retval = self._resource(local, value) if safe else self.iri(base, value)
+						if retval is not None: return retval
+				return None
+
+			if not has_rel:
+				new_subject = _first((about, True), (src, False), (resource, True), (href, False))
+			else:
+				new_subject = _first((about, True), (src, False))
+				current_object = _first((resource, True), (href, False))
+			if new_subject is None:
+				if is_root or implied:
+					new_subject = self.uri(base) if is_root else parent.parent_object
+				elif typeof is not None:
+					new_subject = BNode()
+				elif parent.parent_object is not None:
+					new_subject = parent.parent_object
+					if not has_rel and prop is None: skip = True
+			if typeof is not None:
+				typed_resource = new_subject
+
+		# Step 7: types
+		if typed_resource is not None and typeof is not None:
+			for t in self._terms(local, typeof, predicate = False):
+				sink((typed_resource, RDF.type, t))
+
+		# Step 8: new list mapping if the subject has changed
+		local.subject = new_subject
+		if new_subject is not None and new_subject != parent.parent_object:
+			list_mapping   = {}
+			local.new_list = True
+		else:
+			list_mapping   = parent.list_mapping
+		inlist = rdfa_1_1 and "inlist" in attrs
+
+		# Steps 9 and 10: relations
+		incomplete = []
+		rels = self._terms(local, attrs["rel"]) if "rel" in attrs else []
+		revs = self._terms(local, attrs["rev"]) if "rev" in attrs else []
+		if current_object is not None:
+			for p in rels:
+				if inlist:
+					list_mapping.setdefault(p, []).append(current_object)
+				else:
+					sink((new_subject, p, current_object))
+			for p in revs:
+				sink((current_object, p, new_subject))
+		elif has_rel:
+			current_object = BNode()
+			for p in rels:
+				if inlist:
+					incomplete.append((list_mapping.setdefault(p, []), None))
+				else:
+					incomplete.append((p, True))
+			for p in revs:
+				incomplete.append((p, False))
+
+		# Step 11: properties
+		if prop is not None and new_subject is not None:
+			props = self._terms(local, prop, allow_terms = rdfa_1_1)
+			if datatype is not None and datatype.strip() != "":
+				dt = (self._terms(local, datatype) or [None])[0]
+			else:
+				dt = time_datatype if datatype is None else None
+
+			value   = None
+			pending = False
+			if dt is not None and dt != RDF.XMLLiteral and dt != RDF_HTML:
+				if cont is not None:
+					value = self.literal(cont, None, dt)
+				else:
+					pending = True
+			elif dt is not None:
+				pending = True
+			elif cont is not None:
+				value = self.literal(cont, local.language)
+			elif datatype is not None:
+				pending = True
+			elif rdfa_1_1 and not has_rel and (resource is not None or href is not None or src is not None):
+				value = _first_resource()
+			elif rdfa_1_1 and typeof is not None and about is None:
+				value = typed_resource
+			else:
+				pending = True
+				if self.rdfa_1_0 and content is not None and "<" in content.markup(local.xmlns):
+					# RDFa 1.0: content with markup is an XML Literal by default
+					dt = RDF.XMLLiteral
+
+			if pending and content is not None:
+				markup = content.markup(local.xmlns) if dt == RDF.XMLLiteral or dt == RDF_HTML else None
+				value  = self._content_value(dt, local.language, content.text() if markup is None else None, markup)
+
+			if value is not None:
+				for p in props:
+					if inlist:
+						list_mapping.setdefault(p, []).append(value)
+					else:
+						sink((new_subject, p, value))
+			elif props:
+				# The value is the content of the element: must wait for the end of the element
+				local.properties = []
+				for p in props:
+					if inlist:
+						slot = _Slot()
+						list_mapping.setdefault(p, []).append(slot)
+						local.properties.append((p, slot))
+					else:
+						local.properties.append((p, None))
+				local.datatype         = dt
+				local.literal_language = local.language
+
+		# Step 12: complete the incomplete triples of the parent
+		if not skip and new_subject is not None:
+			for (p, direction) in parent.incomplete:
+				if direction is None:
+					p.append(new_subject)
+				elif direction:
+					sink((parent.parent_subject, p, new_subject))
+				else:
+					sink((new_subject, p, parent.parent_subject))
+
+		# Step 13: evaluation context for the children
+		if skip:
+			local.parent_subject = parent.parent_subject
+			local.parent_object  = parent.parent_object
+			local.incomplete     = parent.incomplete
+			local.list_mapping   = parent.list_mapping
+		else:
+			local.parent_subject = new_subject if new_subject is not None else parent.parent_subject
+			if current_object is not None:
+				local.parent_object = current_object
+			elif new_subject is not None:
+				local.parent_object = new_subject
+			else:
+				local.parent_object = parent.parent_subject
+			local.incomplete   = incomplete
+			local.list_mapping = list_mapping
+
+		if options.embedded_rdf and content is not None:
+			self._embedded(name, attrs, content, local)
+
+		return local
+
+	def end(self, context, text = None, markup = None):
+		"""
+		Process the end of an element: finalize the pending literals and generate the lists.
+
+		:param context: the evaluation context of the element, as returned by :py:meth:`start`
+		:type context: :py:class:`~.state.ExecutionContext`
+		:param str text: the text content of the element; required only if the literal values were pending
+		:param str markup: the XML serialization of the content of the element; required only if the literal values were pending and the datatype is an XML or an HTML Literal
+		"""
+		sink = self.sink
+		if context.properties is not None:
+			value = self._content_value(context.datatype, context.literal_language, text, markup)
+			for (p, slot) in context.properties:
+				if slot is None:
+					sink((context.subject, p, value))
+				else:
+					slot.value = value
+
+		# Step 14: lists
+		if context.new_list:
+			for p in context.list_mapping:
+				values = context.list_mapping[p]
+				if len(values) == 0:
+					sink((context.subject, p, RDF.nil))
+					continue
+				values = [v.value if isinstance(v, _Slot) else v for v in values]
+				heads  = [BNode() for v in values] + [RDF.nil]
+				for i in range(0, len(values)):
+					sink((heads[i], RDF.first, values[i]))
+					sink((heads[i], RDF.rest, heads[i + 1]))
+				sink((context.subject, p, heads[0]))
+
+
+#########################################################################################
+# DOM traversal
+#########################################################################################
+def _html_base(core, top):
+	"""Set the base of the core to the value of the HTML ``<base>`` element, if any; only the children of ``<head>`` are checked"""
+	for head in top.childNodes:
+		if head.nodeType == Node.ELEMENT_NODE and head.nodeName.split(":")[-1].lower() == "head":
+			for base in head.childNodes:
+				if base.nodeType == Node.ELEMENT_NODE and base.nodeName.split(":")[-1].lower() == "base" and base.hasAttribute("href"):
+					core.base = urljoin(core.base, base.getAttribute("href"))
+					return
+			return
+
+
+def scoped_context(core, element):
+	"""
+	Create the evaluation context of the parent of an element, i.e., the context in which the element is processed if the processing is limited to its subtree. The ancestors of the element are processed, from the top, as usual, but the triples and the processor graph messages they would generate are discarded, and their content is not used for literals.
+
+	:param core: the processing rules
+	:type core: :py:class:`RDFaCore`
+	:param element: the DOM Element node
+	:rtype: :py:class:`~.state.ExecutionContext`
+	"""
+	options = core.options
+	saved   = (core.sink, options.processor_sink, options.check_lite)
+	core.sink, options.processor_sink, options.check_lite = (lambda t: None), None, False
+	try:
+		context = core.initial_context()
+		for node in ancestors(element):
+			attrs   = dict(node.attributes.items()) if node.attributes is not None else {}
+			context = core.start(context, node.nodeName, attrs)
+	finally:
+		core.sink, options.processor_sink, options.check_lite = saved
+	return context
+
+
+def parse_dom(core, dom, scope = None):
+	"""
+	Process a DOM tree for RDFa, in one (non recursive) traversal.
+
+	:param core: the processing rules
+	:type core: :py:class:`RDFaCore`
+	:param dom: the DOM Document node
+	:param scope: if not ``None``, the DOM Element node whose subtree is processed (see :py:func:`scoped_context`); the rest of the tree is not visited
+
+	If the options of the core have a deadline, it is checked regularly; once it has passed, the open elements are closed (i.e., the triples completed by their end are still generated) but the rest of the tree is not processed (see :py:meth:`~.options.Options.truncate`).
+	"""
+	top = dom.documentElement
+	if core.html:
+		_html_base(core, top)
+	ELEMENT = Node.ELEMENT_NODE
+	if scope is None:
+		todo = [(top, core.initial_context())]
+	else:
+		todo = [(scope, scoped_context(core, scope))]
+	deadline = core.options.deadline
+	count    = 0
+	while todo:
+		node, context = todo.pop()
+		if node is None:
+			core.end(context)
+			continue
+		count += 1
+		if deadline is not None and count % _deadline_check == 0 and deadline.expired():
+			todo = [entry for entry in todo if entry[0] is None]
+			core.options.truncate("The time budget of the request ran out; the rest of the document has not been processed")
+			continue
+		attrs = dict(node.attributes.items()) if node.attributes is not None else {}
+		local = core.start(context, node.nodeName, attrs, DOMContent(node))
+		todo.append((None, local))
+		for child in reversed(node.childNodes):
+			if child.nodeType == ELEMENT:
+				todo.append((child, local))
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+`Vocabulary expansion <https://www.w3.org/TR/rdfa-core/#s_vocab_expansion>`_: the vocabularies referred to by ``@vocab`` are retrieved, and the output graph is expanded using the ``rdfs:subClassOf``, ``rdfs:subPropertyOf``, ``owl:equivalentClass``, and ``owl:equivalentProperty`` statements of those vocabularies.
+
+The vocabularies are cached locally (in N-Triples) in the cache directory (see :py:mod:`~.cachedir`).
+
+**Module constants:**
+
+.. py:data:: default_expiration
+
+   Lifetime of a cached vocabulary, in seconds, if the HTTP response does not specify it
+"""
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from io import BytesIO
+else:
+	from StringIO import StringIO as BytesIO
+
+import os
+import re
+import time
+import json
+import hashlib
+import tempfile
+import threading
+from email.utils import parsedate_tz, mktime_tz
+
+from rdflib import Graph, RDF, RDFS, OWL
+
+from .        import ns_rdfa, RDFA_VocabReferenceError
+from .host    import MediaTypes
+from .utils   import URIOpener
+from .cachedir import cache_directory
+
+default_expiration = 24 * 3600
+
+_vocab_accept = "text/turtle, application/rdf+xml;q=0.9, application/ld+json;q=0.8, text/html;q=0.5, application/xhtml+xml;q=0.5"
+_max_age      = re.compile(r"max-age\s*=\s*(\d+)")
+
+# Serializes the updates of the index files by the threads of the process
+_index_lock   = threading.Lock()
+
+
+class VocabCache(object):
+	"""
+	Local, file based, cache of vocabulary graphs. An index file (in JSON) maps the vocabulary URIs to the file names and the expiration times.
+
+	:param options: the processing options (used for the cache reports)
+	:type options: :py:class:`~.options.Options`
+
+	**Class methods:**
+	"""
+	def __init__(self, options):
+		self.options   = options
+		self.directory  = cache_directory()
+		self.index_file = os.path.join(self.directory, "index.json")
+		self.index      = self._read_index()
+
+	def _read_index(self):
+		try:
+			with open(self.index_file) as f:
+				return json.load(f)
+		except Exception:
+			return {}
+
+	def get(self, uri):
+		"""
+		Get a vocabulary graph from the cache.
+
+		:param str uri: URI of the vocabulary
+		:return: the graph, or ``None`` if the vocabulary is not cached or the cached version has expired
+		"""
+		entry = self.index.get(uri)
+		if entry is None or self.options.refresh_vocab_cache or entry["expires"] < time.time():
+			return None
+		try:
+			graph = Graph()
+			graph.parse(os.path.join(self.directory, entry["file"]), format = "nt")
+			self.options.add_info("Vocabulary <%s> retrieved from the local cache" % uri)
+			return graph
+		except Exception:
+			return None
+
+	def store(self, uri, graph, expires):
+		"""
+		Store a vocabulary graph in the cache. The files are written atomically, i.e., a concurrent process never sees a partial file; the index is read again before it is updated, i.e., the entries stored meanwhile by other threads or processes are kept.
+
+		:param str uri: URI of the vocabulary
+		:param graph: the vocabulary graph
+		:param float expires: expiration time (seconds since the epoch)
+		"""
+		name = hashlib.sha1(uri.encode("utf-8")).hexdigest() + ".nt"
+		try:
+			self._write(name, graph.serialize(format = "nt"))
+			with _index_lock:
+				self.index = self._read_index()
+				self.index[uri] = {"file" : name, "expires" : expires}
+				self._write("index.json", json.dumps(self.index))
+			self.options.add_info("Vocabulary <%s> stored in the local cache" % uri)
+		except Exception as e:
+			self.options.add_info("Vocabulary <%s> could not be cached: %s" % (uri, e))
+
+	def _write(self, name, content):
+		if not isinstance(content, bytes):
+			content = content.encode("utf-8")
+		(fd, tmp) = tempfile.mkstemp(dir = self.directory)
+		with os.fdopen(fd, "wb") as f:
+			f.write(content)
+		os.rename(tmp, os.path.join(self.directory, name))
+
+
+def _expiration(opener):
+	"""Expiration time of a vocabulary, based on the ``Cache-Control`` or the ``Expires`` HTTP headers"""
+	match = _max_age.search(opener.headers.get("Cache-Control", "") or "")
+	if match:
+		return time.time() + int(match.group(1))
+	expires = opener.headers.get("Expires")
+	if expires:
+		parsed = parsedate_tz(expires)
+		if parsed is not None:
+			return mktime_tz(parsed)
+	return time.time() + default_expiration
+
+
+def _load_vocab(uri, options, cache):
+	"""
+	Get the graph of a vocabulary, either from the cache or from the Web.
+
+	:return: the graph, or ``None`` if the vocabulary could not be retrieved (a warning is added to the processor graph)
+	"""
+	if cache is not None:
+		graph = cache.get(uri)
+		if graph is not None:
+			return graph
+	try:
+		opener = URIOpener(uri, {"Accept" : _vocab_accept}, deadline = options.deadline)
+		data   = opener.data.read()
+		graph  = Graph()
+		if opener.content_type in (MediaTypes.html, MediaTypes.xhtml, MediaTypes.svg):
+			from . import pyRdfa
+			from .options import Options
+			pyRdfa(Options(), base = opener.location, media_type = opener.content_type).graph_from_source(BytesIO(data), graph)
+		elif opener.content_type in ("text/turtle", "application/x-turtle", "text/n3"):
+			graph.parse(data = data, format = "turtle", publicID = opener.location)
+		elif opener.content_type in ("application/ld+json", "application/json"):
+			graph.parse(data = data, format = "json-ld", publicID = opener.location)
+		else:
+			graph.parse(data = data, format = "xml", publicID = opener.location)
+	except Exception as e:
+		options.add_warning("Vocabulary <%s> could not be retrieved: %s" % (uri, e), RDFA_VocabReferenceError)
+		return None
+	if cache is not None:
+		cache.store(uri, graph, _expiration(opener))
+	return graph
+
+
+def _closure(graph, sub, equivalent):
+	"""
+	Compute, for each class (resp. property), the set of all its superclasses (resp. superproperties).
+
+	:param graph: the vocabulary graph
+	:param sub: ``rdfs:subClassOf`` or ``rdfs:subPropertyOf``
+	:param equivalent: ``owl:equivalentClass`` or ``owl:equivalentProperty``
+	:return: dictionary from a term to the set of its super terms (not including itself)
+	"""
+	direct = {}
+	for (s, o) in graph.subject_objects(sub):
+		direct.setdefault(s, set()).add(o)
+	for (s, o) in graph.subject_objects(equivalent):
+		direct.setdefault(s, set()).add(o)
+		direct.setdefault(o, set()).add(s)
+	retval = {}
+	for term in direct:
+		seen = set()
+		todo = list(direct[term])
+		while todo:
+			t = todo.pop()
+			if t in seen or t == term: continue
+			seen.add(t)
+			todo.extend(direct.get(t, ()))
+		retval[term] = seen
+	return retval
+
+
+def process_rdfa_sem(graph, options):
+	"""
+	Expand the graph using the vocabularies referred to in the graph via ``rdfa:usesVocabulary``.
+
+	:param graph: the output graph; the new triples are added to it
+	:param options: the processing options
+	:type options: :py:class:`~.options.Options`
+	"""
+	vocabs = set(graph.objects(None, ns_rdfa["usesVocabulary"]))
+	if not vocabs:
+		return
+	cache = VocabCache(options) if options.vocab_cache else None
+	vocab_graph = Graph()
+	for vocab in vocabs:
+		if options.deadline is not None and options.deadline.expired():
+			options.truncate("The time budget of the request ran out; the vocabulary expansion has not been performed")
+			return
+		g = _load_vocab(str(vocab), options, cache)
+		if g is not None:
+			for t in g: vocab_graph.add(t)
+
+	classes    = _closure(vocab_graph, RDFS.subClassOf, OWL.equivalentClass)
+	properties = _closure(vocab_graph, RDFS.subPropertyOf, OWL.equivalentProperty)
+	if not classes and not properties:
+		return
+	new_triples = []
+	for (s, p, o) in graph:
+		if p == RDF.type and o in classes:
+			new_triples.extend((s, RDF.type, c) for c in classes[o])
+		if p in properties:
+			new_triples.extend((s, q, o) for q in properties[p])
+	for t in new_triples:
+		graph.add(t)
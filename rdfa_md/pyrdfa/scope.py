@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Selection of the element limiting the processing to a subtree of the document (the ``scope`` option of the services).
+
+The scope is either the value of an ``@id`` or a simple CSS selector. The supported selectors are sequences of compound selectors separated by the descendant (white space) or child (``>``) combinators; a compound selector is an optional element name (or ``*``) followed by any number of ``#id``, ``.class``, ``[attr]``, and ``[attr=value]`` conditions (the value may be quoted, but it may not contain white spaces). Element names are compared case insensitively.
+
+A value without any CSS specific character (e.g., ``main``) is first taken as an ``@id``; if there is no element with that id, it is used as a selector (i.e., an element name).
+"""
+import re
+from xml.dom import Node
+
+from . import ProcessingError
+
+_compound  = re.compile(r"^(\*|[A-Za-z_][\w\-:]*)?((?:[#.][\w\-]+|\[[^\]]+\])*)$")
+_condition = re.compile(r"""[#.][\w\-]+|\[\s*([\w\-:]+)\s*(?:=\s*(?:"([^"]*)"|'([^']*)'|([^\]\s]*))\s*)?\]""")
+_tokens    = re.compile(r">|[^\s>]+")
+_css_chars = re.compile(r"[#.\[\]>*\s]")
+
+
+def _local_name(node):
+	return node.nodeName.split(":")[-1].lower()
+
+
+def parse_selector(selector):
+	"""
+	Parse a simple CSS selector.
+
+	:param str selector: the selector
+	:return: list of (combinator, element name, conditions) tuples, one for each compound selector; the combinator (``" "`` or ``">"``) relates the compound selector to the previous one, the element name is ``None`` if any element is accepted, and the conditions are (attribute, value) pairs, where the value is ``None`` if only the presence of the attribute is checked
+	:raises ProcessingError: if the selector is not supported
+	"""
+	retval     = []
+	combinator = " "
+	for token in _tokens.findall(selector):
+		if token == ">":
+			if not retval or combinator == ">":
+				raise ProcessingError("Invalid scope selector: '%s'" % selector)
+			combinator = ">"
+			continue
+		match = _compound.match(token)
+		if match is None:
+			raise ProcessingError("Invalid or unsupported scope selector: '%s'" % selector)
+		name       = match.group(1).lower() if match.group(1) and match.group(1) != "*" else None
+		conditions = []
+		for condition in _condition.finditer(match.group(2)):
+			text = condition.group(0)
+			if text[0] == "#":
+				conditions.append(("id", text[1:]))
+			elif text[0] == ".":
+				conditions.append(("class", text[1:]))
+			else:
+				value = [v for v in condition.groups()[1:] if v is not None]
+				conditions.append((condition.group(1), value[0] if value else None))
+		retval.append((combinator, name, conditions))
+		combinator = " "
+	if not retval or combinator == ">":
+		raise ProcessingError("Invalid scope selector: '%s'" % selector)
+	return retval
+
+
+def _match_compound(node, name, conditions):
+	"""Check whether an element matches a compound selector"""
+	if name is not None and _local_name(node) != name:
+		return False
+	for (attribute, value) in conditions:
+		if not node.hasAttribute(attribute):
+			return False
+		if value is None:
+			continue
+		if attribute == "class":
+			if value not in node.getAttribute("class").split():
+				return False
+		elif node.getAttribute(attribute) != value:
+			return False
+	return True
+
+
+def _matches(node, steps, i):
+	"""Check whether an element matches the selector steps up to (and including) the ``i``-th one"""
+	(combinator, name, conditions) = steps[i]
+	if not _match_compound(node, name, conditions):
+		return False
+	if i == 0:
+		return True
+	parent = node.parentNode
+	if combinator == ">":
+		return parent is not None and parent.nodeType == Node.ELEMENT_NODE and _matches(parent, steps, i - 1)
+	while parent is not None and parent.nodeType == Node.ELEMENT_NODE:
+		if _matches(parent, steps, i - 1):
+			return True
+		parent = parent.parentNode
+	return False
+
+
+def _first(dom, accept):
+	"""The first element, in document order, accepted by a function"""
+	ELEMENT = Node.ELEMENT_NODE
+	todo    = [dom.documentElement]
+	while todo:
+		node = todo.pop()
+		if accept(node):
+			return node
+		for child in reversed(node.childNodes):
+			if child.nodeType == ELEMENT:
+				todo.append(child)
+	return None
+
+
+def select_element(dom, scope):
+	"""
+	Find the element designated by a scope.
+
+	:param dom: the DOM Document node
+	:param str scope: an ``@id`` value or a simple CSS selector
+	:return: the first element, in document order, matching the scope
+	:raises ProcessingError: if the selector is invalid or no element matches it
+	"""
+	scope = scope.strip()
+	if scope and not _css_chars.search(scope):
+		retval = _first(dom, lambda node: node.getAttribute("id") == scope)
+		if retval is not None:
+			return retval
+	steps  = parse_selector(scope)
+	last   = len(steps) - 1
+	retval = _first(dom, lambda node: _matches(node, steps, last))
+	if retval is None:
+		raise ProcessingError("No element matches the scope '%s'" % scope)
+	return retval
+
+
+def ancestors(element):
+	"""
+	The ancestor elements of an element.
+
+	:param element: DOM Element node
+	:return: list of the ancestors, starting with the document element
+	"""
+	retval = []
+	parent = element.parentNode
+	while parent is not None and parent.nodeType == Node.ELEMENT_NODE:
+		retval.append(parent)
+		parent = parent.parentNode
+	retval.reverse()
+	return retval
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Evaluation context of the RDFa processing, and the resolution of terms, CURIEs, and IRIs.
+
+The prefix, term, and default vocabulary mappings are collected in a :py:class:`Mappings` instance. An element that does not change any of these (which is the vast majority of the elements in a document) simply shares the instance of its parent, and so do the memoized results of the term and CURIE resolutions stored in it. A new instance, with an empty memo, is created only when an element declares a prefix or a vocabulary.
+"""
+import re
+
+from .initialcontext import XHTML_VOCAB
+
+_absolute_iri = re.compile(r"^[A-Za-z][A-Za-z0-9+.\-]*:")
+
+# Possible errors of a term resolution
+UNRESOLVED_TERM  = 1
+UNRESOLVED_CURIE = 2
+
+
+class Mappings(object):
+	"""
+	Prefix, term, and default vocabulary mappings, valid for an element and its descendants (unless redefined).
+
+	:param dict prefixes: prefix to IRI mappings; keys are in lower case
+	:param dict terms: term to IRI mappings
+	:param dict terms_lower: same as ``terms``, with keys in lower case (used for case insensitive matching)
+	:param str vocab: default vocabulary IRI, or ``None``
+	:param interner: the :py:class:`~.parse.RDFaCore` instance, used to intern the URI references and the blank nodes
+
+	The instance should be considered as immutable; use :py:meth:`derive` to create a new one.
+
+	**Class methods:**
+	"""
+	__slots__ = ("prefixes", "terms", "terms_lower", "vocab", "interner", "terms_memo", "curie_memo")
+
+	def __init__(self, prefixes, terms, terms_lower, vocab, interner):
+		self.prefixes    = prefixes
+		self.terms       = terms
+		self.terms_lower = terms_lower
+		self.vocab       = vocab
+		self.interner    = interner
+		self.terms_memo  = {}
+		self.curie_memo  = {}
+
+	def derive(self, prefixes, vocab):
+		"""
+		Create a new instance with new prefixes and/or vocabulary. If neither changes, the instance itself is returned.
+
+		:param dict prefixes: the new prefix mappings
+		:param str vocab: the new default vocabulary
+		:rtype: :py:class:`Mappings`
+		"""
+		if prefixes is self.prefixes and vocab == self.vocab:
+			return self
+		return Mappings(prefixes, self.terms, self.terms_lower, vocab, self.interner)
+
+	def curie(self, value):
+		"""
+		Expand a CURIE.
+
+		:param str value: the CURIE
+		:return: URIRef or BNode, or ``None`` if the value is not a CURIE with a known prefix
+		"""
+		try:
+			return self.curie_memo[value]
+		except KeyError:
+			pass
+		retval = None
+		if ":" in value:
+			prefix, reference = value.split(":", 1)
+			if prefix == "_":
+				retval = self.interner.bnode(reference)
+			elif prefix == "":
+				retval = self.interner.uri(XHTML_VOCAB + reference)
+			else:
+				iri = self.prefixes.get(prefix.lower())
+				if iri is not None:
+					retval = self.interner.uri(iri + reference)
+					self.interner.used_prefix(prefix.lower(), iri)
+		self.curie_memo[value] = retval
+		return retval
+
+	def term(self, token):
+		"""
+		Resolve a single TERMorCURIEorAbsIRI token (used in ``@property``, ``@rel``, ``@rev``, ``@typeof``, and ``@datatype``).
+
+		:param str token: the token
+		:return: a (value, error) tuple; value is a URIRef, a BNode (for ``_:`` CURIEs), or ``None``, in which case error is one of :py:data:`UNRESOLVED_TERM` or :py:data:`UNRESOLVED_CURIE`
+		"""
+		try:
+			return self.terms_memo[token]
+		except KeyError:
+			pass
+		if ":" not in token:
+			if self.vocab is not None:
+				retval = (self.interner.uri(self.vocab + token), None)
+			elif token in self.terms:
+				retval = (self.interner.uri(self.terms[token]), None)
+			elif token.lower() in self.terms_lower:
+				retval = (self.interner.uri(self.terms_lower[token.lower()]), None)
+			else:
+				retval = (None, UNRESOLVED_TERM)
+		else:
+			value = self.curie(token)
+			if value is not None:
+				retval = (value, None)
+			elif _absolute_iri.match(token):
+				retval = (self.interner.uri(token), None)
+			else:
+				retval = (None, UNRESOLVED_CURIE)
+		self.terms_memo[token] = retval
+		return retval
+
+
+class ExecutionContext(object):
+	"""
+	The evaluation context of an element, as defined in the RDFa 1.1 specification, i.e., the values handed over to the children. It also stores the values of the element that can only be finalized when the element is closed (literal values waiting for the content of the element, lists).
+
+	No copy is made of the parent's values: the mappings are shared via the :py:class:`Mappings` instance, and the list mapping and the incomplete triples are shared by reference, as required by the specification.
+	"""
+	__slots__ = ("base", "parent_subject", "parent_object", "incomplete", "list_mapping", "language", "mappings", "xmlns",
+				 "subject", "new_list", "properties", "datatype", "literal_language", "depth")
+
+	def __init__(self, base, language, mappings, xmlns, depth):
+		self.base             = base
+		self.language         = language
+		self.mappings         = mappings
+		self.xmlns            = xmlns
+		self.depth            = depth
+		self.parent_subject   = None
+		self.parent_object    = None
+		self.incomplete       = None
+		self.list_mapping     = None
+		self.subject          = None
+		self.new_list         = False
+		self.properties       = None
+		self.datatype         = None
+		self.literal_language = None
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Utility classes and functions for the RDFa processor: access to Web resources.
+
+The time budget of a request is represented by a :py:class:`Deadline`; the retrieval of a source fails if the budget runs out.
+
+The sources are requested with compression (``gzip`` or ``deflate``), and decoded incrementally while they are read. The retrieval is aborted, with a :py:class:`~rdfa_md.pyrdfa.FailedSource` exception, as soon as the (decoded) content exceeds :py:data:`max_source_size` (unless the caller sets another limit, e.g., the streaming processor, which does not keep the content in memory), or, for the extractors, if the media type of the response is neither HTML nor XML (see :py:func:`is_markup`).
+
+**Module constants:**
+
+.. py:data:: max_source_size
+
+   The maximum size, in bytes, of a (decoded) source; ``None`` means no limit
+
+.. py:data:: fetch_timeout
+
+   The timeout, in seconds, of the network operations (connection, and each read) of a retrieval
+
+.. py:data:: accept_encoding
+
+   The value of the ``Accept-Encoding`` header of the requests
+"""
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from urllib.request import Request, urlopen
+	from urllib.error import HTTPError as urllib_HTTPError
+	from io import BytesIO
+else:
+	from urllib2 import Request, urlopen
+	from urllib2 import HTTPError as urllib_HTTPError
+	from StringIO import StringIO as BytesIO
+
+import zlib
+import time
+from email.message import Message
+
+from . import HTTPError, FailedSource
+from . import httpcache
+
+max_source_size = 16 * 1024 * 1024
+fetch_timeout   = 30
+accept_encoding = "gzip, deflate"
+
+# Size of the chunks read from the network
+_chunk_size = 64 * 1024
+
+# Marks the default size limit of URIOpener (None means no limit)
+_default_limit = object()
+
+
+def is_markup(content_type):
+	"""
+	Check whether a media type is an HTML or an XML one (including the ``+xml`` types, like ``image/svg+xml``).
+
+	:param str content_type: the media type, without parameters
+	:rtype: bool
+	"""
+	return content_type in ("text/html", "application/xhtml+xml") or content_type.endswith("/xml") or content_type.endswith("+xml")
+
+
+class _Concatenated(object):
+	"""Read-only file-like object returning the content of a byte string followed by the content of a stream"""
+	def __init__(self, head, stream):
+		self.head   = BytesIO(head)
+		self.stream = stream
+
+	def read(self, size = -1):
+		if size is None or size < 0:
+			return self.head.read() + self.stream.read()
+		retval = self.head.read(size)
+		if len(retval) < size:
+			retval += self.stream.read(size - len(retval))
+		return retval
+
+	def close(self):
+		self.stream.close()
+
+
+class Deadline(object):
+	"""
+	The time budget of a request, carried through the retrieval, the parsing, the vocabulary expansion, and the serialization; each stage checks the remaining budget.
+
+	:param float budget: the budget, in seconds, starting at the creation of the instance; ``None`` means no limit
+
+	**Class methods:**
+	"""
+	def __init__(self, budget = None):
+		self.expires = time.time() + budget if budget is not None else None
+
+	def remaining(self):
+		"""
+		The remaining budget, in seconds.
+
+		:return: the remaining time (0 if the budget has run out), or ``None`` if there is no limit
+		:rtype: float
+		"""
+		return max(0.0, self.expires - time.time()) if self.expires is not None else None
+
+	def expired(self):
+		"""
+		Check whether the budget has run out.
+
+		:rtype: bool
+		"""
+		return self.expires is not None and time.time() >= self.expires
+
+	def timeout(self, limit):
+		"""
+		A timeout for an operation, i.e., a limit reduced to the remaining budget.
+
+		:param float limit: the limit of the operation, in seconds
+		:rtype: float
+		"""
+		remaining = self.remaining()
+		return limit if remaining is None else max(0.001, min(limit, remaining))
+
+
+class _DecodingStream(object):
+	"""
+	Read-only file-like object decoding (if necessary) the content of a response while it is read, and aborting the retrieval once the decoded content exceeds a limit.
+
+	:param raw: the response stream
+	:param str encoding: the value of the ``Content-Encoding`` header of the response (possibly empty)
+	:param int limit: the maximum size of the decoded content; ``None`` means no limit
+	:param str name: the URI of the resource, for the error messages
+	:param deadline: the time budget of the request; ``None`` means no limit
+	:type deadline: :py:class:`Deadline`
+	"""
+	def __init__(self, raw, encoding, limit, name, deadline = None):
+		self.raw      = raw
+		self.limit    = limit
+		self.name     = name
+		self.deadline = deadline
+		self.size    = 0
+		self.eof     = False
+		self.pending = b""
+		self.first   = True
+		self.deflate = encoding == "deflate"
+		if encoding in ("gzip", "x-gzip"):
+			self.decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+		elif encoding == "deflate":
+			self.decoder = zlib.decompressobj()
+		elif encoding in ("", "identity"):
+			self.decoder = None
+		else:
+			raise FailedSource("Unsupported content encoding for '%s': %s" % (name, encoding))
+
+	def _decompress(self, data):
+		try:
+			return self.decoder.decompress(data, _chunk_size)
+		except zlib.error:
+			if not (self.deflate and self.first):
+				raise FailedSource("Corrupted compressed content of '%s'" % self.name)
+			# Some servers send a raw deflate stream, without the zlib wrapper
+			self.decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+			return self.decoder.decompress(data, _chunk_size)
+
+	def _next(self):
+		"""Read and decode the next piece of the content"""
+		if self.deadline is not None and self.deadline.expired():
+			self.close()
+			raise FailedSource("The time budget of the request ran out while retrieving '%s'" % self.name, transient = True)
+		if self.decoder is not None and self.decoder.unconsumed_tail:
+			# the output of the previous chunk was capped, to keep the memory use bounded
+			data = self._decompress(self.decoder.unconsumed_tail)
+		else:
+			# read1 returns what has arrived, i.e., the time budget is checked while a slow response trickles in
+			raw = self.raw.read1(_chunk_size) if hasattr(self.raw, "read1") else self.raw.read(_chunk_size)
+			if not raw:
+				self.eof = True
+				data = self.decoder.flush() if self.decoder is not None else b""
+			elif self.decoder is None:
+				data = raw
+			else:
+				data = self._decompress(raw)
+			self.first = False
+		self.size += len(data)
+		if self.limit is not None and self.size > self.limit:
+			self.close()
+			raise FailedSource("The content of '%s' is larger than the limit of %d bytes" % (self.name, self.limit))
+		return data
+
+	def read(self, size = -1):
+		if size is None:
+			size = -1
+		parts  = [self.pending]
+		length = len(self.pending)
+		while not self.eof and (size < 0 or length < size):
+			data = self._next()
+			parts.append(data)
+			length += len(data)
+		data = b"".join(parts)
+		if size < 0 or len(data) <= size:
+			self.pending = b""
+			return data
+		self.pending = data[size:]
+		return data[:size]
+
+	def close(self):
+		self.eof = True
+		self.raw.close()
+
+
+class URIOpener(object):
+	"""
+	A wrapper around the ``urlopen`` function: it adds the necessary HTTP headers and stores the relevant data of the response. HTTP and access errors are turned into :py:class:`~rdfa_md.pyrdfa.HTTPError` and :py:class:`~rdfa_md.pyrdfa.FailedSource` exceptions, respectively.
+
+	The ``http`` and ``https`` resources go through the local HTTP cache of :py:mod:`~.httpcache` (unless it is disabled): a fresh cached response is used without accessing the Web, and a stale one is revalidated via a conditional request.
+
+	The content is requested compressed; the ``data`` attribute returns the decoded content, and raises a :py:class:`~rdfa_md.pyrdfa.FailedSource` exception if it exceeds the size limit. A response whose ``Content-Length`` is above the limit is rejected right away.
+
+	:param str name: URI of the resource
+	:param dict additional_headers: additional HTTP request headers
+	:param bool markup_only: if ``True``, the retrieval is aborted if the media type of the response is neither HTML nor XML (see :py:func:`is_markup`)
+	:param deadline: the time budget of the request; the network timeout is reduced to the remaining budget, and the retrieval is aborted if the budget runs out
+	:type deadline: :py:class:`Deadline`
+	:param int size_limit: the maximum size, in bytes, of the (decoded) content; ``None`` means no limit. By default, :py:data:`max_source_size` is used
+
+	**Class attributes:**
+
+	.. py:attribute:: data
+
+	   the file-like object of the response
+
+	.. py:attribute:: headers
+
+	   the headers of the response
+
+	.. py:attribute:: content_type
+
+	   the media type of the response (without parameters like the charset)
+
+	.. py:attribute:: charset
+
+	   the charset of the response, ``None`` if not set; the parsers use it instead of detecting the encoding of the content again
+
+	.. py:attribute:: location
+
+	   the final URI of the resource, i.e., after redirections
+
+	.. py:attribute:: from_cache
+
+	   whether the response comes from the local HTTP cache
+	"""
+	default_accept = "text/html, application/xhtml+xml, image/svg+xml, application/atom+xml;q=0.9, application/xml;q=0.8, */*;q=0.1"
+
+	def __init__(self, name, additional_headers = {}, markup_only = False, deadline = None, size_limit = _default_limit):
+		self.size_limit = max_source_size if size_limit is _default_limit else size_limit
+		request_headers = dict(additional_headers)
+		if "Accept" not in request_headers:
+			request_headers["Accept"] = self.default_accept
+		if "Accept-Encoding" not in request_headers:
+			request_headers["Accept-Encoding"] = accept_encoding
+		self.markup_only = markup_only
+		if deadline is not None and deadline.expired():
+			raise FailedSource("The time budget of the request ran out before retrieving '%s'" % name, transient = True)
+		cache  = httpcache.default_cache() if name.startswith("http:") or name.startswith("https:") else None
+		cached = cache.lookup(name, request_headers) if cache is not None else None
+		self.from_cache = False
+		try:
+			if cached is not None and cache.is_fresh(cached) and self._use_cached(cache, cached):
+				return
+			try:
+				response = self._request(name, request_headers, cache.validators(cached) if cached is not None else {}, deadline)
+			except urllib_HTTPError as e:
+				if e.code != 304 or cached is None:
+					raise
+				if self._use_cached(cache, cache.refresh(cached, list(e.headers.items()))):
+					return
+				# the cached content has been removed since the lookup: the resource is retrieved unconditionally
+				response = self._request(name, request_headers, {}, deadline)
+			self.headers  = response.info()
+			self.location = response.geturl()
+			self._set_content_type()
+			self._check_response(name, response)
+			self.data = _DecodingStream(response, (self.headers.get("Content-Encoding") or "").strip().lower(), self.size_limit, name, deadline)
+			if cache is not None:
+				self._store(cache, name, request_headers)
+		except urllib_HTTPError as e:
+			raise HTTPError("HTTP error when accessing '%s': %s" % (name, e.reason), e.code)
+		except FailedSource:
+			raise
+		except Exception as e:
+			raise FailedSource("Cannot access '%s': %s" % (name, e), transient = True)
+
+	def _request(self, name, request_headers, validators, deadline):
+		"""Send the (possibly conditional) request; return the response"""
+		req = Request(url = name)
+		for key in request_headers:
+			req.add_header(key, request_headers[key])
+		for key in validators:
+			req.add_header(key, validators[key])
+		return urlopen(req, timeout = deadline.timeout(fetch_timeout) if deadline is not None else fetch_timeout)
+
+	def _check_response(self, name, response):
+		"""Abort the retrieval (before reading the content) if the response is too large or is not of the expected media type"""
+		try:
+			length = int(self.headers.get("Content-Length", ""))
+		except ValueError:
+			length = None
+		if self.size_limit is not None and length is not None and length > self.size_limit and not self.headers.get("Content-Encoding"):
+			response.close()
+			raise FailedSource("The content of '%s' is larger than the limit of %d bytes" % (name, self.size_limit))
+		if self.markup_only and self.content_type and not is_markup(self.content_type):
+			response.close()
+			raise FailedSource("The media type of '%s' is neither HTML nor XML: %s" % (name, self.content_type))
+
+	def _set_content_type(self):
+		content_type = self.headers.get("Content-Type", "")
+		self.content_type = content_type.split(";")[0].strip().lower()
+		self.charset = None
+		for param in content_type.split(";")[1:]:
+			if param.strip().lower().startswith("charset="):
+				self.charset = param.split("=", 1)[1].strip().strip('"')
+
+	def _use_cached(self, cache, meta):
+		"""Set up the response from the cache; return ``False`` if the cached content is not available"""
+		body = cache.body(meta)
+		if body is None:
+			return False
+		self.data    = BytesIO(body)
+		self.headers = Message()
+		for (key, value) in meta["headers"]:
+			self.headers[key] = value
+		self.location   = meta["location"]
+		self.from_cache = True
+		self._set_content_type()
+		if self.markup_only and self.content_type and not is_markup(self.content_type):
+			raise FailedSource("The media type of '%s' is neither HTML nor XML: %s" % (meta["uri"], self.content_type))
+		return True
+
+	def _store(self, cache, name, request_headers):
+		"""Store the (decoded) response in the cache, if it is cacheable and not too large; the data remains readable"""
+		headers = [(key, value) for (key, value) in self.headers.items() if key.lower() not in ("content-encoding", "content-length")]
+		if not httpcache.cacheable(headers):
+			return
+		body = self.data.read(httpcache.max_entry_size + 1)
+		if len(body) > httpcache.max_entry_size:
+			self.data = _Concatenated(body, self.data)
+		else:
+			cache.store(name, request_headers, self.location, headers, body)
+			self.data = BytesIO(body)
@@ -11,23 +11,29 @@ import sys
 PY3 = (sys.version_info[0] >= 3)
 
 if PY3:
-	from urllib.error import HTTPError
+	from io import StringIO
 else:
-	from urllib2 import HTTPError
+	from StringIO import StringIO
 
-from rdflib import Graph
-from rdflib.plugins.parsers.pyRdfa.host import MediaTypes
+from .pyrdfa import HTTPError
 from .validator import Validator
-from .utils import FormValues, handle_http_exception, handle_general_exception
+from .api import rdfa_graph, use_streaming
+from .rdfa_stream import stream_rdfa
+from .serializers import NTriplesWriter
+from .pages import serialize_paged
+from .etag import conditional_response, incomplete_response, incomplete_headers
+from .singleflight import coalesce, request_key
+from .failures import negative_cached
+from .utils import FormValues, acceptable_source, handle_http_exception, handle_general_exception, handle_invalid_uri
 
 
 #########################################################################################
-# RDF Extraction:  use the RDFLib parser to extract the RDF graph, serialize it and
+# RDF Extraction:  use the RDFa processor to extract the RDF graph, serialize it and
 # return to the caller
 # In case or problems, an HTTP response is generated incorporating the Exception data and
 # some basic information on the calling parameters.
 #########################################################################################
-def extract_rdf(uri, form):
+def extract_rdf(uri, form, environ = None):
 	"""
 	Extract RDFa data from HTML or from various XML formats (SVG, XML, Atom, etc) and returns the resulting RDF data
 
@@ -35,115 +41,95 @@ def extract_rdf(uri, form):
 
 	:param cgi.FieldStorage form: the query parameters of the original request. See the description of the :py:class:`~.utils.FormValues` class for further details on the relevant form entries.
 
+	:param dict environ: the CGI variables of the request (i.e., its headers, like ``HTTP_IF_NONE_MATCH``); if ``None``, the environment of the process is used. A multi threaded server must provide them, the function itself does not rely on any process wide state.
+
 	:return: HTTP response, containing the RDF data encoded in the format requested by the user (default: ``turtle``), or an error message if applicable
 	:rtype: str
 
-	The function parses the HTML/SVG/XML content using the built-in ``RDFLib`` RDFa parser, and serializes the resulting RDF data using the serializaiton format requested by the user and returns the results. Serialization relies on the built-in ``RDFLib`` serializer for ``turtle``, ``nt``, or ``RDF/XML``, and on an ``RDFLib`` extension package (``rdflib_jsonld``) for ``JSON-LD``.
-	"""
+	Only the ``http`` and ``https`` URIs are retrieved (see :py:func:`~.utils.acceptable_source`); for any other URI a ``400`` response is returned. The function parses the HTML/SVG/XML content using the RDFa processor of the package (see :py:mod:`~.pyrdfa`), and serializes the resulting RDF data using the serializaiton format requested by the user and returns the results. Serialization is done by :py:func:`~.serializers.serialize_graph`.
 
-	form_values = FormValues(form)
+	The extraction itself is done by :py:func:`~.api.rdfa_graph`; this function is the HTTP adapter around it. If streaming is requested (see :py:func:`~.api.use_streaming`), the XML content is processed by the SAX based processor of :py:mod:`~.rdfa_stream` instead; for the ``nt`` format the triples are then written directly into the output, without building a graph at all (unless the output is filtered by types or predicates, or paged).
 
-	# Collect the data, depending on what mechanism is used in the form
-	input, base = form_values.get_source_and_base(uri)
+	If the ``types`` or ``predicates`` options are used, only the selected triples of the output graph are collected into the graph that is serialized (see :py:mod:`~.filters`). If ``paged=true`` is used, the result is stored on the server and only its first page is returned (see :py:mod:`~.pages`). Otherwise the response carries an ``ETag`` (and the configured ``Cache-Control`` and ``Vary`` headers); if it matches the ``If-None-Match`` header of the request, a ``304 Not Modified`` response is returned without serializing the graph (see :py:mod:`~.etag`).
 
-	# Decide which graphs should be sent back
-	graph_choice = form_values.get_value2("rdfagraph", "graph")
-	if graph_choice == "processor":
-		output_default_graph, output_processor_graph = False, True
-	elif graph_choice == "processor,output" or graph_choice == "output,processor":
-		output_default_graph, output_processor_graph = True, True
-	else:
-		output_default_graph, output_processor_graph = True, False
+	The request has a time budget (see the ``timeout`` option of :py:class:`~.utils.FormValues`), carried through the retrieval, the parsing, the vocabulary expansion, and the serialization. If it runs out during the parsing, the triples generated so far are returned, with a warning in the processor graph (which is then always included) and a ``Warning`` header (see :py:func:`~.etag.incomplete_response`); if it runs out before the serialization, a faster serialization format may be used (see :py:meth:`~.utils.FormValues.serialization_format`).
+
+	Identical requests for the same URI arriving while the first one is processed wait for, and share, its result (see :py:mod:`~.singleflight`). If the request fails, the error response is kept for a short time, and returned right away if the same request is repeated (see :py:mod:`~.failures`).
+	"""
+	if not acceptable_source(uri):
+		return handle_invalid_uri(uri, "Error in distilling RDFa")
+	form_values = FormValues(form, environ)
+	key = request_key("rdfa", uri, form, environ)
+	return negative_cached(key, lambda: coalesce(key, lambda: _extract_rdf(uri, form_values), form_values.deadline))
 
-	# These values may be overridden in one case...
-	if form_values.vocab_cache_report: output_processor_graph = True
 
-	# Almost ready to work; creating the two RDF Graphs
-	output_graph    = Graph()
-	processor_graph = Graph()
+def _extract_rdf(uri, form_values):
+	"""The real work of :py:func:`extract_rdf`, with the values of the form (see :py:class:`~.utils.FormValues`); the time budget of the request includes the wait for an identical request in flight"""
+	options     = form_values.service_options()
+
+	# Collect the data, depending on what mechanism is used in the form
+	input, base = form_values.get_source_and_base(uri)
 
 	# The graph is serialized in the required format, and returned
 	try:
-		# This is the real meat: calling out to the RDFa parser.
-		output_graph.parse(input,
-						   format              = "rdfa",
-						   pgraph              = processor_graph,
-						   media_type          = form_values.media_type,
-						   embedded_rdf        = form_values.embedded_rdf,
-						   space_preserve      = form_values.space_preserve,
-						   vocab_expansion     = form_values.vocab_expansion,
-						   vocab_cache         = form_values.vocab_cache,
-						   refresh_vocab_cache = form_values.refresh_vocab_cache,
-						   vocab_cache_report  = form_values.vocab_cache_report,
-						   check_lite          = form_values.check_lite,
-						   rdfa_version        = form_values.rdfa_version
-						   )
-
-		# Next step is to create the final graph to be returned to the user; this depends on
-		# whether the which graphs are required.
-		final_graph = Graph()
-		if output_default_graph :
-			for t in output_graph : final_graph.add(t)
-		if output_processor_graph :
-			for t in processor_graph : final_graph.add(t)
-
-		# "header" collects the HTTP response; first the header with the content type,
-		# then the real data
-		if form_values.output_format == "nt":
-			header = 'Content-Type: application/n-triples; charset=utf-8\n'
-			format = "nt"
-		elif form_values.output_format == "turtle":
-			header = 'Content-Type: text/turtle; charset=utf-8\n'
-			format = "turtle"
-		elif form_values.output_format == "json-ld" or form_values.output_format == "json":
-			# This requires extra care, because the JSON-LD serializer is a separate
-			# plugin for RDFLib (alas...)
-			# If this is not successful, we are falling back on turtle
-			try:
-				# check if the json-ld parser can be registered in the first place
-				from rdflib.plugin import register
-				from rdflib.serializer import Serializer
-				from rdflib_jsonld.serializer import JsonLDSerializer
-				register("json-ld", Serializer, "rdflib_jsonld.serializer", "JsonLDSerializer")
-				header = 'Content-Type: application/ld+json; charset=utf-8\n'
-				format = "json-ld"
-			except:
-				# There is no JSON-LD serializer, falling back on turtle
-				header = 'Content-Type: text/turtle; charset=utf-8\n'
-				format = "turtle"
-		else:
-			header = 'Content-Type: application/rdf+xml; charset=utf-8\n'
-			format = "pretty-xml"
-		# Extra empty line to end the HTTP response header
-		return header + "\n" + final_graph.serialize(format=format)
+		if use_streaming(options) and options.output_format == "nt" and not (options.types or options.predicates or options.paged):
+			# No graph is built: the triples are written into the output as soon as they are generated
+			output = StringIO()
+			sink   = NTriplesWriter(output)
+			truncated = stream_rdfa(input, base,
+									sink           = sink if options.output_default_graph else None,
+									processor_sink = sink if options.output_processor_graph else None,
+									media_type     = options.media_type,
+									deadline       = form_values.deadline)
+			sink.flush()
+			headers = incomplete_headers() if truncated else ""
+			return headers + 'Content-Type: application/n-triples; charset=utf-8\n' + "\n" + output.getvalue()
+
+		# This is the real meat: calling out to the RDFa processor, see the api module
+		result = rdfa_graph(input, options, base, form_values.deadline)
+
+		output_format = form_values.serialization_format()
+		if options.paged:
+			return serialize_paged(result.graph, output_format, options.page_size)
+		if result.truncated:
+			return incomplete_response(result.graph, output_format)
+		return conditional_response(result.graph, output_format, form_values.environ.get("HTTP_IF_NONE_MATCH", ""))
 	except HTTPError:
 		return handle_http_exception(uri, "HTTP Error in distilling RDFa content")
 	except Exception as e:
 		return handle_general_exception(uri, "Exception in distilling RDFa", form_values,
-		                                graph_choice = graph_choice, extracts = True)
-
+		                                graph_choice = form_values.get_value2("rdfagraph", "graph"), extracts = True)
 
 
-def validate_rdfa(uri, form={}):
+def validate_rdfa(uri, form={}, environ = None):
 	"""
 	Validate the RDFa data from HTML or from various XML formats (SVG, XML, Atom, etc).
 
 	:param str uri: URI for the HTML data. Note that the ``text:`` and ``uploaded`` fake URI values are treated separately; the former is for textual intput (in which case a ``StringIO`` instance is used to get the data) and the latter is for uploaded file, where the form gives access to the file directly.
 
 	:param cgi.FieldStorage form: the query parameters of the original request. See the description of the :py:class:`~.utils.FormValues` class for further details on the relevant form entries.
+
+	:param dict environ: the CGI variables of the request; if ``None``, the environment of the process is used (see :py:func:`extract_rdf`)
 	
 	:return: HTTP response, containing the RDF data encoded in the format requested by the user (default: ``turtle``), or an error message if applicable
 	:rtype: str
 
 	On high level, the method:
-	  - Extracts the RDFa data using the standard ``RDFLib`` RDFa parser in such a way that the "processor graph" (containing the warning and error triples detected by the parser) is also generated
+	  - Extracts the RDFa data using the RDFa processor of the package in such a way that the "processor graph" (containing the warning and error triples detected by the parser) is also generated
 	  - Interprets the processor graph triples by generating a human readable message in HTML
 	  - Adds the extracted RDF graph to the output, serialized in turtle
 	  - Returns the HTML content in the HTTP response.
 
-	The real work is done in the separate :py:class:`.validator.Validator` class, this method is only a shell around that.
+	The real work is done in the separate :py:class:`.validator.Validator` class, this method is only a shell around that. If the validation fails, the error response is kept for a short time, and returned right away if the same request is repeated (see :py:mod:`~.failures`).
 	"""
-	form_values = FormValues(form)
+	if not acceptable_source(uri):
+		return handle_invalid_uri(uri, "Error in RDFa validation processing")
+	return negative_cached(request_key("validator", uri, form, environ), lambda: _validate_rdfa(uri, form, environ))
+
+
+def _validate_rdfa(uri, form, environ):
+	"""The real work of :py:func:`validate_rdfa`, with the same parameters and return value"""
+	form_values = FormValues(form, environ)
 	# Collect the data, depending on what mechanism is used in the form
 	input, base = form_values.get_source_and_base(uri)
 	try:
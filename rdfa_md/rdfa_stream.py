@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Streaming RDFa 1.1 processing for the XML host languages (generic XML, SVG, and Atom).
+
+The standard RDFa parser builds the full DOM tree of the source before generating the first triple, i.e., the memory footprint grows with the size of the document. For very large Atom feeds or SVG files this is not acceptable. The :py:class:`StreamingProcessor` class in this module feeds the `RDFa 1.1 processing rules <https://www.w3.org/TR/rdfa-core/#s_sequence>`_ of :py:mod:`~.pyrdfa.parse` with SAX events instead: only the stack of evaluation contexts (one entry per open element) is kept in memory, and every triple is handed over to a "sink" as soon as it is complete. A sink is any callable accepting a triple; the ``add`` method of an ``RDFLib`` graph, or an instance of :py:class:`~.serializers.ntriples.NTriplesWriter` (which writes the triples directly into an output stream), are typical examples.
+
+The following features of the full RDFa parser are not available in streaming mode: RDFa 1.0 processing, vocabulary expansion, embedded RDF content, and the RDFa 1.1 Lite checks. The caller (see :py:func:`~.rdfa.extract_rdf`) is responsible for falling back on the DOM based parser if any of these are required.
+
+**Module constants:**
+
+.. py:data:: STREAMING_MEDIA_TYPES
+
+   The media types for which streaming is possible
+
+.. py:data:: max_streamed_size
+
+   The maximum size, in bytes, of a source retrieved from the Web in streaming mode; ``None`` means no limit. (The content is never kept in memory as a whole, i.e., the limit of the other processors, :py:data:`~.pyrdfa.utils.max_source_size`, does not apply; the time budget of the request does.)
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+import xml.sax
+from xml.sax.handler import ContentHandler, feature_namespaces, feature_external_ges, feature_external_pes
+
+from rdflib import RDF
+
+from .pyrdfa.host    import MediaTypes
+from .pyrdfa.options import Options
+from .pyrdfa.parse   import RDFaCore, RDF_HTML, xml_start_tag, xml_text
+from .pyrdfa.utils   import URIOpener
+
+STREAMING_MEDIA_TYPES = (MediaTypes.xml, MediaTypes.svg, MediaTypes.atom)
+max_streamed_size     = None
+
+
+#########################################################################################
+# The processor itself
+#########################################################################################
+class StreamingProcessor(ContentHandler):
+	"""
+	SAX content handler feeding the RDFa processing rules of :py:class:`~.pyrdfa.parse.RDFaCore`. Besides the stack of evaluation contexts, the only content kept in memory is the text (or the markup, for XML Literals) of the open elements whose literal value is pending.
+
+	:param str base: the base URI of the document
+	:param sink: callable receiving the triples of the output (default) graph; if ``None``, those triples are ignored
+	:param processor_sink: callable receiving the triples of the processor graph (i.e., warnings); if ``None``, those triples are ignored
+	:param str media_type: the media type of the content, one of :py:data:`STREAMING_MEDIA_TYPES`
+	:param deadline: the time budget of the processing (see :py:func:`stream_rdfa`)
+	:type deadline: :py:class:`~.pyrdfa.utils.Deadline`
+
+	**Class methods:**
+	"""
+	def __init__(self, base = "", sink = None, processor_sink = None, media_type = MediaTypes.xml, deadline = None):
+		ContentHandler.__init__(self)
+		options = Options(deadline = deadline)
+		options.set_host_language(media_type)
+		options.processor_sink = processor_sink
+		self.core     = RDFaCore(options, base, "1.1", sink if sink is not None else (lambda t: None))
+		self.stack    = [self.core.initial_context()]
+		# Each entry is a (context, text, markup) tuple, markup being None unless an XML or HTML Literal is generated
+		self.captures = []
+		# Whether the current element has no content (yet)
+		self.empty    = False
+
+	def _capture_start(self, name, attrs):
+		parent = self.stack[-1]
+		for (context, text, markup) in self.captures:
+			if markup is not None:
+				# top level element of an XML Literal: the in-scope namespaces must be declared explicitly
+				markup.append(xml_start_tag(name, attrs.items(), parent.xmlns if parent is context else None) + ">")
+
+	def characters(self, content):
+		if content:
+			self.empty = False
+		for (context, text, markup) in self.captures:
+			text.append(content)
+			if markup is not None:
+				markup.append(xml_text(content))
+
+	def startElement(self, name, attrs):
+		attrs = dict(attrs.items())
+		self._capture_start(name, attrs)
+		context = self.core.start(self.stack[-1], name, dict(attrs))
+		if context.properties is not None:
+			self.captures.append((context, [], [] if context.datatype in (RDF.XMLLiteral, RDF_HTML) else None))
+		self.stack.append(context)
+		self.empty = True
+
+	def endElement(self, name):
+		context = self.stack.pop()
+		if self.captures and self.captures[-1][0] is context:
+			(context, text, markup) = self.captures.pop()
+			self.core.end(context, "".join(text), "".join(markup) if markup is not None else None)
+		else:
+			self.core.end(context)
+		for (c, text, markup) in self.captures:
+			if markup is not None:
+				if self.empty:
+					# nothing has been added since the start tag of the element; written as an empty element, as in the DOM
+					markup[-1] = markup[-1][:-1] + "/>"
+				else:
+					markup.append("</%s>" % name)
+		# the parent has content now
+		self.empty = False
+
+
+#########################################################################################
+# Entry points
+#########################################################################################
+def _open_source(source, deadline = None):
+	"""Return a (stream, base) pair for a URI, or a file-like object, given as source"""
+	if hasattr(source, "read"):
+		return source, None
+	opener = URIOpener(source, {"Accept" : "application/xml, image/svg+xml, application/atom+xml, text/xml;q=0.9, */*;q=0.1"}, markup_only = True, deadline = deadline, size_limit = max_streamed_size)
+	return opener.data, opener.location
+
+
+def stream_rdfa(source, base = "", sink = None, processor_sink = None, media_type = MediaTypes.xml, chunk_size = 64 * 1024, deadline = None):
+	"""
+	Process an XML source for RDFa in streaming mode, handing over the triples to the sinks as soon as they are generated.
+
+	:param source: the source of the XML content: a file-like object, or a URI
+	:param str base: the base URI of the document; if the source is a URI and the base is empty, the (possibly redirected) URI of the source is used
+	:param sink: callable receiving the triples of the output graph (e.g., the ``add`` method of a graph)
+	:param processor_sink: callable receiving the triples of the processor graph
+	:param str media_type: the media type of the content, one of :py:data:`STREAMING_MEDIA_TYPES`
+	:param int chunk_size: size of the chunks fed to the SAX parser
+	:param deadline: the time budget of the processing; it is checked before each chunk, and once it has passed the rest of the content is not processed (a warning is added to the processor graph, and the triples of the elements that are still open are lost)
+	:type deadline: :py:class:`~.pyrdfa.utils.Deadline`
+	:return: whether the processing has been stopped because of the deadline
+	:rtype: bool
+	"""
+	stream, location = _open_source(source, deadline)
+	if location is not None and not base:
+		base = location
+	handler = StreamingProcessor(base, sink, processor_sink, media_type, deadline)
+	parser  = xml.sax.make_parser()
+	parser.setFeature(feature_namespaces, False)
+	parser.setFeature(feature_external_ges, False)
+	parser.setFeature(feature_external_pes, False)
+	parser.setContentHandler(handler)
+	try:
+		while True:
+			if deadline is not None and deadline.expired():
+				handler.core.options.truncate("The time budget of the request ran out; the rest of the document has not been processed")
+				return True
+			chunk = stream.read(chunk_size)
+			if not chunk: break
+			parser.feed(chunk)
+		parser.close()
+		return False
+	finally:
+		if location is not None:
+			stream.close()
+
+
+def graph_from_stream(source, base = "", graph = None, pgraph = None, media_type = MediaTypes.xml, deadline = None):
+	"""
+	Process an XML source for RDFa in streaming mode and add the triples to the graph(s).
+
+	:param source: the source of the XML content: a file-like object, or a URI
+	:param str base: the base URI of the document
+	:param graph: RDFLib Graph for the output triples (may be ``None``)
+	:param pgraph: RDFLib Graph for the processor triples (may be ``None``)
+	:param str media_type: the media type of the content, one of :py:data:`STREAMING_MEDIA_TYPES`
+	:param deadline: the time budget of the processing (see :py:func:`stream_rdfa`)
+	:return: whether the processing has been stopped because of the deadline
+	:rtype: bool
+	"""
+	return stream_rdfa(source, base,
+					   sink           = graph.add if graph is not None else None,
+					   processor_sink = pgraph.add if pgraph is not None else None,
+					   media_type     = media_type,
+					   deadline       = deadline)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Serialization of the extracted graphs into an HTTP response. The RDFa and the microdata services share the same output formats, i.e., the same :py:func:`serialize_graph` function. Serializers specific to this package (used in place of the generic ``RDFLib`` plugins) are in the submodules.
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+from .ntriples import NTriplesWriter, serialize_nt, serialize_nquads
+from .turtle   import TurtleWriter, serialize_turtle
+from .rdfxml   import RDFXMLWriter, serialize_rdfxml
+from .jsonld   import JSONLDWriter, serialize_jsonld, register_context
+
+
+def content_type(output_format):
+	"""
+	The media type of a serialization format.
+
+	:param str output_format: the format requested by the user (see :py:func:`serialize`)
+	:rtype: str
+	"""
+	if output_format == "nt":
+		return "application/n-triples"
+	elif output_format in ("turtle", "turtle-fast"):
+		return "text/turtle"
+	elif output_format in ("json-ld", "json"):
+		return "application/ld+json"
+	else:
+		return "application/rdf+xml"
+
+
+def serialize(graph, output_format):
+	"""
+	Serialize a graph.
+
+	:param graph: the ``RDFLib`` Graph
+	:param str output_format: the format requested by the user; one of ``nt``, ``turtle``, ``turtle-fast``, ``json-ld`` (or ``json``), ``pretty-xml``, and ``xml`` (the default, i.e., any other value)
+	:return: the serialized graph
+	:rtype: str
+
+	The ``nt``, ``turtle-fast``, ``xml``, and ``json-ld`` formats use the serializers of :py:mod:`~.ntriples`, :py:mod:`~.turtle`, :py:mod:`~.rdfxml`, and :py:mod:`~.jsonld`, respectively; the other formats rely on the built-in ``RDFLib`` serializers for ``turtle`` or (nested) ``pretty-xml``.
+	"""
+	if output_format == "nt":
+		return serialize_nt(graph)
+	elif output_format == "turtle-fast":
+		return serialize_turtle(graph)
+	elif output_format in ("turtle", "pretty-xml"):
+		return graph.serialize(format = output_format)
+	elif output_format == "json-ld" or output_format == "json":
+		return serialize_jsonld(graph)
+	else:
+		return serialize_rdfxml(graph)
+
+
+def serialize_graph(graph, output_format):
+	"""
+	Serialize a graph into an HTTP response, i.e., the ``Content-Type`` header, an empty line, and the serialized graph (see :py:func:`serialize`).
+
+	:param graph: the ``RDFLib`` Graph
+	:param str output_format: the format requested by the user (see :py:func:`serialize`)
+	:return: the HTTP response
+	:rtype: str
+	"""
+	# Extra empty line to end the HTTP response header
+	return "Content-Type: %s; charset=utf-8\n" % content_type(output_format) + "\n" + serialize(graph, output_format)
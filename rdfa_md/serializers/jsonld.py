@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+JSON-LD serializer using a precomputed, compact, context.
+
+Generic JSON-LD serializers produce expanded JSON-LD first (i.e., with full IRIs everywhere), and compact it afterwards, for every request. Most of the data extracted by the services uses schema.org; the serializer in this module uses a fixed context instead, with schema.org as the default vocabulary (i.e., the schema.org properties and types appear as simple terms) and a number of common prefixes. The context is computed, and encoded in JSON, only once (see :py:func:`get_context`); other contexts can be registered via :py:func:`register_context`.
+
+The output is a ``@graph`` array of node objects, one per subject, written in one pass over the graph: when a subject is found for the first time, all its triples are retrieved (through the subject index of the store) and its node object is written out (and forgotten). Besides the output stream, only the set of the subjects already written is kept in memory.
+
+The literals keep their lexical forms: only the plain literals, and the ``xsd:integer`` and ``xsd:boolean`` literals in canonical form (e.g., ``7``, but not ``007`` or ``+7``), are written as native JSON values; all other literals, including ``xsd:string`` ones, are written as value objects with an explicit type.
+
+**Module constants:**
+
+.. py:data:: registered_contexts
+
+   Dictionary from the context names to the context definitions (in JSON-LD). The ``schema`` context sets schema.org as the default vocabulary; the ``common`` context defines the usual prefixes
+
+.. py:data:: default_contexts
+
+   The names of the contexts used by default, in order of priority
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from io import StringIO
+else:
+	from StringIO import StringIO
+
+import re
+import json
+import threading
+
+from rdflib import Literal, BNode, RDF, XSD
+
+registered_contexts = {
+	"schema" : {
+		"@vocab" : "http://schema.org/",
+	},
+	"common" : {
+		"rdf"     : "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+		"rdfs"    : "http://www.w3.org/2000/01/rdf-schema#",
+		"owl"     : "http://www.w3.org/2002/07/owl#",
+		"xsd"     : "http://www.w3.org/2001/XMLSchema#",
+		"dc"      : "http://purl.org/dc/terms/",
+		"dc11"    : "http://purl.org/dc/elements/1.1/",
+		"foaf"    : "http://xmlns.com/foaf/0.1/",
+		"skos"    : "http://www.w3.org/2004/02/skos/core#",
+		"og"      : "http://ogp.me/ns#",
+		"rdfa"    : "http://www.w3.org/ns/rdfa#",
+		"md"      : "http://www.w3.org/ns/md#",
+		"xhv"     : "http://www.w3.org/1999/xhtml/vocab#",
+	},
+}
+
+default_contexts = ("schema", "common")
+
+_term    = re.compile(r"^[A-Za-z_][A-Za-z0-9_\-]*$")
+# Integers in canonical form, i.e., written back as the same lexical form by a JSON-LD processor
+_integer = re.compile(r"^(0|-?[1-9]\d*)$")
+
+_cache      = {}
+_cache_lock = threading.Lock()
+
+
+def register_context(name, definition):
+	"""
+	Register (or replace) a context.
+
+	:param str name: the name of the context
+	:param dict definition: the context definition; only the ``@vocab`` key and the prefix definitions (i.e., keys mapped on a string ending with ``/`` or ``#``) are used for compaction
+	"""
+	with _cache_lock:
+		registered_contexts[name] = definition
+		_cache.clear()
+
+
+class CompactContext(object):
+	"""
+	A merged set of contexts, ready to be used for compaction.
+
+	:param names: the names of the contexts (see :py:data:`registered_contexts`), in order of priority
+
+	**Class attributes:**
+
+	.. py:attribute:: definition
+
+	   the merged context, as a dictionary
+
+	.. py:attribute:: encoded
+
+	   the JSON encoding of the context
+
+	**Class methods:**
+	"""
+	def __init__(self, names):
+		self.definition = {}
+		for name in reversed(names):
+			self.definition.update(registered_contexts[name])
+		self.vocab    = self.definition.get("@vocab")
+		self.prefixes = sorted(((value, key) for (key, value) in self.definition.items()
+								if not key.startswith("@") and isinstance(value, str) and value[-1:] in ("/", "#")),
+							   key = lambda x: -len(x[0]))
+		self.encoded  = json.dumps(self.definition, separators = (",", ":"), sort_keys = True)
+
+	def compact(self, iri):
+		"""
+		Compact an IRI used as a property, a type, or a datatype: a term (relative to the vocabulary), a compact IRI, or the IRI itself.
+
+		:param str iri: the IRI
+		:rtype: str
+		"""
+		if self.vocab is not None and iri.startswith(self.vocab):
+			term = iri[len(self.vocab):]
+			if _term.match(term) and term not in self.definition:
+				return term
+		for (namespace, prefix) in self.prefixes:
+			if iri.startswith(namespace):
+				local = iri[len(namespace):]
+				# The local part must not be taken as an IRI authority
+				if not local.startswith("//"):
+					return "%s:%s" % (prefix, local)
+				break
+		return iri
+
+
+def get_context(names = default_contexts):
+	"""
+	Get a context; the result is cached.
+
+	:param names: the names of the contexts (see :py:data:`registered_contexts`), in order of priority
+	:rtype: :py:class:`CompactContext`
+	"""
+	names = tuple(names)
+	try:
+		return _cache[names]
+	except KeyError:
+		pass
+	context = CompactContext(names)
+	with _cache_lock:
+		_cache[names] = context
+	return context
+
+
+class JSONLDWriter(object):
+	"""
+	Writer of a graph in JSON-LD.
+
+	:param stream: output stream; must accept (unicode) strings
+	:param context: the context used for compaction
+	:type context: :py:class:`CompactContext`
+
+	**Class methods:**
+	"""
+	def __init__(self, stream, context):
+		self.stream  = stream
+		self.context = context
+		# Compacted forms of the properties, types, and datatypes; specific to a context, i.e., this memo lives with the writer
+		self.terms   = {RDF.type : "@type"}
+
+	def _compact(self, iri):
+		try:
+			return self.terms[iri]
+		except KeyError:
+			retval = self.terms[iri] = self.context.compact(str(iri))
+			return retval
+
+	def _id(self, term):
+		if isinstance(term, BNode):
+			return "_:" + str(term)
+		return str(term)
+
+	def _value(self, term):
+		"""The JSON-LD value of an object"""
+		if not isinstance(term, Literal):
+			return {"@id" : self._id(term)}
+		if term.language:
+			return {"@value" : str(term), "@language" : term.language}
+		datatype = term.datatype
+		if datatype is None:
+			return str(term)
+		if datatype == XSD.integer and _integer.match(term):
+			return int(term)
+		if datatype == XSD.boolean and str(term) in ("true", "false"):
+			return str(term) == "true"
+		return {"@value" : str(term), "@type" : self._compact(datatype)}
+
+	def _node(self, subject, triples):
+		"""Encode the node object of a subject, given all its triples"""
+		properties = {}
+		for (s, p, o) in triples:
+			key = self._compact(p)
+			if key != "@type":
+				value = self._value(o)
+			elif isinstance(o, Literal):
+				# a literal cannot be the value of @type
+				key   = self.context.compact(str(p))
+				value = self._value(o)
+			else:
+				value = self._id(o) if isinstance(o, BNode) else self._compact(o)
+			if key in properties:
+				properties[key].append(value)
+			else:
+				properties[key] = [value]
+		node = {"@id" : self._id(subject)}
+		for (key, values) in properties.items():
+			node[key] = values[0] if len(values) == 1 else values
+		return json.dumps(node, separators = (",", ":"), ensure_ascii = False)
+
+	def serialize(self, graph):
+		"""
+		Serialize a graph.
+
+		:param graph: the ``RDFLib`` Graph
+		"""
+		write = self.stream.write
+		write('{"@context":%s,\n"@graph":[' % self.context.encoded)
+		subject   = None
+		written   = set()
+		separator = "\n"
+		for (s, p, o) in graph:
+			# (the identity check avoids the comparison of the terms, implemented in Python, for most triples)
+			if s is subject or s == subject or s in written:
+				continue
+			subject = s
+			written.add(s)
+			write(separator + self._node(s, graph.triples((s, None, None))))
+			separator = ",\n"
+		write("\n]}\n")
+
+
+def serialize_jsonld(graph, stream = None, contexts = default_contexts):
+	"""
+	Serialize a graph in JSON-LD.
+
+	:param graph: the ``RDFLib`` Graph
+	:param stream: the output stream; if ``None``, the serialization is returned as a string
+	:param contexts: the names of the contexts used for compaction, in order of priority
+	:return: the serialization if no stream is given, ``None`` otherwise
+	"""
+	output = stream if stream is not None else StringIO()
+	JSONLDWriter(output, get_context(contexts)).serialize(graph)
+	if stream is None:
+		return output.getvalue()
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+N-Triples and N-Quads serializer.
+
+The output is identical, byte by byte, to the one of the ``RDFLib`` ``nt`` serializer plugin (for the same order of the triples), but the serializer is faster:
+
+- the encoded form of each IRI and blank node is cached, i.e., the IRIs of the properties and types (typically repeated thousands of times in a page using, e.g., schema.org) are escaped and formatted only once;
+- the lines are collected in a buffer that is written into the output stream (and then reused) in large chunks.
+
+The :py:class:`NTriplesWriter` class can also be used as a "sink" for the streaming RDFa processor (see :py:mod:`~rdfa_md.rdfa_stream`).
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from io import StringIO
+else:
+	from StringIO import StringIO
+
+from rdflib import Literal, BNode
+
+
+def _quote(value):
+	"""Escape a string for a N-Triples literal (same rules as ``RDFLib``)"""
+	return '"%s"' % value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"').replace("\r", "\\r")
+
+
+def _literal(literal):
+	"""The N-Triples encoding of a Literal"""
+	if literal.language:
+		return "%s@%s" % (_quote(literal), literal.language)
+	elif literal.datatype:
+		return "%s^^<%s>" % (_quote(literal), literal.datatype)
+	else:
+		return _quote(literal)
+
+
+class NTriplesWriter(object):
+	"""
+	Writer of N-Triples (or N-Quads) lines into an output stream.
+
+	:param stream: output stream; must accept (unicode) strings
+	:param graph_name: if not ``None``, the URIRef or BNode of the graph; the output is then N-Quads
+	:param int buffer_lines: number of lines collected before they are written into the stream
+
+	The instance is callable with a triple as argument, i.e., it can be used as a sink. The :py:meth:`flush` method must be called after the last triple.
+
+	The encoded forms of the IRIs and blank nodes are cached; literals are rarely repeated, and encoding them is cheaper than a cache lookup (the hash of an ``RDFLib`` Literal is computed in Python). Unlike a graph, the writer does not filter duplicate triples.
+
+	**Class attributes:**
+
+	.. py:attribute:: count
+
+	   the number of triples (or quads) written so far
+
+	**Class methods:**
+	"""
+	# Above this number of entries the term cache is emptied (a page with a large number of distinct IRIs would otherwise duplicate them all)
+	cache_limit = 50000
+
+	def __init__(self, stream, graph_name = None, buffer_lines = 1000):
+		self.stream       = stream
+		self.buffer_lines = buffer_lines
+		self.buffer       = []
+		self.cache        = {}
+		self.count        = 0
+		self.end          = " .\n" if graph_name is None else " %s .\n" % self.term(graph_name)
+
+	def term(self, term):
+		"""
+		The N-Triples encoding of a term.
+
+		:param term: URIRef, BNode, or Literal
+		:rtype: str
+		"""
+		if isinstance(term, Literal):
+			return _literal(term)
+		try:
+			return self.cache[term]
+		except KeyError:
+			pass
+		if isinstance(term, BNode):
+			retval = "_:" + str(term)
+		else:
+			# the URIRef method also checks the validity of the IRI
+			retval = term.n3()
+		if len(self.cache) >= self.cache_limit:
+			self.cache.clear()
+		self.cache[term] = retval
+		return retval
+
+	def write(self, triple, end = None):
+		"""
+		Write one triple.
+
+		:param triple: the (subject, predicate, object) tuple
+		:param str end: the end of the line, if different from the default (used for N-Quads with several graphs)
+		"""
+		term = self.term
+		self.buffer.append(term(triple[0]) + " " + term(triple[1]) + " " + term(triple[2]) + (end or self.end))
+		self.count += 1
+		if len(self.buffer) >= self.buffer_lines:
+			self.flush()
+
+	__call__ = write
+
+	def write_triples(self, triples):
+		"""
+		Write a series of triples; this is equivalent to, but faster than, calling :py:meth:`write` for each of them.
+
+		:param triples: iterable of (subject, predicate, object) tuples
+		"""
+		cache  = self.cache
+		term   = self.term
+		end    = self.end
+		buffer = self.buffer
+		limit  = self.buffer_lines
+		count  = 0
+		for (s, p, o) in triples:
+			try:
+				es = cache[s]
+			except KeyError:
+				es = term(s)
+			try:
+				ep = cache[p]
+			except KeyError:
+				ep = term(p)
+			if type(o) is Literal:
+				eo = _literal(o)
+			else:
+				try:
+					eo = cache[o]
+				except KeyError:
+					eo = term(o)
+			buffer.append(es + " " + ep + " " + eo + end)
+			count += 1
+			if count % limit == 0:
+				self.flush()
+		self.count += count
+
+	def write_quad(self, quad):
+		"""
+		Write one quad.
+
+		:param quad: the (subject, predicate, object, graph) tuple; the graph may be ``None`` (i.e., the default graph), a URIRef or a BNode, or an ``RDFLib`` Graph
+		"""
+		graph = quad[3]
+		if graph is not None and hasattr(graph, "identifier"):
+			graph = graph.identifier
+		self.write(quad[:3], " .\n" if graph is None else " %s .\n" % self.term(graph))
+
+	def flush(self):
+		"""Write the collected lines into the stream"""
+		if self.buffer:
+			self.stream.write("".join(self.buffer))
+			del self.buffer[:]
+
+
+def serialize_nt(graph, stream = None):
+	"""
+	Serialize a graph in N-Triples.
+
+	:param graph: the ``RDFLib`` Graph
+	:param stream: the output stream; if ``None``, the serialization is returned as a string
+	:return: the serialization if no stream is given, ``None`` otherwise
+	"""
+	output = stream if stream is not None else StringIO()
+	writer = NTriplesWriter(output)
+	writer.write_triples(graph)
+	writer.flush()
+	if stream is None:
+		return output.getvalue()
+
+
+def serialize_nquads(graph, stream = None):
+	"""
+	Serialize a context aware graph (e.g., an ``RDFLib`` Dataset) in N-Quads.
+
+	:param graph: the ``RDFLib`` ConjunctiveGraph or Dataset
+	:param stream: the output stream; if ``None``, the serialization is returned as a string
+	:return: the serialization if no stream is given, ``None`` otherwise
+	"""
+	output  = stream if stream is not None else StringIO()
+	writer  = NTriplesWriter(output)
+	default = getattr(graph, "default_context", None)
+	default = default.identifier if default is not None else None
+	for (s, p, o, g) in graph.quads((None, None, None)):
+		name = g.identifier if hasattr(g, "identifier") else g
+		# the triples of the default graph are written without a graph name
+		writer.write_quad((s, p, o, None if name == default else name))
+	writer.flush()
+	if stream is None:
+		return output.getvalue()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Streaming, non-nested, RDF/XML serializer.
+
+The ``RDFLib`` ``pretty-xml`` serializer nests the descriptions of the resources and builds the full output in memory before writing it; it is by far the slowest of the ``RDFLib`` serializers. The serializer of this module writes each triple as soon as it is read from the graph: consecutive triples with the same subject share an ``rdf:Description`` element, but there is no other grouping, and no nesting. It makes two passes over the graph: the first one collects the namespaces of the predicates (to declare them on the ``rdf:RDF`` element), the second one writes the triples. Apart from the output stream, the only memory used is proportional to the number of different predicates.
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from io import StringIO
+else:
+	from StringIO import StringIO
+
+import re
+from xml.sax.saxutils import escape
+
+from rdflib import Literal, BNode, RDF
+
+_rdf_ns  = str(RDF)
+# A (simplified) version of the XML NCName production, used to split the predicate IRIs
+_ncname_char  = re.compile(r"[\w.\-·]", re.UNICODE)
+_ncname_start = re.compile(r"[^\W\d]|_", re.UNICODE)
+_attribute_entities = {'"' : "&quot;", "\n" : "&#10;", "\r" : "&#13;", "\t" : "&#9;"}
+_text_entities      = {"\r" : "&#13;"}
+
+
+def _attribute(value):
+	"""Escape a value for a (double quoted) attribute"""
+	return escape(value, _attribute_entities)
+
+
+def _text(value):
+	"""Escape a value for the text content of an element"""
+	return escape(value, _text_entities)
+
+
+def split_predicate(uri):
+	"""
+	Split a predicate IRI into a namespace and an XML local name.
+
+	:param str uri: the predicate IRI
+	:return: (namespace, local name) tuple
+	:raises ValueError: if the IRI does not end with a valid local name (such a predicate cannot be expressed in RDF/XML)
+	"""
+	split = len(uri)
+	while split > 0 and _ncname_char.match(uri[split - 1]):
+		split -= 1
+	while split < len(uri) and not _ncname_start.match(uri[split]):
+		split += 1
+	if split == len(uri) or split == 0:
+		raise ValueError("Predicate <%s> cannot be serialized in RDF/XML" % uri)
+	return uri[:split], uri[split:]
+
+
+class RDFXMLWriter(object):
+	"""
+	Writer of a graph in RDF/XML.
+
+	:param stream: output stream; must accept (unicode) strings
+	:param namespaces: iterable of (prefix, namespace) pairs; these prefixes are used for the namespaces of the predicates, if possible
+
+	**Class methods:**
+	"""
+	def __init__(self, stream, namespaces = ()):
+		self.stream   = stream
+		self.bound    = {}
+		for (prefix, namespace) in namespaces:
+			if prefix:
+				self.bound.setdefault(str(namespace), prefix)
+		self.prefixes = {_rdf_ns : "rdf"}
+		self.qnames   = {}
+
+	def _qname(self, predicate):
+		"""The qualified name of the element for a predicate"""
+		try:
+			return self.qnames[predicate]
+		except KeyError:
+			pass
+		namespace, local = split_predicate(str(predicate))
+		if namespace not in self.prefixes:
+			prefix = self.bound.get(namespace)
+			if prefix is None or prefix in self.prefixes.values():
+				count = len(self.prefixes)
+				while "ns%d" % count in self.prefixes.values() or "ns%d" % count in self.bound.values():
+					count += 1
+				prefix = "ns%d" % count
+			self.prefixes[namespace] = prefix
+		retval = self.qnames[predicate] = "%s:%s" % (self.prefixes[namespace], local)
+		return retval
+
+	@staticmethod
+	def _node(attribute, term):
+		"""The attribute identifying a resource: ``rdf:nodeID`` for a blank node, the ``attribute`` otherwise"""
+		if isinstance(term, BNode):
+			return 'rdf:nodeID="%s"' % _attribute(term)
+		return 'rdf:%s="%s"' % (attribute, _attribute(term))
+
+	def serialize(self, graph):
+		"""
+		Serialize a graph.
+
+		:param graph: the ``RDFLib`` Graph
+		"""
+		# First pass: the namespaces of the predicates
+		predicates = set()
+		for (s, p, o) in graph:
+			if p not in predicates:
+				predicates.add(p)
+				self._qname(p)
+
+		write = self.stream.write
+		write('<?xml version="1.0" encoding="utf-8"?>\n<rdf:RDF')
+		for (namespace, prefix) in sorted(self.prefixes.items(), key = lambda x: x[1]):
+			write('\n   xmlns:%s="%s"' % (prefix, _attribute(namespace)))
+		write(">\n")
+
+		# Second pass: the triples themselves
+		subject = None
+		qname   = self._qname
+		for (s, p, o) in graph:
+			if s != subject:
+				if subject is not None:
+					write("  </rdf:Description>\n")
+				write("  <rdf:Description %s>\n" % self._node("about", s))
+				subject = s
+			name = qname(p)
+			if isinstance(o, Literal):
+				if o.language:
+					write('    <%s xml:lang="%s">%s</%s>\n' % (name, _attribute(o.language), _text(o), name))
+				elif o.datatype == RDF.XMLLiteral:
+					write('    <%s rdf:parseType="Literal">%s</%s>\n' % (name, o, name))
+				elif o.datatype:
+					write('    <%s rdf:datatype="%s">%s</%s>\n' % (name, _attribute(o.datatype), _text(o), name))
+				else:
+					write("    <%s>%s</%s>\n" % (name, _text(o), name))
+			else:
+				write("    <%s %s/>\n" % (name, self._node("resource", o)))
+		if subject is not None:
+			write("  </rdf:Description>\n")
+		write("</rdf:RDF>\n")
+
+
+def serialize_rdfxml(graph, stream = None):
+	"""
+	Serialize a graph in RDF/XML, using the prefixes bound in the graph.
+
+	:param graph: the ``RDFLib`` Graph
+	:param stream: the output stream; if ``None``, the serialization is returned as a string
+	:return: the serialization if no stream is given, ``None`` otherwise
+	"""
+	output = stream if stream is not None else StringIO()
+	RDFXMLWriter(output, graph.namespaces()).serialize(graph)
+	if stream is None:
+		return output.getvalue()
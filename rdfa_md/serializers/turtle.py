@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Fast, unsorted, Turtle serializer.
+
+The ``RDFLib`` Turtle serializer produces a "pretty" output: it sorts the subjects, computes reference counts to nest blank nodes, and makes several passes over the graph. On large graphs this costs more than the parsing itself. The serializer in this module makes only one pass over the graph, and writes the statements into the output while the triples are read: the consecutive triples with the same subject (in the order they are found in the graph) form one statement, grouped by predicate. Only the triples of the current subject are kept in memory; a subject whose triples are not consecutive in the graph gets several statements. Blank nodes are not nested, and the subjects are not sorted.
+
+The prefixes bound in the graph (i.e., the ones declared in the document, plus the ones bound by ``RDFLib`` by default) are used to abbreviate the IRIs; only the prefixes that are actually used are declared in the output, each right before the first statement using it.
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from io import StringIO
+else:
+	from StringIO import StringIO
+
+import re
+
+from rdflib import Literal, BNode, RDF, XSD
+
+_local_name = re.compile(r"^([A-Za-z0-9_]([A-Za-z0-9_\-.]*[A-Za-z0-9_\-])?)?$")
+_integer    = re.compile(r"^[+\-]?\d+$")
+
+
+def _quote(value):
+	"""Escape a string for a Turtle (short) string literal"""
+	return '"%s"' % value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"').replace("\r", "\\r")
+
+
+class TurtleWriter(object):
+	"""
+	Serializer of a graph in Turtle.
+
+	:param namespaces: iterable of (prefix, namespace) pairs used to abbreviate the IRIs
+
+	**Class methods:**
+	"""
+	# Number of statements collected before they are written into the output stream
+	buffer_statements = 500
+
+	def __init__(self, namespaces):
+		self.prefixes = {}
+		for (prefix, namespace) in namespaces:
+			self.prefixes.setdefault(str(namespace), prefix)
+		self.used     = {}
+		self.declared = set()
+		self.cache    = {RDF.type : "a"}
+
+	def iri(self, uri):
+		"""
+		The Turtle encoding of a URIRef: a prefixed name if possible, the full IRI otherwise.
+
+		:param uri: URIRef
+		:rtype: str
+		"""
+		try:
+			return self.cache[uri]
+		except KeyError:
+			pass
+		value = str(uri)
+		split = max(value.rfind("#"), value.rfind("/")) + 1
+		prefix = self.prefixes.get(value[:split]) if split > 0 else None
+		if prefix is not None and _local_name.match(value[split:]):
+			self.used[prefix] = value[:split]
+			retval = "%s:%s" % (prefix, value[split:])
+		else:
+			# the URIRef method also checks the validity of the IRI
+			retval = uri.n3()
+		self.cache[uri] = retval
+		return retval
+
+	def term(self, term):
+		"""
+		The Turtle encoding of a term.
+
+		:param term: URIRef, BNode, or Literal
+		:rtype: str
+		"""
+		if isinstance(term, Literal):
+			if term.language:
+				return "%s@%s" % (_quote(term), term.language)
+			elif term.datatype:
+				if term.datatype == XSD.integer and _integer.match(term):
+					return str(term)
+				elif term.datatype == XSD.boolean and str(term) in ("true", "false"):
+					return str(term)
+				return "%s^^%s" % (_quote(term), self.iri(term.datatype))
+			return _quote(term)
+		elif isinstance(term, BNode):
+			return "_:" + str(term)
+		return self.iri(term)
+
+	def _statement(self, subject, properties):
+		"""The Turtle statement of a subject; ``properties`` maps the predicates to the lists of objects"""
+		term  = self.term
+		lines = []
+		if RDF.type in properties:
+			lines.append("a " + ", ".join(term(o) for o in properties.pop(RDF.type)))
+		for (predicate, objects) in properties.items():
+			lines.append(self.iri(predicate) + " " + ", ".join(term(o) for o in objects))
+		statement = term(subject) + " " + " ;\n    ".join(lines) + " .\n"
+		# The prefixes used for the first time are declared right before the statement
+		if len(self.used) > len(self.declared):
+			declarations = "".join("@prefix %s: <%s> .\n" % (prefix, self.used[prefix]) for prefix in sorted(self.used) if prefix not in self.declared)
+			self.declared.update(self.used)
+			return declarations + "\n" + statement + "\n"
+		return statement + "\n"
+
+	def serialize(self, graph, stream = None):
+		"""
+		Serialize the triples of a graph.
+
+		:param graph: the ``RDFLib`` Graph
+		:param stream: the output stream; if ``None``, the serialization is returned as a string
+		:return: the Turtle serialization if no stream is given, ``None`` otherwise
+		"""
+		output   = stream if stream is not None else StringIO()
+		buffer   = []
+		subject  = None
+		run      = None
+		for (s, p, o) in graph:
+			# (the identity check avoids the comparison of the terms, implemented in Python, for most triples)
+			if s is not subject and s != subject:
+				if run is not None:
+					buffer.append(self._statement(subject, run))
+					if len(buffer) >= self.buffer_statements:
+						output.write("".join(buffer))
+						del buffer[:]
+				(subject, run) = (s, {})
+			try:
+				run[p].append(o)
+			except KeyError:
+				run[p] = [o]
+		if run is not None:
+			buffer.append(self._statement(subject, run))
+		output.write("".join(buffer))
+		if stream is None:
+			return output.getvalue()
+
+
+def serialize_turtle(graph, stream = None):
+	"""
+	Serialize a graph in Turtle, using the prefixes bound in the graph.
+
+	:param graph: the ``RDFLib`` Graph
+	:param stream: the output stream; if ``None``, the serialization is returned as a string
+	:return: the serialization if no stream is given, ``None`` otherwise
+	"""
+	return TurtleWriter(graph.namespaces()).serialize(graph, stream)
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Coalescing of concurrent, identical, requests ("single flight").
+
+When a popular page is shared, many requests for the same URI, with the same options, arrive at the same time; without coordination each of them would retrieve and parse the same page. With :py:func:`coalesce`, the first request (the "leader") does the work, and the identical requests arriving while it is in flight wait for, and return, its result:
+
+- within a process, the requests are coordinated through a table of the requests in flight (i.e., the threads of a multi threaded server share the result in memory);
+- across processes on the same host (e.g., the CGI processes, or the workers of a server), the requests are coordinated through a lock file per key: the leader holds an exclusive lock while working; a process arriving meanwhile registers itself as waiting (through a marker file of the key), and waits for the lock. If there are waiting processes, the leader stores the result in a file, which the waiting processes use, provided it has been produced after they arrived. The outdated lock, result, and marker files are removed regularly (every :py:data:`result_lifetime` seconds); a lock file is removed only while holding its lock, and a process that got the lock of a removed file tries again with the new file.
+
+The wait is bounded by the time budget of the request, if any (see :py:class:`~.pyrdfa.utils.Deadline`): once it runs out, the request is processed independently. The files are in the ``inflight`` subdirectory of the cache directory (see :py:mod:`~.pyrdfa.cachedir`). The cross process coordination relies on ``fcntl``, i.e., it is not available on Windows, where only the threads are coordinated.
+
+The key of a request (see :py:func:`request_key`) is built from the normalized URI of the source and from all the other request options; requests with uploaded or direct text input are never coalesced.
+
+**Module constants:**
+
+.. py:data:: result_lifetime
+
+   The time, in seconds, the result of a request is kept for the processes that waited for it
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from urllib.parse import urlsplit, urlunsplit
+else:
+	from urlparse import urlsplit, urlunsplit
+
+import os
+import time
+import hashlib
+import tempfile
+import threading
+
+from .pyrdfa.cachedir import cache_directory
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+result_lifetime = 60
+
+# Interval, in seconds, between two attempts to get the lock of a key, if the wait is bounded
+_poll_interval = 0.05
+
+# Request headers (as CGI environment variables) that are part of the key of a request, besides the URI and the form
+_headers = ("HTTP_IF_NONE_MATCH",)
+
+
+def normalize_uri(uri):
+	"""
+	Normalize a URI for the comparison of requests: the scheme and the host are turned into lower case, the default port and the fragment are removed.
+
+	:param str uri: the URI
+	:rtype: str
+	"""
+	parts  = urlsplit(uri.strip())
+	scheme = parts.scheme.lower()
+	netloc = parts.netloc.lower()
+	if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+		netloc = netloc.rsplit(":", 1)[0]
+	return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def request_key(service, uri, form, environ = None):
+	"""
+	The key of a request.
+
+	:param str service: the name of the service (e.g., ``rdfa`` or ``microdata``)
+	:param str uri: the URI of the source
+	:param cgi.FieldStorage form: the query parameters of the request
+	:param dict environ: the CGI variables of the request (i.e., its headers); if ``None``, the environment of the process is used
+	:return: the key, or ``None`` if the request should not be coalesced (i.e., for uploaded or text input)
+	:rtype: str
+	"""
+	if uri in ("text:", "uploaded:"):
+		return None
+	options = sorted("%s=%s" % (key, form.getfirst(key)) for key in form.keys() if key != "uri")
+	environ = environ if environ is not None else os.environ
+	headers = ["%s=%s" % (name, environ.get(name, "")) for name in _headers]
+	value   = "\n".join([service, normalize_uri(uri)] + options + headers)
+	return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+
+class _Flight(object):
+	"""A request in flight within the process"""
+	def __init__(self):
+		self.done   = threading.Event()
+		self.result = None
+		self.failed = False
+
+
+_flights = {}
+_lock    = threading.Lock()
+
+
+def _directory():
+	return cache_directory("inflight")
+
+
+_last_sweep = [0]
+
+
+def _sweep(directory):
+	"""Remove the outdated lock, result, and marker files, at most once every :py:data:`result_lifetime` seconds in a process; a lock file is removed only if it is not locked"""
+	now = time.time()
+	with _lock:
+		if now - _last_sweep[0] < result_lifetime:
+			return
+		_last_sweep[0] = now
+	limit = now - result_lifetime
+	try:
+		names = os.listdir(directory)
+	except OSError:
+		return
+	for name in names:
+		path = os.path.join(directory, name)
+		try:
+			if name.endswith(".lock"):
+				if os.path.getmtime(path) < limit:
+					with open(path, "a") as lock:
+						fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+						os.remove(path)
+			elif name.endswith(".result") or name.endswith(".waiting"):
+				if os.path.getmtime(path) < limit:
+					os.remove(path)
+		except (IOError, OSError):
+			# in use, or removed by another process
+			pass
+
+
+def _take_lock(path, deadline, waiting):
+	"""
+	Take the lock of a key.
+
+	:param str path: the lock file
+	:param deadline: the time budget of the request, bounding the wait; ``None`` means no limit
+	:param str waiting: the marker file, touched if the lock is held by another process
+	:return: the open lock file, holding the lock, or ``None`` if the budget ran out
+	"""
+	registered = False
+	while True:
+		lock = open(path, "a")
+		try:
+			fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+		except (IOError, OSError):
+			# Another process is working on the same request: register, and wait
+			if not registered:
+				try:
+					with open(waiting, "a"):
+						os.utime(waiting, None)
+				except (IOError, OSError):
+					pass
+				registered = True
+			try:
+				if deadline is None:
+					fcntl.flock(lock, fcntl.LOCK_EX)
+				else:
+					while True:
+						if deadline.expired():
+							lock.close()
+							return None
+						time.sleep(_poll_interval)
+						try:
+							fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+							break
+						except (IOError, OSError):
+							pass
+			except:
+				lock.close()
+				raise
+		# The file may have been removed by a sweep while waiting; the lock is valid only for the current file
+		try:
+			if os.fstat(lock.fileno()).st_ino == os.stat(path).st_ino:
+				os.utime(path, None)
+				return lock
+		except OSError:
+			pass
+		lock.close()
+
+
+def _across_processes(key, function, deadline):
+	"""Coordinate the request with the other processes on the host, via the lock files"""
+	if fcntl is None:
+		return function()
+	arrival   = time.time()
+	directory = _directory()
+	result    = os.path.join(directory, key + ".result")
+	waiting   = os.path.join(directory, key + ".waiting")
+	try:
+		lock = _take_lock(os.path.join(directory, key + ".lock"), deadline, waiting)
+		if lock is None:
+			return function()
+		with lock:
+			try:
+				try:
+					if os.path.getmtime(result) >= arrival:
+						with open(result, "rb") as f:
+							return f.read().decode("utf-8")
+				except (IOError, OSError):
+					pass
+				start  = time.time()
+				retval = function()
+				try:
+					# The result is stored only if processes have registered as waiting while the work was done
+					if os.path.getmtime(waiting) >= start:
+						(fd, tmp) = tempfile.mkstemp(dir = directory)
+						with os.fdopen(fd, "wb") as f:
+							f.write(retval.encode("utf-8"))
+						os.rename(tmp, result)
+				except (IOError, OSError):
+					# no process is waiting; or the others will do the work themselves
+					pass
+				return retval
+			finally:
+				fcntl.flock(lock, fcntl.LOCK_UN)
+	finally:
+		_sweep(directory)
+
+
+def coalesce(key, function, deadline = None):
+	"""
+	Run a function, unless an identical request is in flight, in which case its result is returned.
+
+	:param str key: the key of the request (see :py:func:`request_key`); if ``None``, the function is simply called
+	:param function: the function doing the work; it must return a string (e.g., an HTTP response)
+	:param deadline: the time budget of the request, bounding the wait for the identical request in flight; ``None`` means no limit
+	:type deadline: :py:class:`~.pyrdfa.utils.Deadline`
+	:return: the result of the function, or of the identical request in flight
+	:rtype: str
+	"""
+	if key is None:
+		return function()
+	with _lock:
+		flight = _flights.get(key)
+		leader = flight is None
+		if leader:
+			flight = _flights[key] = _Flight()
+	if not leader:
+		if flight.done.wait(deadline.remaining() if deadline is not None else None) and not flight.failed:
+			return flight.result
+		# the leader raised an exception, or the budget ran out; try again independently
+		return function()
+	try:
+		flight.result = _across_processes(key, function, deadline)
+		return flight.result
+	except:
+		flight.failed = True
+		raise
+	finally:
+		with _lock:
+			del _flights[key]
+		flight.done.set()
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Compact, in-memory, ``RDFLib`` store for the extraction results.
+
+The default ``RDFLib`` memory store keeps three nested dictionary indexes (by subject, by predicate, and by object) of the full term objects, i.e., every triple is stored three times, in several dictionaries each. The graphs built by the services are different: they are filled once, by the parser, and then read once, by the serializer (which mostly iterates over all the triples). The :py:class:`CompactStore` class is optimized for that usage:
+
+- every term is interned, i.e., mapped to a small integer identifier; the term objects themselves are stored only once;
+- the triples are stored in three ``array`` columns of identifiers, plus one set of (integer) keys used to filter duplicates;
+- an index (from a term identifier to the rows of the triples using it in a given position) is built only when a query with that position bound is made; once built, it is maintained when new triples are added;
+- removal is rare; a removed triple is only marked in the columns, which are compacted when the removed triples make up half of the rows.
+
+The store is not context aware, i.e., it can be used for a ``Graph`` but not for a ``ConjunctiveGraph`` or ``Dataset``. Use :py:func:`compact_graph` to create a graph backed by this store.
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+from array import array
+
+from rdflib import Graph
+from rdflib.store import Store
+
+# Rows of removed triples have this value in the subject column
+_REMOVED = -1
+# Positions of the terms in the packed keys of the triples
+_SHIFT   = 32
+
+
+def _no_contexts():
+	return iter(())
+
+
+class CompactStore(Store):
+	"""
+	Append-mostly triple store using interned terms and array based columns.
+
+	:param configuration: ignored (required by the ``RDFLib`` Store interface)
+	:param identifier: identifier of the store
+
+	**Class attributes:**
+
+	.. py:attribute:: terms
+
+	   list of the interned terms; the identifier of a term is its index in this list
+
+	.. py:attribute:: ids
+
+	   dictionary from the terms to their identifiers
+
+	.. py:attribute:: columns
+
+	   the subject, predicate, and object columns of the triples (arrays of term identifiers)
+
+	**Class methods:**
+	"""
+	context_aware = False
+	formula_aware = False
+	graph_aware   = False
+	transaction_aware = False
+
+	def __init__(self, configuration = None, identifier = None):
+		Store.__init__(self, configuration)
+		self.identifier = identifier
+		self.terms      = []
+		self.ids        = {}
+		self.columns    = (array("l"), array("l"), array("l"))
+		self.keys       = set()
+		self.indexes    = [None, None, None]
+		self.removed    = 0
+		self._namespace = {}
+		self._prefix    = {}
+
+	def _intern(self, term):
+		"""Return the identifier of a term, adding it to the store if necessary"""
+		try:
+			return self.ids[term]
+		except KeyError:
+			retval = self.ids[term] = len(self.terms)
+			self.terms.append(term)
+			return retval
+
+	def _index(self, position):
+		"""Return the index for a position (0, 1, or 2), building it if necessary"""
+		index = self.indexes[position]
+		if index is None:
+			index = {}
+			for (row, id) in enumerate(self.columns[position]):
+				if id not in index:
+					index[id] = array("l")
+				index[id].append(row)
+			self.indexes[position] = index
+		return index
+
+	def add(self, triple, context = None, quoted = False):
+		"""
+		Add a triple to the store; duplicates are ignored.
+
+		:param triple: the (subject, predicate, object) tuple
+		"""
+		intern = self._intern
+		ids    = (intern(triple[0]), intern(triple[1]), intern(triple[2]))
+		key    = (((ids[0] << _SHIFT) | ids[1]) << _SHIFT) | ids[2]
+		if key in self.keys:
+			return
+		self.keys.add(key)
+		row = len(self.columns[0])
+		for position in (0, 1, 2):
+			self.columns[position].append(ids[position])
+			index = self.indexes[position]
+			if index is not None:
+				if ids[position] not in index:
+					index[ids[position]] = array("l")
+				index[ids[position]].append(row)
+
+	def _rows(self, pattern):
+		"""
+		Generate the rows matching a triple pattern.
+
+		:param pattern: (subject, predicate, object) tuple, where ``None`` stands for any term
+		"""
+		bound = []
+		for position in (0, 1, 2):
+			if pattern[position] is not None:
+				id = self.ids.get(pattern[position])
+				if id is None:
+					# unknown term: nothing can match
+					return
+				bound.append((position, id))
+
+		(subjects, predicates, objects) = self.columns
+		if len(bound) == 3:
+			key = (((bound[0][1] << _SHIFT) | bound[1][1]) << _SHIFT) | bound[2][1]
+			if key in self.keys:
+				for row in self._index(0).get(bound[0][1], ()):
+					if predicates[row] == bound[1][1] and objects[row] == bound[2][1] and subjects[row] != _REMOVED:
+						yield row
+						return
+			return
+
+		if bound:
+			# The predicate is the least selective position: use its index only if nothing else is bound
+			(position, id) = min(bound, key = lambda b: (b[0] == 1, b[0]))
+			rows = self._index(position).get(id, ())
+		else:
+			rows = range(len(subjects))
+		# rows added while iterating are not visited
+		for i in range(len(rows)):
+			row = rows[i]
+			if subjects[row] == _REMOVED:
+				continue
+			for (position, id) in bound:
+				if self.columns[position][row] != id:
+					break
+			else:
+				yield row
+
+	def triples(self, triple_pattern, context = None):
+		"""
+		Generate the triples matching a pattern.
+
+		:param triple_pattern: (subject, predicate, object) tuple, where ``None`` stands for any term
+		:return: generator of (triple, contexts) tuples, as required by the ``RDFLib`` Store interface
+		"""
+		terms = self.terms
+		(subjects, predicates, objects) = self.columns
+		for row in self._rows(triple_pattern):
+			yield (terms[subjects[row]], terms[predicates[row]], terms[objects[row]]), _no_contexts()
+
+	def remove(self, triple_pattern, context = None):
+		"""
+		Remove the triples matching a pattern.
+
+		:param triple_pattern: (subject, predicate, object) tuple, where ``None`` stands for any term
+		"""
+		(subjects, predicates, objects) = self.columns
+		for row in list(self._rows(triple_pattern)):
+			self.keys.discard((((subjects[row] << _SHIFT) | predicates[row]) << _SHIFT) | objects[row])
+			subjects[row] = _REMOVED
+			self.removed += 1
+		if self.removed and self.removed * 2 >= len(subjects):
+			self._compact()
+
+	def _compact(self):
+		"""Drop the rows of the removed triples; the indexes are dropped, too, and rebuilt when needed"""
+		(subjects, predicates, objects) = self.columns
+		columns = (array("l"), array("l"), array("l"))
+		for row in range(len(subjects)):
+			if subjects[row] != _REMOVED:
+				columns[0].append(subjects[row])
+				columns[1].append(predicates[row])
+				columns[2].append(objects[row])
+		self.columns = columns
+		self.indexes = [None, None, None]
+		self.removed = 0
+
+	def __len__(self, context = None):
+		return len(self.keys)
+
+	def bind(self, prefix, namespace, override = True):
+		"""Bind a prefix to a namespace (same semantics as for the ``RDFLib`` memory store)"""
+		bound_namespace = self._namespace.get(prefix)
+		bound_prefix    = self._prefix.get(namespace)
+		if bound_prefix is None and bound_namespace is not None:
+			bound_prefix = self._prefix.get(bound_namespace)
+		if override:
+			if bound_prefix is not None:
+				del self._namespace[bound_prefix]
+			if bound_namespace is not None:
+				del self._prefix[bound_namespace]
+			self._prefix[namespace] = prefix
+			self._namespace[prefix] = namespace
+		else:
+			namespace = bound_namespace if bound_namespace is not None else namespace
+			prefix    = bound_prefix if bound_prefix is not None else prefix
+			self._prefix[namespace] = prefix
+			self._namespace[prefix] = namespace
+
+	def namespace(self, prefix):
+		return self._namespace.get(prefix)
+
+	def prefix(self, namespace):
+		return self._prefix.get(namespace)
+
+	def namespaces(self):
+		for (prefix, namespace) in list(self._namespace.items()):
+			yield prefix, namespace
+
+
+def compact_graph():
+	"""
+	Create a new, empty, graph backed by a :py:class:`CompactStore`.
+
+	:rtype: ``RDFLib`` Graph
+	"""
+	return Graph(store = CompactStore())
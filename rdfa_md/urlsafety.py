@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Cached safety checks of the URLs submitted to the services (see :py:func:`~rdfa_md.brett_test`).
+
+At the W3C, each URL is checked, via an external library (``check_url_safety``), before the source is retrieved; the check may take a noticeable time, and the same hosts are checked over and over again. The verdicts are therefore cached, keyed by the host *and* by the address the host resolves to (i.e., if the DNS entry of a host changes, the host is checked again). Successful checks are kept for :py:data:`positive_ttl` seconds, failed ones (with the error message) for :py:data:`negative_ttl` seconds. The cache is kept in memory, for the threads of a process, and on disk, in the ``urlsafety`` subdirectory of the cache directory (see :py:mod:`~.pyrdfa.cachedir`), for the separate CGI processes.
+
+A :py:class:`SafetyCheck` can run in the background while the request waits for admission (see :py:mod:`~.admission`); the source is retrieved only after the check has passed.
+
+The checker is set by :py:data:`checker`; :py:func:`stub_checker` is a local replacement of the W3C library, making it possible to run the checks off-line.
+
+**Module constants:**
+
+.. py:data:: positive_ttl
+
+   The time, in seconds, a successful check is cached
+
+.. py:data:: negative_ttl
+
+   The time, in seconds, a failed check is cached
+
+.. py:data:: checker
+
+   The function checking a URL; it raises an exception if the URL is not safe. If ``None``, ``check_url_safety`` of the W3C ``checkremote`` library is used
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from urllib.parse import urlsplit
+	from urllib.error import HTTPError, URLError
+else:
+	from urlparse import urlsplit
+	from urllib2 import HTTPError, URLError
+
+import os
+import json
+import time
+import socket
+import hashlib
+import tempfile
+import threading
+
+from .pyrdfa.cachedir import cache_directory, using_cache_directory
+
+try:
+	import ipaddress
+except ImportError:
+	ipaddress = None
+
+positive_ttl = 60 * 60
+negative_ttl = 5 * 60
+checker      = None
+
+_memo = {}
+_lock = threading.Lock()
+
+
+def _address(host, port):
+	"""The (first) address a host resolves to; empty string if it cannot be resolved"""
+	try:
+		return socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0][4][0]
+	except (socket.error, UnicodeError):
+		return ""
+
+
+def _addresses(host):
+	try:
+		return set(info[4][0] for info in socket.getaddrinfo(host, None))
+	except (socket.error, UnicodeError):
+		return set()
+
+
+def stub_checker(uri):
+	"""
+	Local, simplified, replacement of the W3C safety check: only ``http`` and ``https`` URLs are accepted, and their host must not resolve to a loopback, private, link local, or reserved address.
+
+	:param str uri: the URL
+	:raises URLError: if the URL is not safe
+	"""
+	parts = urlsplit(uri)
+	if parts.scheme not in ("http", "https"):
+		raise URLError("Unsupported URL scheme: '%s'" % parts.scheme)
+	if not parts.hostname:
+		raise URLError("No host in the URL")
+	addresses = _addresses(parts.hostname)
+	if not addresses:
+		raise URLError("Unknown host: %s" % parts.hostname)
+	if ipaddress is not None:
+		for address in addresses:
+			ip = ipaddress.ip_address(address.split("%")[0] if PY3 else address.decode("ascii"))
+			if ip.is_loopback or ip.is_private or ip.is_link_local or ip.is_reserved or ip.is_multicast:
+				raise URLError("The host %s resolves to a non public address" % parts.hostname)
+
+
+def _check(uri):
+	"""Run the checker on a URL; return an error message, or ``None`` if the URL is safe"""
+	if checker is not None:
+		check_url_safety = checker
+		UnsupportedResourceError = ()
+	else:
+		from checkremote import check_url_safety, UnsupportedResourceError
+	try:
+		check_url_safety(uri)
+		# If we got here, there have been no issues; the checker simply raises exceptions
+		return None
+	except HTTPError as e:
+		return 'HTTP Error with the error code: %s and the error message: "%s"' % (e.code, e.reason)
+	except URLError as e:
+		return 'URL Error with the error message: "%s"' % e.reason
+	except UnsupportedResourceError as e:
+		msg = e.args[0] + ": " + e.args[1]
+		return 'Unsupported Resource Error with the error message "%s"' % msg
+	except Exception as e:
+		args = len(e.args)
+		msg = "" if args == 0 else (e.args[0] if args == 1 else repr(e.args))
+		return 'Exception raised: "%s"' % msg
+
+
+def _directory():
+	return cache_directory("urlsafety")
+
+
+def _lookup(key):
+	"""The cached verdict for a key, i.e., ``(passed, message)``, or ``None``"""
+	now = time.time()
+	with _lock:
+		entry = _memo.get(key)
+	if entry is None:
+		try:
+			with open(os.path.join(_directory(), key + ".json")) as f:
+				entry = json.load(f)
+		except (IOError, OSError, ValueError):
+			return None
+		with _lock:
+			_memo[key] = entry
+	if entry["expires"] < now:
+		return None
+	return (entry["message"] is None, entry["message"])
+
+
+def _store(key, message):
+	entry = {"expires" : time.time() + (positive_ttl if message is None else negative_ttl), "message" : message}
+	with _lock:
+		_memo[key] = entry
+	try:
+		directory = _directory()
+		(fd, tmp) = tempfile.mkstemp(dir = directory)
+		with os.fdopen(fd, "w") as f:
+			json.dump(entry, f)
+		os.rename(tmp, os.path.join(directory, key + ".json"))
+	except (IOError, OSError):
+		# the verdict is still cached in memory
+		pass
+
+
+def check_url(uri):
+	"""
+	Check the safety of a URL, using the cached verdict for its host, if available.
+
+	:param str uri: the URL
+	:return: a ``(passed, message)`` tuple, where the message is the reason of the failure (``None`` if the check passed)
+	:rtype: tuple
+	"""
+	parts = urlsplit(uri)
+	host  = (parts.hostname or "").lower()
+	try:
+		port = parts.port or (443 if parts.scheme == "https" else 80)
+	except ValueError:
+		port = 80
+	key = hashlib.sha1(("%s|%s|%s|%s" % (parts.scheme, host, port, _address(host, port))).encode("utf-8")).hexdigest()
+	retval = _lookup(key)
+	if retval is None:
+		message = _check(uri)
+		_store(key, message)
+		retval = (message is None, message)
+	return retval
+
+
+class SafetyCheck(object):
+	"""
+	The safety check of a URL, run in the background.
+
+	:param str uri: the URL
+	:param bool start: whether the check should be started right away
+
+	**Class attributes:**
+
+	.. py:attribute:: message
+
+	   the reason of the failure, once :py:meth:`passed` has returned ``False`` (``None`` otherwise)
+
+	**Class methods:**
+	"""
+	def __init__(self, uri, start = True):
+		self.uri     = uri
+		self.message = None
+		self._result = None
+		# the check runs in a separate thread, which does not inherit the cache directory set for the current one
+		self._directory = cache_directory()
+		self._thread = threading.Thread(target = self._run)
+		self._thread.daemon = True
+		if start:
+			self._thread.start()
+
+	def _run(self):
+		with using_cache_directory(self._directory):
+			self._result = check_url(self.uri)
+
+	def passed(self):
+		"""
+		Wait for the result of the check. Nothing is reported to the client: if the check failed, the reason is in :py:attr:`message`, and it is up to the caller to respond (e.g., via :py:func:`~rdfa_md.err_message` in the CGI scripts).
+
+		:rtype: bool
+		"""
+		if self._thread.ident is None:
+			self._run()
+		else:
+			self._thread.join()
+		(passed, self.message) = self._result
+		return passed
@@ -7,10 +7,24 @@ PY3 = (sys.version_info[0] >= 3)
 
 if PY3:
 	from io import StringIO
+	from http.client import responses
 else:
 	from StringIO import StringIO
+	from httplib import responses
 
-from rdflib.plugins.parsers.pyRdfa.host import MediaTypes
+import os, traceback
+
+from .pyrdfa.host import MediaTypes
+from .pyrdfa.utils import Deadline
+from .filters import GraphFilter, parse_iri_list
+from .cleanhtml import clean_str
+
+# Time budget, in seconds, of a request if the form does not set one, and the maximum the form may set
+default_timeout = 60
+max_timeout     = 300
+
+# Faster serializations, used if the time budget has run out before the serialization
+_fast_formats = {"turtle" : "turtle-fast", "pretty-xml" : "xml"}
 
 
 #############################################################################################
@@ -19,14 +33,15 @@ from rdflib.plugins.parsers.pyRdfa.host import MediaTypes
 class FormValues(object):
 	"""Various options to be extracted from the form (ie, a CGI FieldStorage instance)
 	This class collects what is common in handling simple RDF parsing as well as for
-	the validator.
+	the validator. It is the adapter between the HTTP interface and the programmatic one: see :py:meth:`service_options`.
 
-	:param cgi.FieldStorage form: the query parameters of the original request.
+	:param form: the query parameters of the original request; any object with the ``keys`` and ``getfirst`` methods of a ``cgi.FieldStorage`` instance (see, e.g., :py:class:`~.wsgi.QueryForm`)
+	:param dict environ: the CGI variables of the request (i.e., its headers); if ``None``, the environment of the process is used (which is only correct if the process serves one request, like a CGI script)
 
 	The meaning of the form values are. The "default" values are set in the local class attribute, when applicable and the form itself does not hold any value:
 
 	- ``graph=[output|processor|output,processor|processor,output]``: specifying which graphs are returned. Default: ``output``.
-	- ``format=[turtle|xml|json-ld|nt]``: serialization format for the output. Default: ``turtle``.
+	- ``format=[turtle|turtle-fast|xml|pretty-xml|json-ld|nt]``: serialization format for the output; ``turtle-fast`` is an unsorted, but much faster, Turtle serialization (see :py:mod:`~.serializers.turtle`); ``xml`` is a flat RDF/XML serialization (see :py:mod:`~.serializers.rdfxml`), ``pretty-xml`` is the nested (but much slower) one. Default: ``turtle``.
 	- ``space_preserve=[true|false]``: means that plain literals are normalized in terms of white spaces. Default: ``false``. Also stored as a class attribute.
 	- ``host_language=[xhtml,html,xml]``: the host language. Used when files are uploaded or text is added verbatim, otherwise the HTTP return header should be used. Default ``xml``. Also stored as a class attribute.
 	- ``embedded_rdf=[true|false]``: whether embedded turtle or RDF/XML content should be added to the output graph. Default:``false``. Also stored as a class attribute.
@@ -37,6 +52,14 @@ class FormValues(object):
 	- ``rdfa_lite=[true|false]``: whether warnings should be generated for non RDFa Lite attribute usage. Default: ``false``
 	- ``rdfa_version=["1.1"|"1.0"]``: RDFa version. If missing, set to 1.1.
 	- ``rdfagraph=["processor","output,processor","processor,output"]``: what graphs should be generated, see `the relevant section in the specification <https://www.w3.org/TR/rdfa-core/#accessing-the-processor-graph>`_ for further details.
+	- ``streaming=[true|false]``: whether the RDFa content should be processed in streaming mode, i.e., without building a DOM tree first. Used only if the host language is ``xml``, ``svg``, or ``atom``, see :py:mod:`~.rdfa_stream`. Default: ``false``. Also stored as a class attribute.
+	- ``types=...``: list of types (absolute IRIs, CURIEs, or schema.org terms, separated by commas or spaces); only the resources with one of these types, and the resources reachable from them, are returned (see :py:mod:`~.filters`). Default: no filtering. Also stored as a class attribute.
+	- ``predicates=...``: list of predicates (in the same form as for ``types``); only the triples with these predicates are returned. Default: no filtering. Also stored as a class attribute.
+	- ``scope=...``: an element id or a simple CSS selector (see :py:mod:`~.pyrdfa.scope`); only the subtree of the (first) matching element is processed. Default: the whole document. Also stored as a class attribute.
+	- ``paged=[true|false]``: whether the result should be stored on the server and returned page by page; used for the ``nt`` and ``json-ld`` formats only (see :py:mod:`~.pages`). Default: ``false``. Also stored as a class attribute.
+	- ``page_size=n``: number of triples in a page. Default: :py:data:`~.pages.default_page_size`. Also stored as a class attribute.
+	- ``depth=n``: maximum number of steps followed from the resources selected by ``types``; 0 means only the triples of those resources are returned. Default: no limit. Also stored as a class attribute.
+	- ``timeout=n``: time budget of the request, in seconds, covering the retrieval, the parsing, the vocabulary expansion, and the serialization; if it runs out after the parsing, an incomplete result is returned. Default: ``default_timeout``, and the value cannot exceed ``max_timeout``. Also stored as a class attribute.
 
     **Class attributes:**
 
@@ -54,18 +77,31 @@ class FormValues(object):
 
 	.. py:attribute:: media_type
 
-	   media type; values are from the enumeration type class in :py:Class:`rdflib.plugins.parsers.pyRdfa.host.MediaType`
+	   media type; values are from the enumeration type class in :py:class:`~.pyrdfa.host.MediaTypes`
 
 	.. py:attribute:: output_format
 
 	   serialization format for the output
 
+	.. py:attribute:: graph_filter
+
+	   the :py:class:`~.filters.GraphFilter` built from the ``types``, ``predicates``, and ``depth`` values
+
+	.. py:attribute:: environ
+
+	   the CGI variables of the request
+
+	.. py:attribute:: deadline
+
+	   the :py:class:`~.pyrdfa.utils.Deadline` of the request, started when the instance is created
+
     **Class methods:**
 
 	"""
-	def __init__(self, form):
-		self.form = form
-		self.keys = list(form.keys())
+	def __init__(self, form, environ = None):
+		self.form    = form
+		self.keys    = list(form.keys())
+		self.environ = environ if environ is not None else os.environ
 		self.host_language       = self.get_value("host_language")
 		self.media_type          = self._get_media_type()
 		self.rdfa_version        = self.get_value("rdfa_version", "1.1")
@@ -76,7 +112,17 @@ class FormValues(object):
 		self.vocab_cache_report  = self.check_option("vocab_cache_report", "true", False)
 		self.refresh_vocab_cache = self.check_option("vocab_cache_refresh", "true", False)
 		self.vocab_expansion     = self.check_option("vocab_expansion", "true", False)
+		self.streaming           = self.check_option("streaming", "true", False)
 		self.output_format       = self.get_value("format", "turtle")
+		self.types               = parse_iri_list(self.get_raw_value("types"))
+		self.predicates          = parse_iri_list(self.get_raw_value("predicates"))
+		self.depth               = self._get_depth()
+		self.scope               = self.get_raw_value("scope", "").strip() or None
+		self.paged               = self.check_option("paged", "true", False)
+		self.page_size           = self._get_page_size()
+		self.graph_filter        = GraphFilter(self.types, self.predicates, self.depth)
+		self.timeout             = self._get_timeout()
+		self.deadline            = Deadline(self.timeout)
 
 	def _get_media_type(self):
 		"""Get the media type, ie, convert the data in the form to the final MediaType values"""
@@ -94,6 +140,66 @@ class FormValues(object):
 			media_type = MediaTypes.xml
 		return media_type
 
+	def _get_depth(self):
+		"""Get the depth limit of the filter; a missing or invalid value means no limit"""
+		try:
+			depth = int(self.get_value("depth"))
+			return depth if depth >= 0 else None
+		except (TypeError, ValueError):
+			return None
+
+	def _get_page_size(self):
+		"""Get the number of triples in a page; a missing or invalid value means the default"""
+		from .pages import default_page_size
+		try:
+			size = int(self.get_value("page_size"))
+			return size if size > 0 else default_page_size
+		except (TypeError, ValueError):
+			return default_page_size
+
+	def _get_timeout(self):
+		"""Get the time budget of the request; a missing or invalid value means the default"""
+		try:
+			timeout = float(self.get_value("timeout"))
+			return min(timeout, max_timeout) if timeout > 0 else default_timeout
+		except (TypeError, ValueError):
+			return default_timeout
+
+	def service_options(self):
+		"""The options of the request for the programmatic interface.
+
+		:rtype: :py:class:`~.api.ServiceOptions`
+		"""
+		from .api import ServiceOptions
+		return ServiceOptions(media_type          = self.media_type,
+							  rdfa_version        = self.rdfa_version,
+							  check_lite          = self.check_lite,
+							  embedded_rdf        = self.embedded_rdf,
+							  space_preserve      = self.space_preserve,
+							  vocab_expansion     = self.vocab_expansion,
+							  vocab_cache         = self.vocab_cache,
+							  vocab_cache_report  = self.vocab_cache_report,
+							  refresh_vocab_cache = self.refresh_vocab_cache,
+							  streaming           = self.streaming,
+							  output_format       = self.output_format,
+							  graphs              = self.get_value2("rdfagraph", "graph") or "output",
+							  types               = self.types,
+							  predicates          = self.predicates,
+							  depth               = self.depth,
+							  scope               = self.scope,
+							  paged               = self.paged,
+							  page_size           = self.page_size,
+							  timeout             = self.timeout)
+
+	def serialization_format(self):
+		"""Get the serialization format; if the time budget of the request has already run out, the faster variant of the requested format (if any) is used instead.
+
+		:rtype: str
+		"""
+		if self.deadline.expired():
+			return _fast_formats.get(self.output_format, self.output_format)
+		return self.output_format
+
 	def get_value(self, key, default = None):
 		"""Get a value if exists, set the default otherwise.
 
@@ -105,6 +211,17 @@ class FormValues(object):
 		"""
 		return self.form.getfirst(key).lower() if key in self.keys else default
 
+	def get_raw_value(self, key, default = None):
+		"""Get a value if exists, set the default otherwise. Unlike :py:meth:`get_value`, the value is not converted to lower case (used for IRIs).
+
+		:param str key: form key
+		:param default: default value
+		:type default: str or None
+		:return: the corresponding form value or the default
+
+		"""
+		return self.form.getfirst(key) if key in self.keys else default
+
 	def get_value2(self, key1, key2):
 		"""Get one of two options, in priority order, None if neither is present.
 
@@ -142,13 +259,26 @@ class FormValues(object):
 		"""
 		# Collect the data, depending on what mechanism is used in the form
 		if uri == "uploaded:":
-			return (self.form["uploaded"].file, "")
+			# a cgi.FieldStorage item has the file as an attribute
+			uploaded = self.form["uploaded"]
+			return (getattr(uploaded, "file", uploaded), "")
 		elif uri == "text:":
 			return (StringIO(self.form.getfirst("text")), "")
 		else:
 			return (uri, uri)
 
 
+def acceptable_source(uri):
+	"""
+	Check whether the source of a request may be processed by the services: the ``text:`` and ``uploaded:`` fake URIs, and the ``http`` and ``https`` URIs. (Anything else would be read by the processors as a local file, i.e., a request could read the files of the server.)
+
+	:param str uri: the URI of the request
+	:rtype: bool
+	"""
+	lower = (uri or "").lower()
+	return lower in ("text:", "uploaded:") or lower.startswith("http://") or lower.startswith("https://")
+
+
 #########################################################################################
 #  Helper functions to handle exceptions
 #########################################################################################
@@ -166,13 +296,15 @@ def handle_general_exception(uri, title, form_values, graph_choice = "", extract
 	:return: full HTTP response encoding the information in HTML
 	:rtype: str
 
-	This function *should* be invoked from an ``except`` clause.
+	This function *should* be invoked from an ``except`` clause. The response of a failure that may not happen again (a network error, or the time budget of the request running out) gets a ``Cache-Control: no-store`` header, i.e., it is not kept by :py:mod:`~.failures`.
 	"""
 	# This branch should occur only if an exception is really raised, ie, if it is not turned
 	# into a graph value.
+	error  = sys.exc_info()[1]
 	retval =  'Status: 400 Invalid Input\n'
+	if form_values.deadline.expired() or getattr(error, "transient", False) or isinstance(error, EnvironmentError):
+		retval += 'Cache-Control: no-store\n'
 	retval += 'Content-type: text/html; charset=utf-8\n'
-	retval += 'Status: %s\n' % 400
 	retval += '\n'
 	retval += "<html>\n"
 	retval += "<head>\n"
@@ -186,12 +318,13 @@ def handle_general_exception(uri, title, form_values, graph_choice = "", extract
 	retval += "</pre>\n"
 	retval += "<h1>Distiller request details</h1>\n"
 	retval += "<dl>\n"
-	if uri == "text:" and "text" in form_values.form and form_values.form["text"].value is not None and len(form_values.form["text"].value.strip()) != 0:
-		retval += "<dt>Text input:</dt><dd>%s</dd>\n" % cgi.escape(form_values.form["text"].value).replace('\n', '<br/>')
+	text = form_values.get_raw_value("text")
+	if uri == "text:" and text is not None and len(text.strip()) != 0:
+		retval += "<dt>Text input:</dt><dd>%s</dd>\n" % clean_str(text).replace('\n', '<br/>')
 	elif uri == "uploaded:":
 		retval += "<dt>Uploaded file</dt>\n"
 	else :
-		retval += "<dt>URI received:</dt><dd><code>'%s'</code></dd>\n" % cgi.escape(uri)
+		retval += "<dt>URI received:</dt><dd><code>'%s'</code></dd>\n" % clean_str(uri)
 	if form_values.host_language:
 		retval += "<dt>Media Type:</dt><dd>%s</dd>\n" % form_values.media_type
 	if extracts:
@@ -213,19 +346,43 @@ def handle_http_exception(uri, title):
 	:return: full HTTP response encoding the information in HTML
 	:rtype: str
 
-	This function *should* be invoked from an ``except`` clause for an ``HTTPError``.
+	This function *should* be invoked from an ``except`` clause for an ``HTTPError``. Only the ``404`` and ``410`` errors are lasting; the other responses get a ``Cache-Control: no-store`` header, i.e., they are not kept by :py:mod:`~.failures`.
 	"""
 	(e_type, h, e_traceback) = sys.exc_info()
-	retval =  'Status: 400 Invalid Input\n'
+	retval =  'Status: %s %s\n' % (h.http_code, responses.get(h.http_code, "Error"))
+	if h.http_code not in (404, 410):
+		retval += 'Cache-Control: no-store\n'
 	retval += 'Content-type: text/html; charset=utf-8\n'
-	retval += 'Status: %s\n' % h.http_code
+	retval += '\n'
 	retval += "<html>\n"
 	retval += "<head>\n"
-	retval += "<title></title>\n" %s
+	retval += "<title>%s</title>\n" % title
 	retval += "</head><body>\n"
 	retval += "<h1>%s</h1>\n" % title
 	retval += "<p>HTTP Error: %s (%s)</p>\n" % (h.http_code, h.msg)
-	retval += "<p>On URI: <code>'%s'</code></p>\n" % cgi.escape(uri)
+	retval += "<p>On URI: <code>'%s'</code></p>\n" % clean_str(uri)
+	retval += "</body>\n"
+	retval += "</html>\n"
+	return retval
+
+
+def handle_invalid_uri(uri, title):
+	"""Pull together the HTTP response for a URI that cannot be processed (see :py:func:`acceptable_source`).
+
+	:param str uri: URI used in the original CGI script
+	:param str title: title and header of the generated HTML
+	:return: full HTTP response encoding the information in HTML
+	:rtype: str
+	"""
+	retval =  'Status: 400 Invalid Input\n'
+	retval += 'Content-type: text/html; charset=utf-8\n'
+	retval += '\n'
+	retval += "<html>\n"
+	retval += "<head>\n"
+	retval += "<title>%s</title>\n" % title
+	retval += "</head><body>\n"
+	retval += "<h1>%s</h1>\n" % title
+	retval += "<p>Only <code>http</code> and <code>https</code> URIs can be processed: <code>'%s'</code></p>\n" % clean_str(uri)
 	retval += "</body>\n"
 	retval += "</html>\n"
 	return retval
@@ -17,14 +17,18 @@ else:
 import xml.dom.minidom
 from datetime import date
 
-from rdflib import Graph
-from rdflib.plugins.parsers.pyRdfa.host    import MediaTypes
-from rdflib.plugins.parsers.pyRdfa         import pyRdfa
-from rdflib.plugins.parsers.pyRdfa.options import Options
+from .store          import compact_graph
+from .serializers    import serialize_turtle
+from .pyrdfa.host    import MediaTypes
+from .pyrdfa         import pyRdfa
+from .pyrdfa.options import Options
 
 from .validator_html	import html_page
 from .validator_errors  import Errors
 
+# Above this number of triples the default graph is serialized by the fast (unsorted) Turtle serializer
+fast_turtle_threshold = 2000
+
 class Validator:
 	"""
 	Shell to handle the validation process
@@ -34,7 +38,7 @@ class Validator:
 	:param str base: the base URI for the generated RDF. Also stored as a class attribute.
 
 	:param media_type: media type, when provided by the user. If "" or `None`, the distiller will try to find the media type itself.
-	:type media_type: enumeration type class in :py:Class:`rdflib.plugins.parsers.pyRdfa.host.MediaType`
+	:type media_type: enumeration type class in :py:class:`~.pyrdfa.host.MediaTypes`
 
 	:param bool vocab_expansion: whether the vocabulary `expansion feature of RDFa
 	 <https://www.w3.org/TR/rdfa-core/#s_vocab_expansion>`_ should also be executed. Also stored as a class attribute.
@@ -76,8 +80,8 @@ class Validator:
 	"""
 	def __init__(self, uri, base, media_type = "", vocab_expansion = False, check_lite = False, embedded_rdf = False):
 		# Create the graphs into which the content is put
-		self.default_graph   = Graph()
-		self.processor_graph = Graph()
+		self.default_graph   = compact_graph()
+		self.processor_graph = compact_graph()
 		self.uri 			 = uri
 		self.base			 = base
 		self.media_type		 = media_type
@@ -107,15 +111,10 @@ class Validator:
 		"""
 		Parse the RDFa input and store the processor and default graphs. The final media type in the class instance also updated.
 
-		*Implementation note:* this method goes down into the "guts" of the RDFa parser plugin of `RDFLib`, instead of simply executing a simple parsing. The reason is that the parser does not "expose", on the top level, an extra "transformer" function that checks the RDFa 1.1 Lite features (and adds warning triples to the processor graph), and this can only be added to the parser using one step deeper into the plugin code. (See the :py:func:`rdflib.plugins.parsers.pyRdfa.transform.lite.lite_prune` function).
+		*Implementation note:* the RDFa 1.1 Lite checks are done by the RDFa processor itself (see the ``check_lite`` option of :py:class:`~.pyrdfa.options.Options`), in the same DOM traversal that generates the default and the processor graphs.
 		"""
-		transformers = []
-		if self.check_lite:
-			from rdflib.plugins.parsers.pyRdfa.transform.lite import lite_prune
-			transformers.append(lite_prune)
-
 		options = Options(output_default_graph = True, output_processor_graph = True,
-						  transformers    = transformers,
+						  check_lite      = self.check_lite,
 						  vocab_expansion = self.vocab_expansion,
 						  embedded_rdf    = self.embedded_rdf,
 						  add_informational_messages = True)
@@ -127,9 +126,14 @@ class Validator:
 	def complete_DOM(self):
 		"""
 		Add the generated graph, in turtle encoding, as well as the error messages, to the final DOM tree. Interpreting the the error messages is done by the separate :py:class:`.validator_errors.Errors` class instance (whose instance is initialized when this class is created).
+
+		Large graphs (above :py:data:`fast_turtle_threshold` triples) are serialized by :py:func:`~.serializers.turtle.serialize_turtle`, i.e., the subjects are not sorted and the blank nodes are not nested.
 		"""
 		# Add the RDF code in the DOM tree
-		outp = self.default_graph.serialize(format="turtle")
+		if len(self.default_graph) > fast_turtle_threshold:
+			outp = serialize_turtle(self.default_graph)
+		else:
+			outp = self.default_graph.serialize(format="turtle")
 		u = outp if PY3 else unicode(outp.decode('utf-8'))
 		dstr = self.domtree.createTextNode(u)
 		self.code.appendChild(dstr)
@@ -142,4 +146,5 @@ class Validator:
 		"""
 		self.parse()
 		self.complete_DOM()
-		return self.domtree.toxml(encoding="utf-8")
+		retval = self.domtree.toxml(encoding="utf-8")
+		return retval.decode("utf-8") if PY3 else retval
@@ -1,17 +1,68 @@
 # -*- coding: utf-8 -*-
 """
-Separate shell to generate human readable error/warning messages
+Separate shell to generate human readable error/warning messages; the messages are also available as records (see :py:func:`validation_messages`), for the programmatic interface of :py:mod:`~.api`.
 """
 from __future__ import print_function
 import sys
+from collections import namedtuple
 
 import rdflib
 from rdflib import RDF  as ns_rdf
 from rdflib import RDFS as ns_rdfs
-from rdflib.plugins.parsers.pyRdfa         import ns_rdfa, ns_xsd, ns_distill
-from rdflib.plugins.parsers.pyRdfa.options import ns_dc, ns_ht
-from rdflib.plugins.parsers.pyRdfa         import RDFA_Error, RDFA_Warning, RDFA_Info
-from pyRdfa.options import ns_dc, ns_ht
+from .pyrdfa         import ns_rdfa, ns_xsd, ns_distill
+from .pyrdfa.options import ns_dc, ns_ht
+from .pyrdfa         import RDFA_Error, RDFA_Warning, RDFA_Info
+
+_severities = ((RDFA_Error, "error"), (RDFA_Warning, "warning"), (RDFA_Info, "info"))
+
+
+class ValidationMessage(namedtuple("ValidationMessage", "severity message_type description context date")):
+	"""
+	A message of the processor graph.
+
+	.. py:attribute:: severity
+
+	   ``error``, ``warning``, or ``info``
+
+	.. py:attribute:: message_type
+
+	   the additional class of the message (e.g., ``rdfa:UnresolvedTerm``), or ``None``
+
+	.. py:attribute:: description
+
+	   the human readable message
+
+	.. py:attribute:: context
+
+	   the context of the message (e.g., the URI of a vocabulary that could not be retrieved), or ``None``
+
+	.. py:attribute:: date
+
+	   the time stamp of the message, as an ``xsd:dateTime`` string
+	"""
+	__slots__ = ()
+
+
+def validation_messages(graph):
+	"""
+	The messages of a processor graph, the errors first, then the warnings and the informational messages, each in the order they have been generated.
+
+	:param graph: the processor graph
+	:return: the messages
+	:rtype: list of :py:class:`ValidationMessage`
+	"""
+	retval = []
+	for (top_class, severity) in _severities:
+		messages = []
+		for subj in graph.subjects(ns_rdf["type"], top_class):
+			extra = [t for t in graph.objects(subj, ns_rdf["type"]) if t != top_class]
+			messages.append(ValidationMessage(severity,
+											  extra[0] if extra else None,
+											  "%s" % graph.value(subj, ns_dc["description"]),
+											  graph.value(subj, ns_rdfa["context"]),
+											  "%s" % graph.value(subj, ns_dc["date"], default = "")))
+		retval.extend(sorted(messages, key = lambda message: message.date))
+	return retval
 
 
 class Errors:
@@ -148,7 +199,7 @@ class Errors:
 	def sort_array(self, arr):
 		"""
 		Sort the entries of the arrays consiting of subjects of messages. Sorting is based on the time stamp that is
-		added to each of those messages by the ``RDFLib`` parser.
+		added to each of those messages by the RDFa processor.
 
 		:param list arr: array of RDF triples
 		"""
@@ -45,7 +45,7 @@ html_page = """<!DOCTYPE html>
   </head>
   <body prefix="doap: http://usefulinc.com/ns/doap#">
 		<p class="banner"><a href="/2001/sw/" ><img src="/Icons/SW/sw-horz-w3c.png" width="241" height="48" alt="W3C SW Logo"/></a></p>
-        <h1 id="title" class="title"><img src="/Icons/SW/Buttons/sw-rdfa-orange.png" alt="RDFa technology button"/>&nbsp;&nbsp;RDFa Validation results </h1>
+        <h1 id="title" class="title"><img src="/Icons/SW/Buttons/sw-rdfa-orange.png" alt="RDFa technology button"/>&#160;&#160;RDFa Validation results </h1>
 
       <h2>Validator messages</h2>
 
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+Streaming reader of `WARC <https://iipc.github.io/warc-specifications/specifications/warc-format/warc-1.1/>`_ archives, i.e., of the files produced by web crawlers.
+
+The records are read while the archive is iterated over (see :py:func:`read_records`): the archive, usually compressed (with a gzip member per record), is decompressed on the fly, and the blocks of the records are read into memory only if they are needed, one at a time; the other blocks (e.g., those of the ``request`` records, or those larger than a limit) are skipped without being kept in memory. The HTTP responses stored in the ``response`` records are parsed by :py:func:`http_head` and :py:func:`http_payload`.
+
+**Module constants:**
+
+.. py:data:: max_record_size
+
+   The maximum size (in bytes) of a record block that is read into memory, and of the decoded payload of an HTTP response; larger blocks are skipped
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+import gzip
+import zlib
+from collections import namedtuple
+
+from .pyrdfa.utils import max_source_size
+
+max_record_size = max_source_size
+
+# Size of the pieces read when a block is skipped
+_skip_chunk = 64 * 1024
+
+
+class WARCRecord(namedtuple("WARCRecord", "headers block")):
+	"""
+	A record of a WARC archive.
+
+	.. py:attribute:: headers
+
+	   the WARC headers of the record, as a dictionary, with the header names in lower case
+
+	.. py:attribute:: block
+
+	   the content block of the record (``bytes``), or ``None`` if it has not been read
+	"""
+	__slots__ = ()
+
+	@property
+	def type(self):
+		"""The type of the record (e.g., ``response``)"""
+		return self.headers.get("warc-type", "")
+
+	@property
+	def record_id(self):
+		"""The identifier of the record"""
+		return self.headers.get("warc-record-id", "")
+
+	@property
+	def target_uri(self):
+		"""The URI of the resource the record is about, or an empty string"""
+		# WARC 1.0 (by mistake) wrote the URI between angle brackets
+		return self.headers.get("warc-target-uri", "").strip("<>")
+
+	@property
+	def length(self):
+		"""The size of the content block, in bytes"""
+		return int(self.headers.get("content-length", "0"))
+
+
+def open_archive(path):
+	"""
+	Open a WARC archive, to be decompressed on the fly if it is gzip compressed (regardless of its suffix).
+
+	:param str path: the path of the archive
+	:return: a binary stream
+	"""
+	with open(path, "rb") as f:
+		compressed = f.read(2) == b"\x1f\x8b"
+	return gzip.open(path, "rb") if compressed else open(path, "rb")
+
+
+def _skip(stream, length):
+	while length > 0:
+		data = stream.read(min(length, _skip_chunk))
+		if not data:
+			break
+		length -= len(data)
+
+
+def read_records(stream, name = "", types = ("response",), max_size = max_record_size):
+	"""
+	Iterate over the records of an archive.
+
+	:param stream: the (decompressed) binary stream of the archive (see :py:func:`open_archive`)
+	:param str name: the name of the archive, for the error messages
+	:param types: the types of the records whose blocks are read
+	:param int max_size: the maximum size of a block that is read
+	:return: iterator of :py:class:`WARCRecord`; the block is ``None`` if the record is of another type, or if the block is too large
+	:raise ValueError: if the content is not a valid WARC archive
+	"""
+	while True:
+		line = stream.readline()
+		if not line:
+			return
+		if not line.strip():
+			# the empty lines closing the previous record
+			continue
+		if not line.startswith(b"WARC/"):
+			raise ValueError("Invalid WARC record in '%s': %r" % (name, line[:40]))
+		headers = {}
+		while True:
+			line = stream.readline()
+			if not line.strip():
+				break
+			(key, colon, value) = line.decode("utf-8", "replace").partition(":")
+			if colon:
+				headers[key.strip().lower()] = value.strip()
+		record = WARCRecord(headers, None)
+		if record.type in types and record.length <= max_size:
+			block = stream.read(record.length)
+			if len(block) < record.length:
+				raise ValueError("Truncated WARC record in '%s': %s" % (name, record.record_id))
+			record = WARCRecord(headers, block)
+		else:
+			_skip(stream, record.length)
+		yield record
+
+
+def http_head(block):
+	"""
+	Parse the status line and the headers of an HTTP response.
+
+	:param bytes block: the block of a ``response`` record
+	:return: a (status, headers, offset) tuple: the status code, the headers as a dictionary (with the names in lower case), and the offset of the body in the block
+	:raise ValueError: if the block is not an HTTP response
+	"""
+	end = block.find(b"\r\n\r\n")
+	if end >= 0:
+		offset = end + 4
+	else:
+		end = block.find(b"\n\n")
+		offset = end + 2 if end >= 0 else len(block)
+		end = end if end >= 0 else len(block)
+	lines = block[:end].decode("iso-8859-1").splitlines()
+	status_line = lines[0].split() if lines else []
+	if len(status_line) < 2 or not status_line[0].startswith("HTTP/") or not status_line[1].isdigit():
+		raise ValueError("Not an HTTP response")
+	headers = {}
+	for line in lines[1:]:
+		(key, colon, value) = line.partition(":")
+		if colon:
+			headers[key.strip().lower()] = value.strip()
+	return (int(status_line[1]), headers, offset)
+
+
+def _dechunk(body):
+	"""Remove the chunked transfer encoding; the body is returned unchanged if it is not, in fact, chunked (some crawlers store the decoded body)"""
+	parts    = []
+	position = 0
+	while True:
+		end = body.find(b"\r\n", position)
+		try:
+			if end < 0:
+				raise ValueError()
+			size = int(body[position:end].split(b";")[0].strip(), 16)
+		except ValueError:
+			if position == 0:
+				return body
+			break
+		if size == 0:
+			break
+		parts.append(body[end + 2:end + 2 + size])
+		position = end + 2 + size + 2
+	return b"".join(parts)
+
+
+def http_payload(block, headers, offset, max_size = max_record_size):
+	"""
+	The body of an HTTP response, with the transfer and the content encodings removed.
+
+	:param bytes block: the block of a ``response`` record
+	:param dict headers: the headers of the response (see :py:func:`http_head`)
+	:param int offset: the offset of the body in the block (see :py:func:`http_head`)
+	:param int max_size: the maximum size of the decoded body
+	:rtype: bytes
+	:raise ValueError: if the encoding is not supported, the content is corrupted, or the decoded body is too large
+	"""
+	body = block[offset:]
+	if "chunked" in headers.get("transfer-encoding", "").lower():
+		body = _dechunk(body)
+	encoding = headers.get("content-encoding", "").strip().lower()
+	if encoding in ("", "identity"):
+		return body
+	if encoding in ("gzip", "x-gzip"):
+		decoders = [zlib.decompressobj(16 + zlib.MAX_WBITS)]
+	elif encoding == "deflate":
+		# Some servers send a raw deflate stream, without the zlib wrapper
+		decoders = [zlib.decompressobj(), zlib.decompressobj(-zlib.MAX_WBITS)]
+	else:
+		raise ValueError("Unsupported content encoding: %s" % encoding)
+	for decoder in decoders:
+		try:
+			body = decoder.decompress(body, max_size + 1)
+			break
+		except zlib.error:
+			if decoder is decoders[-1]:
+				raise ValueError("Corrupted compressed content")
+	if len(body) > max_size:
+		raise ValueError("The content is larger than the limit of %d bytes" % max_size)
+	return body
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# Maintainer: Ivan Herman <ivan@w3.org>
+"""
+WSGI entry point of the services, i.e., an alternative to the CGI scripts that does not rely on the (deprecated) ``cgi`` module.
+
+The adapter is thin: the query parameters of the request (and the body of a ``POST`` request with ``application/x-www-form-urlencoded`` content) are collected into a :py:class:`QueryForm`, and the request is handed over to the same functions as the CGI scripts (:py:func:`~.rdfa.extract_rdf`, :py:func:`~.rdfa.validate_rdfa`, :py:func:`~.mdata.extract_microdata`, :py:func:`~.pages.page_from_cursor`), subject to the admission control of :py:mod:`~.admission`. The CGI variables of the request are passed on explicitly, i.e., the application can be run by a multi threaded server. The response strings of these functions are turned into the WSGI status, headers, and body, compressed if the client accepts it (see :py:func:`~.compression.write_response`).
+
+File uploads (i.e., ``multipart/form-data`` requests) are not supported; the content can be sent through the ``text`` parameter instead. Only ``http`` and ``https`` URIs are retrieved (see :py:func:`~.utils.acceptable_source`).
+
+For example, with the reference server of the standard library::
+
+	from wsgiref.simple_server import make_server
+	from rdfa_md.wsgi import make_application
+	make_server("", 8080, make_application("rdfa")).serve_forever()
+
+**Module constants:**
+
+.. py:data:: max_body_size
+
+   The maximum size (in bytes) of the body of a ``POST`` request
+
+**Classes and functions:**
+
+"""
+from __future__ import print_function
+import sys
+PY3 = (sys.version_info[0] >= 3)
+
+if PY3:
+	from urllib.parse import parse_qs
+	from io import BytesIO
+else:
+	from urlparse import parse_qs
+	from StringIO import StringIO as BytesIO
+
+from .rdfa import extract_rdf, validate_rdfa
+from .mdata import extract_microdata
+from .pages import page_from_cursor
+from .compression import write_response
+from .admission import admitted, request_class, metrics_response
+from .urlsafety import SafetyCheck
+from .utils import acceptable_source, handle_invalid_uri
+
+max_body_size = 10 * 1024 * 1024
+
+_no_uri = ('Content-Type: text/html; charset=utf-8\nStatus: 400 Invalid Input\n\n'
+		   '<html>\n<head>\n<title>Error in %s processing</title>\n</head><body>\n'
+		   '<h1>Error in distilling %s</h1>\n<p>No URI has been specified</p>\n</body>\n</html>\n')
+
+_too_large = 'Content-Type: text/plain; charset=utf-8\nStatus: 413 Request Entity Too Large\n\nThe request is too large\n'
+
+_unsafe = 'Content-Type: text/plain; charset=utf-8\nStatus: 403 Forbidden\n\nThe URI cannot be processed by the service: %s\n'
+
+
+class QueryForm(object):
+	"""
+	The parameters of a request, with the methods of a ``cgi.FieldStorage`` instance that are used by the package.
+
+	:param dict environ: the WSGI environment of the request
+	:raise ValueError: if the body of the request is larger than :py:data:`max_body_size`
+	"""
+	def __init__(self, environ):
+		query = environ.get("QUERY_STRING", "")
+		if environ.get("REQUEST_METHOD", "GET").upper() == "POST" and \
+		   environ.get("CONTENT_TYPE", "").split(";")[0].strip().lower() == "application/x-www-form-urlencoded":
+			length = int(environ.get("CONTENT_LENGTH") or 0)
+			if length > max_body_size:
+				raise ValueError("Request body too large")
+			body = environ["wsgi.input"].read(length) if length > 0 else b""
+			query = "&".join(q for q in (query, body.decode("utf-8", "replace")) if q)
+		self.values = parse_qs(query, keep_blank_values = True)
+
+	def keys(self):
+		"""The names of the parameters"""
+		return self.values.keys()
+
+	def __contains__(self, key):
+		return key in self.values
+
+	def getfirst(self, key, default = None):
+		"""
+		The first value of a parameter.
+
+		:param str key: the name of the parameter
+		:param default: the value returned if the parameter is not present
+		"""
+		return self.values[key][0] if key in self.values else default
+
+
+def _handle(service, form, environ, check_safety):
+	"""Generate the response string for a request, the same way as the CGI scripts do"""
+	if "metrics" in form:
+		return metrics_response(environ)
+
+	# Subsequent pages of a stored result do not need any source
+	if "cursor" in form:
+		return admitted(request_class(form, environ), lambda: page_from_cursor(form))
+
+	if (form.getfirst("text") or "").strip():
+		uri = "text:"
+	else:
+		uri = form.getfirst("uri")
+		if not uri:
+			name = "Microdata" if service == "microdata" else "RDFa"
+			return _no_uri % (name, name)
+
+	if uri == "referer":
+		referer = environ.get("HTTP_REFERER")
+		if referer is None:
+			location = "http://www.w3.org/2012/pyRdfa/no_referer.html" if service == "rdfa" else "http://www.w3.org/2012/pyMicrodata/no_referer.html"
+		else:
+			location = "?uri=" + referer
+		return "Status: 307 Moved Temporarily\nLocation: %s\n\n" % location
+
+	# Uploads are not supported; local files must not be reachable
+	if uri == "uploaded:" or not acceptable_source(uri):
+		return handle_invalid_uri(uri, "Error in %s processing" % ("Microdata" if service == "microdata" else "RDFa"))
+
+	# The check runs while the request waits for admission, but the source is retrieved only if it passed
+	check = SafetyCheck(uri) if check_safety and uri != "text:" else None
+
+	def process():
+		if check is not None and not check.passed():
+			return _unsafe % check.message
+		if service == "microdata":
+			return extract_microdata(uri, form, environ)
+		return validate_rdfa(uri, form, environ) if "validate" in form else extract_rdf(uri, form, environ)
+
+	return admitted(request_class(form, environ), process)
+
+
+def _split_response(response):
+	"""
+	Split a (binary) HTTP response, as produced by :py:func:`~.compression.write_response`, into the status line, the header list, and the body
+	"""
+	(header, separator, body) = response.partition(b"\n\n")
+	status  = "200 OK"
+	headers = []
+	for line in header.decode("utf-8").split("\n"):
+		(name, colon, value) = line.partition(":")
+		if not colon:
+			continue
+		if name.strip().lower() == "status":
+			status = value.strip()
+		else:
+			headers.append((name.strip(), value.strip()))
+	headers.append(("Content-Length", "%d" % len(body)))
+	return (status, headers, body)
+
+
+def make_application(service = "rdfa", check_safety = False):
+	"""
+	Create the WSGI application of a service.
+
+	:param str service: ``rdfa`` (for the RDFa distiller and validator) or ``microdata`` (for the microdata distiller)
+	:param bool check_safety: whether the safety of the URIs is checked (see :py:mod:`~.urlsafety`); this works only at W3C
+	:return: the WSGI application
+	"""
+	def application(environ, start_response):
+		try:
+			form = QueryForm(environ)
+		except ValueError:
+			response = _too_large
+		else:
+			response = _handle(service, form, environ, check_safety)
+		output = BytesIO()
+		write_response(response, output, environ.get("HTTP_ACCEPT_ENCODING", ""))
+		(status, headers, body) = _split_response(output.getvalue())
+		start_response(status, headers)
+		return [body]
+	return application
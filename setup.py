@@ -5,7 +5,7 @@ import rdfa_md
 setup(
 	name='rdfa_md',
 	version=rdfa_md.__version__,
-	packages=['rdfa_md'],
+	packages=['rdfa_md', 'rdfa_md.pyrdfa', 'rdfa_md.pymicrodata', 'rdfa_md.serializers'],
 	scripts=['CGI_scripts/mData_cgi.py', 'CGI_scripts/Rdfa_cgi.py'],
 	url='https://github.com/w3c/rdfa-md-service',
 	download_url='https://github.com/w3c/rdfa-md-service/archive/master.zip',
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the admission control (see :py:mod:`rdfa_md.admission`), with several processes sharing the slots.
+"""
+import time
+import multiprocessing
+
+import pytest
+
+from rdfa_md import admission
+from rdfa_md.admission import admitted
+
+pytestmark = pytest.mark.skipif(admission.fcntl is None, reason = "the admission control relies on fcntl")
+
+# Time a validator request holds its slots
+_hold = 2.0
+
+
+def _request(request_class, results, hold = 0):
+	start    = time.time()
+	response = admitted(request_class, lambda: time.sleep(hold) or "done")
+	results.put((request_class, response, time.time() - start))
+
+
+@pytest.fixture
+def context(tmp_path, monkeypatch):
+	# the children are forked, i.e., they inherit the environment and the settings
+	monkeypatch.setenv("PyRdfaCacheDir", str(tmp_path))
+	return multiprocessing.get_context("fork")
+
+
+def test_bulk_progresses_while_validator_share_is_full(context):
+	results    = context.Queue()
+	validators = [context.Process(target = _request, args = ("validator", results, _hold)) for i in range(admission.class_shares["validator"] + 1)]
+	for process in validators:
+		process.start()
+	# let the validators take their slots; the last one waits in the queue of its class
+	time.sleep(0.5)
+	bulk = [context.Process(target = _request, args = ("bulk", results)) for i in range(3)]
+	for process in bulk:
+		process.start()
+	for process in validators + bulk:
+		process.join(30)
+	outcomes = [results.get(timeout = 5) for process in validators + bulk]
+	assert all(response == "done" for (request_class, response, elapsed) in outcomes)
+	# the bulk requests did not wait for the validator share to become free
+	assert all(elapsed < _hold - 0.5 for (request_class, response, elapsed) in outcomes if request_class == "bulk")
+
+
+def test_higher_class_waiting_for_shared_slot_has_priority(context, monkeypatch):
+	monkeypatch.setattr(admission, "max_running", 1)
+	results = context.Queue()
+	holder  = context.Process(target = _request, args = ("bulk", results, 1.0))
+	holder.start()
+	time.sleep(0.3)
+	validator = context.Process(target = _request, args = ("validator", results))
+	validator.start()
+	time.sleep(0.3)
+	bulk = context.Process(target = _request, args = ("bulk", results))
+	bulk.start()
+	for process in (holder, validator, bulk):
+		process.join(30)
+	outcomes = [results.get(timeout = 5) for i in range(3)]
+	# the validator gets the shared slot released by the holder before the second bulk request
+	assert [request_class for (request_class, response, elapsed) in outcomes] == ["bulk", "validator", "bulk"]
+
+
+def test_request_class():
+	assert admission.request_class({"validate" : "yes"}, {}) == "validator"
+	assert admission.request_class({}, {"HTTP_REFERER" : "https://www.w3.org/2012/pyRdfa/Overview.html"}) == "interactive"
+	# a browser-like User-Agent, or a foreign Referer, is not enough
+	assert admission.request_class({}, {"HTTP_USER_AGENT" : "Mozilla/5.0 (compatible; Googlebot/2.1)"}) == "bulk"
+	assert admission.request_class({}, {"HTTP_REFERER" : "https://example.org/"}) == "bulk"
+	assert admission.request_class({}, {}) == "bulk"
+
+
+def test_metrics_access(context):
+	assert admission.metrics_response({"REMOTE_ADDR" : "127.0.0.1"}).startswith("Content-Type: text/plain; version=0.0.4")
+	assert "Status: 403" in admission.metrics_response({"REMOTE_ADDR" : "192.0.2.1"})
+	assert "Status: 403" in admission.metrics_response({})
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the programmatic interface (see :py:mod:`rdfa_md.api`) and of the serialization of its results.
+"""
+import io
+import threading
+
+try:
+	from http.server import HTTPServer, BaseHTTPRequestHandler
+	from socketserver import ThreadingMixIn
+except ImportError:
+	from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+	from SocketServer import ThreadingMixIn
+
+import pytest
+from rdflib import URIRef, Literal
+
+from rdfa_md.api import ServiceOptions, rdfa_graph
+from rdfa_md.serializers import serialize
+from rdfa_md.pyrdfa.cachedir import using_cache_directory
+
+_prefixed = b'<html><body prefix="ex: http://example.org/"><p about="http://example.org/x" property="ex:p">v</p></body></html>'
+
+
+def test_document_prefixes_are_reused():
+	graph = rdfa_graph(_prefixed, ServiceOptions(media_type = "text/html")).graph
+	assert "ex:x ex:p" in serialize(graph, "turtle-fast")
+	assert "@prefix ex: <http://example.org/>" in serialize(graph, "turtle")
+
+
+def test_document_prefixes_are_reused_by_filtered_output():
+	options = ServiceOptions(media_type = "text/html", predicates = "http://example.org/p")
+	assert "ex:x ex:p" in serialize(rdfa_graph(_prefixed, options).graph, "turtle-fast")
+
+
+class _Handler(BaseHTTPRequestHandler):
+	def log_message(self, *args):
+		pass
+
+	def do_GET(self):
+		self.send_response(200)
+		self.send_header("Content-Type", "text/html")
+		self.send_header("Content-Length", str(len(_prefixed)))
+		self.end_headers()
+		self.wfile.write(_prefixed)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+
+@pytest.fixture(scope = "module")
+def server():
+	httpd  = _Server(("127.0.0.1", 0), _Handler)
+	thread = threading.Thread(target = httpd.serve_forever)
+	thread.daemon = True
+	thread.start()
+	yield "http://127.0.0.1:%d/page.html" % httpd.server_address[1]
+	httpd.shutdown()
+
+
+@pytest.mark.parametrize("kind", ["bytes", "stream", "file name", "path", "file URI", "http URI"])
+def test_sources(kind, tmp_path, server):
+	page = tmp_path / "page.html"
+	page.write_bytes(_prefixed)
+	source = {
+		"bytes"     : _prefixed,
+		"stream"    : io.BytesIO(_prefixed),
+		"file name" : str(page),
+		"path"      : page,
+		"file URI"  : page.as_uri(),
+		"http URI"  : server,
+	}[kind]
+	with using_cache_directory(str(tmp_path / "cache")):
+		graph = rdfa_graph(source, ServiceOptions(media_type = "text/html")).graph
+	assert (URIRef("http://example.org/x"), URIRef("http://example.org/p"), Literal("v")) in graph
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the bulk extraction of local files (see :py:mod:`rdfa_md.bulk`): the shards, the status log, and the resumption of an interrupted run from the checkpoint.
+"""
+import os
+import re
+from collections import Counter
+
+import pytest
+
+from rdfa_md import bulk
+from rdfa_md.bulk import run, file_uri, checkpoint_name, status_log_name
+
+_files = 7
+
+
+@pytest.fixture
+def sources(tmp_path):
+	directory = tmp_path / "site"
+	directory.mkdir()
+	for i in range(_files):
+		(directory / ("page%d.html" % i)).write_text(
+			'<html><body vocab="http://schema.org/"><div typeof="Product"><span property="name">Product %d</span></div>'
+			'<div itemscope itemtype="http://schema.org/Offer"><span itemprop="price">%d</span></div></body></html>' % (i, i))
+	(directory / "empty.html").write_text("")
+	(directory / "notes.txt").write_text("not processed")
+	return str(directory)
+
+
+def _graphs(directory):
+	"""The graph names in each shard"""
+	retval = {}
+	for name in sorted(os.listdir(directory)):
+		if name.startswith("part-"):
+			with open(os.path.join(directory, name)) as f:
+				retval[name] = set(re.search(r"<([^>]*)> \.$", line).group(1) for line in f if line.strip())
+	return retval
+
+
+def _lines(directory, name):
+	with open(os.path.join(directory, name)) as f:
+		return [line.rstrip("\n") for line in f]
+
+
+def test_run(sources, tmp_path):
+	output     = str(tmp_path / "output")
+	statistics = run([sources], output, jobs = 2, shard_size = 3)
+	# RDFa: the type, the name, and the vocabulary; microdata: the type, the price, and the item of the document
+	assert (statistics.documents, statistics.triples, statistics.errors) == (_files + 1, 6 * _files, 0)
+	graphs = _graphs(output)
+	assert sorted(graphs) == ["part-00000.nq", "part-00001.nq", "part-00002.nq"]
+	assert set().union(*graphs.values()) == set(file_uri(os.path.join(sources, "page%d.html" % i)) for i in range(_files))
+	status = [line.split("\t") for line in _lines(output, status_log_name)]
+	assert sorted((os.path.basename(path), outcome, triples) for (path, uri, outcome, triples, message) in status) == \
+		sorted([("empty.html", "ok", "0")] + [("page%d.html" % i, "ok", "6") for i in range(_files)])
+
+
+def test_resume_after_interrupted_shard(sources, tmp_path, monkeypatch):
+	output = str(tmp_path / "output")
+	add    = bulk.ShardWriter.add
+	count  = [0]
+
+	def interrupted(writer, result):
+		count[0] += 1
+		if count[0] == 5:
+			raise KeyboardInterrupt()
+		add(writer, result)
+
+	monkeypatch.setattr(bulk.ShardWriter, "add", interrupted)
+	with pytest.raises(KeyboardInterrupt):
+		run([sources], output, jobs = 2, shard_size = 3)
+	monkeypatch.setattr(bulk.ShardWriter, "add", add)
+
+	# the complete shard and the results collected before the interruption are in the checkpoint
+	assert len(_lines(output, checkpoint_name)) == 4
+	# the incomplete shard of a crashed run is thrown away
+	with open(os.path.join(output, "part-00009.nq.tmp"), "w") as f:
+		f.write("<http://example.org/s> <http://example.org/p> <http://example.org/o> <file:///lost> .\n")
+
+	statistics = run([sources], output, jobs = 2, shard_size = 3)
+	assert statistics.documents == _files + 1 - 4
+	assert not any(name.endswith(".tmp") for name in os.listdir(output))
+	# each file is in exactly one shard, in the checkpoint, and in the status log
+	graphs = Counter(uri for names in _graphs(output).values() for uri in names)
+	assert sorted(graphs) == sorted(file_uri(os.path.join(sources, "page%d.html" % i)) for i in range(_files))
+	assert set(graphs.values()) == set([1])
+	for name in (checkpoint_name, status_log_name):
+		paths = Counter(line.split("\t")[0] for line in _lines(output, name))
+		assert len(paths) == _files + 1 and set(paths.values()) == set([1])
+
+	# nothing is left to do
+	assert run([sources], output, jobs = 2, shard_size = 3).documents == 0
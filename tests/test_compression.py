@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the compression of the responses (see :py:mod:`rdfa_md.compression`), and of its consistency with the conditional responses (see :py:mod:`rdfa_md.etag`).
+"""
+import gzip
+import re
+from io import BytesIO
+
+from rdflib import URIRef, Literal
+
+from rdfa_md.compression import write_response
+from rdfa_md.etag import conditional_response
+from rdfa_md.store import compact_graph
+
+
+def _graph(size):
+	graph = compact_graph()
+	for i in range(size):
+		graph.add((URIRef("http://example.org/s%d" % i), URIRef("http://example.org/p"), Literal("value %d" % i)))
+	return graph
+
+
+def _write(response, accept_encoding):
+	output = BytesIO()
+	write_response(response, output, accept_encoding)
+	(header, separator, body) = output.getvalue().partition(b"\n\n")
+	headers = dict(line.split(": ", 1) for line in header.decode("utf-8").split("\n"))
+	return (headers, body)
+
+
+def test_compressed_response():
+	(headers, body) = _write(conditional_response(_graph(500), "nt", ""), "gzip, deflate")
+	assert headers["Content-Encoding"] == "gzip"
+	assert headers["Vary"] == "Accept-Encoding"
+	assert re.match(r'^W/"[0-9a-f]+-gzip"$', headers["ETag"])
+	assert b"value 499" in gzip.decompress(body)
+
+
+def test_not_modified_repeats_the_etag():
+	graph = _graph(500)
+	(full, body) = _write(conditional_response(graph, "nt", ""), "gzip")
+	(headers, body) = _write(conditional_response(graph, "nt", full["ETag"]), "gzip")
+	assert headers["Status"].startswith("304")
+	assert headers["ETag"] == full["ETag"]
+	assert headers["Vary"] == full["Vary"]
+	assert "Content-Encoding" not in headers and body == b""
+
+
+def test_small_response():
+	# not compressed, but with the headers of the negotiated variant, i.e., the same as for a 304
+	graph = _graph(1)
+	(full, body) = _write(conditional_response(graph, "nt", ""), "gzip")
+	(headers, empty) = _write(conditional_response(graph, "nt", full["ETag"]), "gzip")
+	assert "Content-Encoding" not in full and b"value 0" in body
+	assert headers["ETag"] == full["ETag"] and full["ETag"].endswith('-gzip"')
+	assert headers["Vary"] == full["Vary"]
+
+
+def test_no_compression_accepted():
+	graph = _graph(500)
+	(full, body) = _write(conditional_response(graph, "nt", ""), None)
+	(headers, empty) = _write(conditional_response(graph, "nt", full["ETag"]), "identity")
+	assert "Content-Encoding" not in full and "Vary" not in full
+	assert headers["ETag"] == full["ETag"] and not full["ETag"].endswith('-gzip"')
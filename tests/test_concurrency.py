@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Thread safety of the services: mixed requests, run concurrently on a thread pool, each in its own cache directory and with its own time budget, must give the same results as run one by one.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from rdfa_md.rdfa import extract_rdf, validate_rdfa
+from rdfa_md.mdata import extract_microdata
+from rdfa_md.pyrdfa.cachedir import using_cache_directory
+
+_threads = 16
+_rounds  = 8
+
+
+class _Form(dict):
+	"""Minimal replacement of a ``cgi.FieldStorage`` instance"""
+	def getfirst(self, key, default = None):
+		return self.get(key, default)
+
+
+_rdfa_page = ('<html><body vocab="http://schema.org/" prefix="ex: http://example.org/">%s</body></html>' %
+			  "".join('<div typeof="Person" resource="#p%d"><span property="name">Person %d</span><span property="knows" typeof="Person"><span property="name">Friend %d</span></span><span property="ex:unknown foo:bar">%d</span></div>' % (i, i, i, i) for i in range(200)))
+_md_page   = ('<html><body>%s</body></html>' %
+			  "".join('<div itemscope itemtype="http://schema.org/Product"><span itemprop="name">Product %d</span><div itemprop="offers" itemscope itemtype="http://schema.org/Offer"><span itemprop="price">%d</span></div></div>' % (i, i) for i in range(200)))
+_svg_page  = ('<svg xmlns="http://www.w3.org/2000/svg" vocab="http://schema.org/">%s</svg>' %
+			  "".join('<g typeof="ImageObject" resource="#g%d"><title property="name">Image %d</title></g>' % (i, i) for i in range(200)))
+
+_requests = [
+	(extract_rdf,       dict(text = _rdfa_page, host_language = "html", format = "turtle")),
+	(extract_rdf,       dict(text = _rdfa_page, host_language = "html", format = "json-ld", rdfagraph = "output,processor")),
+	(extract_rdf,       dict(text = _rdfa_page, host_language = "html", format = "nt", types = "Person", depth = "0")),
+	(extract_rdf,       dict(text = _svg_page, host_language = "svg", format = "xml", streaming = "true")),
+	(extract_rdf,       dict(text = _svg_page, host_language = "svg", format = "nt", streaming = "true")),
+	(validate_rdfa,     dict(text = _rdfa_page, host_language = "html", validate = "yes")),
+	(extract_microdata, dict(text = _md_page, format = "turtle")),
+	(extract_microdata, dict(text = _md_page, format = "json-ld", scope = "div")),
+]
+
+
+def _normalize(response):
+	"""The ETag, if any, identifies the graph regardless of the labels (and, hence, of the order) of the blank nodes; otherwise the labels are removed"""
+	match = re.search(r"^ETag: .*$", response, re.MULTILINE)
+	return match.group(0) if match is not None else re.sub(r"_:\w+", "_", response)
+
+
+def test_concurrent_requests(tmp_path):
+	directories = [str(tmp_path / ("cache%d" % i)) for i in range(4)]
+
+	def run(i, timeout = None):
+		(function, values) = _requests[i % len(_requests)]
+		form = _Form(values)
+		if timeout is not None:
+			# the budgets differ, but are all large enough for the complete result
+			form["timeout"] = str(timeout)
+		with using_cache_directory(directories[i % len(directories)]):
+			return _normalize(function("text:", form, {}))
+
+	expected = [run(i) for i in range(len(_requests))]
+	with ThreadPoolExecutor(max_workers = _threads) as pool:
+		results = list(pool.map(lambda i: run(i, 30 + 5 * (i % 7)), range(len(_requests) * _rounds)))
+	assert [i for (i, result) in enumerate(results) if result != expected[i % len(_requests)]] == []
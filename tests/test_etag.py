@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the entity tags of the responses (see :py:mod:`rdfa_md.etag`): the digest of a graph must not depend on the labels of the blank nodes, nor on the order of the triples.
+"""
+import random
+
+from rdflib import Graph, URIRef, Literal, BNode, RDF
+
+from rdfa_md.etag import graph_digest, graph_etag, etag_matches
+from rdfa_md.store import compact_graph
+
+_schema = "http://schema.org/"
+
+
+def _triples(price = "9.99"):
+	"""The triples of a small shop, with new blank nodes at each call"""
+	retval = []
+	for i in range(50):
+		(product, offer, seller) = (BNode(), BNode(), BNode())
+		retval.append((product, RDF.type, URIRef(_schema + "Product")))
+		retval.append((product, URIRef(_schema + "name"), Literal("Product %d" % i, lang = "en")))
+		retval.append((product, URIRef(_schema + "offers"), offer))
+		retval.append((offer, URIRef(_schema + "price"), Literal(price if i == 7 else "%d.50" % i)))
+		retval.append((offer, URIRef(_schema + "seller"), seller))
+		retval.append((seller, URIRef(_schema + "name"), Literal("Shop")))
+	retval.append((URIRef("http://example.org/shop"), URIRef(_schema + "name"), Literal("Shop")))
+	return retval
+
+
+def _graph(triples, factory = compact_graph):
+	graph = factory()
+	for t in triples:
+		graph.add(t)
+	return graph
+
+
+def test_stable_under_relabeling_and_reordering():
+	digest   = graph_digest(_graph(_triples()))
+	shuffled = _triples()
+	random.Random(1).shuffle(shuffled)
+	assert graph_digest(_graph(shuffled)) == digest
+	assert graph_digest(_graph(shuffled, Graph)) == digest
+
+
+def test_changes_with_the_content():
+	digest = graph_digest(_graph(_triples()))
+	assert graph_digest(_graph(_triples(price = "9.98"))) != digest
+	assert graph_digest(_graph(_triples() + [(BNode(), URIRef(_schema + "name"), Literal("Extra"))])) != digest
+	# the same triples, except that two products share an offer
+	triples = _triples()
+	shared  = [t for t in triples if t[1] == URIRef(_schema + "offers")]
+	triples = [t for t in triples if t != shared[1]] + [(shared[1][0], shared[1][1], shared[0][2])]
+	assert graph_digest(_graph(triples)) != digest
+
+
+def test_etag():
+	graph = _graph(_triples())
+	etag  = graph_etag(graph, "turtle")
+	assert etag.startswith('W/"') and etag != graph_etag(graph, "json-ld")
+	assert etag_matches(etag, etag)
+	assert etag_matches(etag, '"other", ' + etag[:-1] + '-gzip"')
+	assert etag_matches(etag, "*")
+	assert not etag_matches(etag, graph_etag(graph, "json-ld"))
+	assert not etag_matches(etag, None)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the negative caching of the failures (see :py:mod:`rdfa_md.failures`): the lasting failures are kept, the transient ones are not.
+"""
+import time
+import threading
+from collections import Counter
+
+try:
+	from http.server import HTTPServer, BaseHTTPRequestHandler
+	from socketserver import ThreadingMixIn
+except ImportError:
+	from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+	from SocketServer import ThreadingMixIn
+
+import pytest
+
+from rdfa_md.rdfa import extract_rdf
+from rdfa_md.pyrdfa.cachedir import using_cache_directory
+
+_hits = Counter()
+
+
+class _Handler(BaseHTTPRequestHandler):
+	def log_message(self, *args):
+		pass
+
+	def do_GET(self):
+		_hits[self.path] += 1
+		if self.path.startswith("/missing"):
+			self.send_error(404)
+		elif self.path.startswith("/gone"):
+			self.send_error(410)
+		elif self.path.startswith("/error"):
+			self.send_error(500)
+		elif self.path.startswith("/unavailable"):
+			self.send_error(503)
+		else:
+			if self.path.startswith("/slow"):
+				time.sleep(1)
+			body = b"<root><unclosed></root>" if self.path.startswith("/broken") else b"<root/>"
+			self.send_response(200)
+			self.send_header("Content-Type", "application/xml")
+			self.send_header("Cache-Control", "no-store")
+			self.send_header("Content-Length", str(len(body)))
+			self.end_headers()
+			self.wfile.write(body)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+
+class _Form(dict):
+	"""Minimal replacement of a ``cgi.FieldStorage`` instance"""
+	def getfirst(self, key, default = None):
+		return self.get(key, default)
+
+
+@pytest.fixture(scope = "module")
+def server():
+	httpd  = _Server(("127.0.0.1", 0), _Handler)
+	thread = threading.Thread(target = httpd.serve_forever)
+	thread.daemon = True
+	thread.start()
+	yield "http://127.0.0.1:%d" % httpd.server_address[1]
+	httpd.shutdown()
+
+
+@pytest.fixture(autouse = True)
+def environment(tmp_path):
+	with using_cache_directory(str(tmp_path)):
+		yield
+
+
+def _twice(uri, **form):
+	"""Run the same request twice; return the first response and the number of retrievals"""
+	form = _Form(form, host_language = "xml", format = "nt")
+	path = uri.split("/", 3)[3]
+	responses = [extract_rdf(uri, form, {}) for i in range(2)]
+	return (responses[0], _hits["/" + path])
+
+
+@pytest.mark.parametrize("path", ["missing", "gone", "broken"])
+def test_lasting_failures_are_kept(server, path):
+	(response, hits) = _twice("%s/%s-kept" % (server, path))
+	assert response.startswith("Status: 4")
+	assert hits == 1
+
+
+@pytest.mark.parametrize("path", ["error", "unavailable"])
+def test_upstream_errors_are_not_kept(server, path):
+	(response, hits) = _twice("%s/%s-not-kept" % (server, path))
+	assert response.startswith("Status: 5")
+	assert hits == 2
+
+
+def test_deadline_is_not_kept(server):
+	(response, hits) = _twice(server + "/slow-not-kept", timeout = "0.3")
+	assert response.startswith("Status: 400")
+	assert "no-store" in response.partition("\n\n")[0]
+	# the retrieval timed out in both cases, i.e., the server saw both requests
+	time.sleep(1.5)
+	assert _hits["/slow-not-kept"] == 2
+
+
+def test_network_error_is_not_kept():
+	(response, hits) = _twice("http://127.0.0.1:9/unreachable")
+	assert response.startswith("Status: 400")
+	assert "no-store" in response.partition("\n\n")[0]
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the retrieval of the sources (see :py:class:`rdfa_md.pyrdfa.utils.URIOpener`), against a local stand-in server serving compressed, oversized, non markup, and slow responses.
+"""
+import os
+import gzip
+import time
+import zlib
+import threading
+
+try:
+	from http.server import HTTPServer, BaseHTTPRequestHandler
+	from socketserver import ThreadingMixIn
+except ImportError:
+	from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+	from SocketServer import ThreadingMixIn
+
+import pytest
+
+from rdfa_md.pyrdfa import FailedSource
+from rdfa_md.pyrdfa import utils
+from rdfa_md.pyrdfa.utils import URIOpener, Deadline
+from rdfa_md.pyrdfa.cachedir import using_cache_directory
+from rdfa_md.pyrdfa.host import MediaTypes
+from rdfa_md.rdfa_stream import stream_rdfa
+
+# The size limit set for the tests
+_limit = 64 * 1024
+
+_page = b'<html><body vocab="http://schema.org/"><p typeof="Person"><span property="name">Alice</span></p></body></html>'
+
+_svg  = b'<svg xmlns="http://www.w3.org/2000/svg" vocab="http://schema.org/">' + \
+		b"".join(b'<g typeof="ImageObject" resource="#g%d"><title property="name">Image %d</title></g>' % (i, i) for i in range(2000)) + \
+		b"</svg>"
+
+
+class _Handler(BaseHTTPRequestHandler):
+	def log_message(self, *args):
+		pass
+
+	def _send(self, content_type, body, encoding = None):
+		self.send_response(200)
+		self.send_header("Content-Type", content_type)
+		self.send_header("Cache-Control", "no-store")
+		if encoding:
+			self.send_header("Content-Encoding", encoding)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def do_GET(self):
+		if self.path == "/gzip":
+			self._send("text/html", gzip.compress(_page), "gzip")
+		elif self.path == "/deflate":
+			# raw deflate stream, without the zlib wrapper
+			encoder = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+			self._send("text/html", encoder.compress(_page) + encoder.flush(), "deflate")
+		elif self.path == "/bomb":
+			self._send("text/html", gzip.compress(b" " * (50 * _limit)), "gzip")
+		elif self.path == "/image":
+			self._send("image/png", b"\x89PNG" + b"\0" * 100)
+		elif self.path == "/big.svg":
+			self._send("image/svg+xml", _svg)
+		elif self.path == "/etag":
+			if self.headers.get("If-None-Match") == '"v1"':
+				self.send_response(304)
+				self.send_header("ETag", '"v1"')
+				self.end_headers()
+			else:
+				self.send_response(200)
+				self.send_header("Content-Type", "text/html")
+				self.send_header("Cache-Control", "no-cache")
+				self.send_header("ETag", '"v1"')
+				self.send_header("Content-Length", str(len(_page)))
+				self.end_headers()
+				self.wfile.write(_page)
+		elif self.path == "/slow":
+			self.send_response(200)
+			self.send_header("Content-Type", "text/html")
+			self.send_header("Cache-Control", "no-store")
+			self.end_headers()
+			for i in range(20):
+				self.wfile.write(b"<p>%d</p>" % i)
+				self.wfile.flush()
+				time.sleep(0.2)
+		else:
+			self.send_error(404)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+
+@pytest.fixture(scope = "module")
+def server():
+	httpd  = _Server(("127.0.0.1", 0), _Handler)
+	thread = threading.Thread(target = httpd.serve_forever)
+	thread.daemon = True
+	thread.start()
+	yield "http://127.0.0.1:%d" % httpd.server_address[1]
+	httpd.shutdown()
+
+
+@pytest.fixture(autouse = True)
+def environment(tmp_path, monkeypatch):
+	monkeypatch.setattr(utils, "max_source_size", _limit)
+	with using_cache_directory(str(tmp_path)):
+		yield str(tmp_path)
+
+
+def test_gzip(server):
+	assert URIOpener(server + "/gzip").data.read() == _page
+
+
+def test_raw_deflate(server):
+	assert URIOpener(server + "/deflate").data.read() == _page
+
+
+def test_compression_bomb(server):
+	opener = URIOpener(server + "/bomb")
+	with pytest.raises(FailedSource):
+		opener.data.read()
+
+
+def test_non_markup_content(server):
+	with pytest.raises(FailedSource):
+		URIOpener(server + "/image", markup_only = True)
+
+
+def test_slow_body(server):
+	opener = URIOpener(server + "/slow", deadline = Deadline(0.5))
+	start  = time.time()
+	with pytest.raises(FailedSource):
+		opener.data.read()
+	assert time.time() - start < 2
+
+
+def test_size_limit(server):
+	with pytest.raises(FailedSource):
+		URIOpener(server + "/big.svg")
+
+
+def test_streaming_is_not_limited(server):
+	triples = []
+	stream_rdfa(server + "/big.svg", sink = triples.append, media_type = MediaTypes.svg)
+	assert len(triples) > 2 * 2000
+
+
+def test_revalidation(server):
+	assert URIOpener(server + "/etag").data.read() == _page
+	opener = URIOpener(server + "/etag")
+	assert opener.from_cache and opener.data.read() == _page
+
+
+def test_revalidation_of_removed_content(server, environment):
+	URIOpener(server + "/etag").data.read()
+	directory = os.path.join(environment, "http")
+	for name in os.listdir(directory):
+		if name.endswith(".body"):
+			os.remove(os.path.join(directory, name))
+	opener = URIOpener(server + "/etag")
+	assert not opener.from_cache and opener.data.read() == _page
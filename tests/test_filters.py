@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the filtering of the extracted graphs by types, predicates, and depth (see :py:mod:`rdfa_md.filters`).
+"""
+from rdflib import Graph, URIRef, Literal, BNode, RDF
+
+from rdfa_md.api import ServiceOptions, rdfa_graph, microdata_graph
+from rdfa_md.filters import GraphFilter, expand_iri, parse_iri_list
+from rdfa_md.store import compact_graph
+
+_schema = "http://schema.org/"
+
+
+def _s(term):
+	return URIRef(_schema + term)
+
+
+def _graph():
+	# product -> offer -> seller -> address; an unrelated web page
+	graph = Graph()
+	(product, offer, seller, address, page) = (URIRef("http://example.org/product"), BNode(), BNode(), BNode(), URIRef("http://example.org/"))
+	graph.add((product, RDF.type, _s("Product")))
+	graph.add((product, _s("name"), Literal("Widget")))
+	graph.add((product, _s("offers"), offer))
+	graph.add((offer, RDF.type, _s("Offer")))
+	graph.add((offer, _s("price"), Literal("9.99")))
+	graph.add((offer, _s("seller"), seller))
+	graph.add((seller, _s("name"), Literal("Shop")))
+	graph.add((seller, _s("address"), address))
+	graph.add((address, _s("addressLocality"), Literal("Amsterdam")))
+	graph.add((page, RDF.type, _s("WebPage")))
+	graph.add((page, _s("name"), Literal("Home")))
+	return graph
+
+
+def _filtered(**kwargs):
+	return GraphFilter(**kwargs).filter(_graph(), compact_graph())
+
+
+def test_expand_iri():
+	assert expand_iri("Product") == _s("Product")
+	assert expand_iri("schema:Product") == _s("Product")
+	assert expand_iri("http://example.org/Thing") == URIRef("http://example.org/Thing")
+	assert parse_iri_list("Product, schema:Offer  WebPage") == frozenset([_s("Product"), _s("Offer"), _s("WebPage")])
+	assert parse_iri_list("") is None
+
+
+def test_inactive_filter():
+	assert not GraphFilter().active
+	assert len(GraphFilter().filter(_graph(), compact_graph())) == len(_graph())
+
+
+def test_types():
+	graph = _filtered(types = [_s("Product")])
+	# the full closure of the product, but not the web page
+	assert (URIRef("http://example.org/product"), _s("name"), Literal("Widget")) in graph
+	assert len(list(graph.triples((None, _s("addressLocality"), Literal("Amsterdam"))))) == 1
+	assert (None, None, Literal("Home")) not in graph
+	assert len(graph) == len(_graph()) - 2
+
+
+def test_depth():
+	literals = lambda graph: set(o for o in graph.objects() if isinstance(o, Literal))
+	assert literals(_filtered(types = [_s("Product")], depth = 0)) == set([Literal("Widget")])
+	assert literals(_filtered(types = [_s("Product")], depth = 1)) == set([Literal("Widget"), Literal("9.99")])
+	assert literals(_filtered(types = [_s("Product")], depth = 2)) == set([Literal("Widget"), Literal("9.99"), Literal("Shop")])
+	# a resource reached by several paths is visited once, at the shortest distance
+	assert len(_filtered(types = [_s("Product"), _s("Offer")], depth = 0)) == 6
+
+
+def test_predicates():
+	graph = _filtered(predicates = [_s("name")])
+	# the types are always kept
+	assert set(graph.predicates()) == set([_s("name"), RDF.type])
+	assert len(graph) == 6
+
+
+def test_types_and_predicates():
+	# only the kept predicates are followed: the offer is not reached
+	graph = _filtered(types = [_s("Product")], predicates = [_s("name"), _s("price")])
+	assert set(graph.objects(None, _s("name"))) == set([Literal("Widget")])
+	assert (None, _s("price"), None) not in graph
+
+
+def test_list_values_are_kept():
+	graph = Graph()
+	(subject, head) = (URIRef("http://example.org/book"), BNode())
+	graph.add((subject, RDF.type, _s("Book")))
+	graph.add((subject, _s("author"), head))
+	graph.add((head, RDF.first, Literal("Alice")))
+	graph.add((head, RDF.rest, RDF.nil))
+	filtered = GraphFilter(types = [_s("Book")], predicates = [_s("author")]).filter(graph, compact_graph())
+	assert len(filtered) == len(graph)
+
+
+def test_service_options():
+	page = (b'<html><body vocab="http://schema.org/">'
+			b'<div typeof="Product" resource="#p"><span property="name">Widget</span>'
+			b'<div property="offers" typeof="Offer"><span property="price">9.99</span></div></div>'
+			b'<div typeof="WebPage" resource="#w"><span property="name">Home</span></div></body></html>')
+	graph = rdfa_graph(page, ServiceOptions(media_type = "text/html", types = "Product", depth = 0)).graph
+	assert set(graph.objects(None, _s("name"))) == set([Literal("Widget")])
+	assert (None, _s("price"), None) not in graph
+	graph = rdfa_graph(page, ServiceOptions(media_type = "text/html", predicates = "schema:price")).graph
+	assert set(graph.predicates()) == set([_s("price"), RDF.type])
+
+	microdata = (b'<html><body><div itemscope itemtype="http://schema.org/Product"><span itemprop="name">Widget</span></div>'
+				 b'<div itemscope itemtype="http://schema.org/WebPage"><span itemprop="name">Home</span></div></body></html>')
+	graph = microdata_graph(microdata, ServiceOptions(types = "Product")).graph
+	assert set(graph.objects(None, _s("name"))) == set([Literal("Widget")])
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the size bound of the local HTTP cache (see :py:mod:`rdfa_md.pyrdfa.httpcache`).
+"""
+import os
+
+from rdfa_md.pyrdfa import httpcache
+from rdfa_md.pyrdfa.httpcache import HTTPCache
+
+_headers = [("Content-Type", "text/html"), ("Cache-Control", "max-age=3600")]
+
+
+def _total(cache):
+	with open(os.path.join(cache.directory, "total.size")) as f:
+		return int(f.read())
+
+
+def _store(cache, i, size = 100):
+	uri = "http://example.org/%d" % i
+	cache.store(uri, {}, uri, _headers, b"x" * size)
+	return uri
+
+
+def test_running_total(tmp_path):
+	cache = HTTPCache(str(tmp_path), max_size = 1000)
+	for i in range(5):
+		_store(cache, i)
+	assert _total(cache) == 500
+	# replacing a response does not count it twice
+	_store(cache, 0, 50)
+	assert _total(cache) == 450
+
+
+def test_no_scan_below_the_limit(tmp_path, monkeypatch):
+	cache = HTTPCache(str(tmp_path), max_size = 1000)
+	_store(cache, 0)
+	scans = []
+	listdir = os.listdir
+	monkeypatch.setattr(httpcache.os, "listdir", lambda path: scans.append(path) or listdir(path))
+	for i in range(1, 9):
+		_store(cache, i)
+	assert scans == []
+
+
+def test_least_recently_used_are_removed(tmp_path):
+	cache = HTTPCache(str(tmp_path), max_size = 1000)
+	uris  = [_store(cache, i) for i in range(10)]
+	# the order of use is set explicitly, the first response being the most recently used one
+	for (i, uri) in enumerate(uris):
+		used = 1000000 + (100 if i == 0 else i)
+		os.utime(os.path.join(cache.directory, cache._key(uri) + ".json"), (used, used))
+	_store(cache, 10)
+	assert _total(cache) <= 1000
+	assert cache.lookup(uris[0], {}) is not None
+	assert cache.lookup(uris[1], {}) is None
+	assert cache.lookup("http://example.org/10", {}) is not None
+	assert sum(1 for name in os.listdir(cache.directory) if name.endswith(".body")) * 100 == _total(cache)
+
+
+def test_lost_index(tmp_path):
+	cache = HTTPCache(str(tmp_path), max_size = 1000)
+	for i in range(3):
+		_store(cache, i)
+	os.remove(os.path.join(cache.directory, "total.size"))
+	_store(cache, 3)
+	assert _total(cache) == 400
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Hand-written cases, modelled on those of the `RDFa test suite <http://rdfa.info/test-suite/>`_ (HTML5, XHTML, SVG, RDFa 1.0 and 1.1, vocabulary expansion, lists, chaining), run on the RDFa processor of the package (see :py:mod:`rdfa_md.pyrdfa`): the output graph of each source is compared to the expected N-Triples. They are not the cases of the suite itself, which is not run here.
+"""
+import threading
+from io import BytesIO
+
+try:
+	from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+	from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+import pytest
+from rdflib import Graph
+from rdflib.compare import isomorphic, to_isomorphic, graph_diff
+
+from rdfa_md.pyrdfa import pyRdfa
+from rdfa_md.pyrdfa.options import Options
+from rdfa_md.pyrdfa.cachedir import using_cache_directory
+
+_base = "http://example.org/doc"
+
+_vocabulary = b"""
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix owl:  <http://www.w3.org/2002/07/owl#> .
+@prefix v:    <vocab#> .
+v:Child  rdfs:subClassOf v:Person .
+v:name   rdfs:subPropertyOf v:label .
+v:knows  owl:equivalentProperty v:acquaintance .
+"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+	def log_message(self, *args):
+		pass
+
+	def do_GET(self):
+		if self.path != "/vocab":
+			self.send_error(404)
+			return
+		self.send_response(200)
+		self.send_header("Content-Type", "text/turtle")
+		self.send_header("Cache-Control", "no-store")
+		self.send_header("Content-Length", str(len(_vocabulary)))
+		self.end_headers()
+		self.wfile.write(_vocabulary)
+
+
+@pytest.fixture(scope = "module")
+def vocab():
+	httpd  = HTTPServer(("127.0.0.1", 0), _Handler)
+	thread = threading.Thread(target = httpd.serve_forever)
+	thread.daemon = True
+	thread.start()
+	yield "http://127.0.0.1:%d/vocab#" % httpd.server_address[1]
+	httpd.shutdown()
+
+
+@pytest.fixture(autouse = True)
+def environment(tmp_path):
+	with using_cache_directory(str(tmp_path)):
+		yield
+
+
+def _check(source, media_type, expected, options = None):
+	processor = pyRdfa(options if options is not None else Options(), base = _base, media_type = media_type)
+	graph     = processor.graph_from_source(BytesIO(source))
+	reference = Graph().parse(data = expected, format = "nt")
+	if not isomorphic(graph, reference):
+		(common, missing, extra) = graph_diff(to_isomorphic(reference), to_isomorphic(graph))
+		pytest.fail("missing:\n%s\nextra:\n%s" % (missing.serialize(format = "nt"), extra.serialize(format = "nt")))
+
+
+def test_html5_literal():
+	_check(b"""<!DOCTYPE html>
+<html lang="en"><head><title>Test</title></head>
+<body>
+<p about="http://example.org/a" property="dc:title">Title</p>
+<p><a rel="dc:creator" href="http://example.org/me">me</a></p>
+<p about="http://example.org/a" property="dc:description" lang="">No language</p>
+</body></html>
+""", "text/html", """
+<http://example.org/a> <http://purl.org/dc/terms/title> "Title"@en .
+<http://example.org/a> <http://purl.org/dc/terms/description> "No language" .
+<http://example.org/doc> <http://purl.org/dc/terms/creator> <http://example.org/me> .
+""")
+
+
+def test_html5_typed_and_resources():
+	_check(b"""<!DOCTYPE html>
+<html><body prefix="ex: http://example.org/ns#">
+<div about="#s" typeof="ex:Thing">
+  <span property="ex:count" datatype="xsd:integer">3</span>
+  <span property="ex:seeAlso" resource="[ex:other]"></span>
+  <img property="ex:image" src="pic.png"/>
+</div>
+</body></html>
+""", "text/html", """
+<http://example.org/doc#s> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://example.org/ns#Thing> .
+<http://example.org/doc#s> <http://example.org/ns#count> "3"^^<http://www.w3.org/2001/XMLSchema#integer> .
+<http://example.org/doc#s> <http://example.org/ns#seeAlso> <http://example.org/ns#other> .
+<http://example.org/doc#s> <http://example.org/ns#image> <http://example.org/pic.png> .
+""")
+
+
+def test_xhtml_terms():
+	# the XHTML vocabulary terms are defined for XHTML+RDFa only, i.e., not for XHTML5
+	_check(b"""<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML+RDFa 1.1//EN" "http://www.w3.org/MarkUp/DTD/xhtml-rdfa-2.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:ex="http://example.org/ns#">
+<head><title>Test</title><link rel="next" href="page2"/></head>
+<body>
+<p about="#s" property="ex:p" xml:lang="de">Wert</p>
+</body>
+</html>
+""", "application/xhtml+xml", """
+<http://example.org/doc> <http://www.w3.org/1999/xhtml/vocab#next> <http://example.org/page2> .
+<http://example.org/doc#s> <http://example.org/ns#p> "Wert"@de .
+""")
+
+
+def test_svg():
+	_check(b"""<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" version="1.2" prefix="ex: http://example.org/ns#">
+  <rect about="#r" typeof="ex:Shape" property="ex:label" content="box" width="10" height="10"/>
+  <g about="#g" rel="ex:part" resource="#r"/>
+</svg>
+""", "image/svg+xml", """
+<http://example.org/doc#r> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://example.org/ns#Shape> .
+<http://example.org/doc#r> <http://example.org/ns#label> "box" .
+<http://example.org/doc#g> <http://example.org/ns#part> <http://example.org/doc#r> .
+""")
+
+
+_versioned = b"""<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML+RDFa %s//EN" "http://www.w3.org/MarkUp/DTD/xhtml-rdfa-%d.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:ex="http://example.org/ns#">
+<head><title>Test</title></head>
+<body>
+<p><a about="#a" property="ex:p" href="http://example.org/b">link</a></p>
+</body>
+</html>
+"""
+
+
+def test_rdfa_10():
+	# RDFa 1.0 (set by the doctype): @property always produces a literal
+	_check(_versioned % (b"1.0", 1), "application/xhtml+xml", """
+<http://example.org/doc#a> <http://example.org/ns#p> "link" .
+""")
+
+
+def test_rdfa_11():
+	# RDFa 1.1: @property with @href (and without @rel) produces a resource
+	_check(_versioned % (b"1.1", 2), "application/xhtml+xml", """
+<http://example.org/doc#a> <http://example.org/ns#p> <http://example.org/b> .
+""")
+
+
+def test_vocab_expansion(vocab):
+	source = """<!DOCTYPE html>
+<html><body vocab="%s">
+<div about="#x" typeof="Child">
+  <span property="name">X</span>
+  <a property="knows" href="#y">Y</a>
+</div>
+</body></html>
+""" % vocab
+	_check(source.encode("utf-8"), "text/html", """
+<http://example.org/doc> <http://www.w3.org/ns/rdfa#usesVocabulary> <%(v)s> .
+<http://example.org/doc#x> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <%(v)sChild> .
+<http://example.org/doc#x> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <%(v)sPerson> .
+<http://example.org/doc#x> <%(v)sname> "X" .
+<http://example.org/doc#x> <%(v)slabel> "X" .
+<http://example.org/doc#x> <%(v)sknows> <http://example.org/doc#y> .
+<http://example.org/doc#x> <%(v)sacquaintance> <http://example.org/doc#y> .
+""" % {"v" : vocab}, options = Options(vocab_expansion = True, vocab_cache = False))
+
+
+def test_inlist():
+	_check(b"""<!DOCTYPE html>
+<html><body prefix="ex: http://example.org/ns#">
+<div about="#s">
+  <span property="ex:list" inlist="">a</span>
+  <span property="ex:list" inlist="">b</span>
+  <a rel="ex:list" inlist="" href="#c">c</a>
+  <span rel="ex:empty" inlist=""></span>
+</div>
+</body></html>
+""", "text/html", """
+<http://example.org/doc#s> <http://example.org/ns#list> _:l1 .
+_:l1 <http://www.w3.org/1999/02/22-rdf-syntax-ns#first> "a" .
+_:l1 <http://www.w3.org/1999/02/22-rdf-syntax-ns#rest> _:l2 .
+_:l2 <http://www.w3.org/1999/02/22-rdf-syntax-ns#first> "b" .
+_:l2 <http://www.w3.org/1999/02/22-rdf-syntax-ns#rest> _:l3 .
+_:l3 <http://www.w3.org/1999/02/22-rdf-syntax-ns#first> <http://example.org/doc#c> .
+_:l3 <http://www.w3.org/1999/02/22-rdf-syntax-ns#rest> <http://www.w3.org/1999/02/22-rdf-syntax-ns#nil> .
+<http://example.org/doc#s> <http://example.org/ns#empty> <http://www.w3.org/1999/02/22-rdf-syntax-ns#nil> .
+""")
+
+
+def test_chaining():
+	_check(b"""<!DOCTYPE html>
+<html><body prefix="ex: http://example.org/ns#">
+<div about="#a" rel="ex:knows">
+  <div about="#b"><span property="ex:name">B</span></div>
+  <div typeof="ex:Person"><span property="ex:name">Bob</span></div>
+</div>
+<div about="#a" rev="ex:knownBy" resource="#c"></div>
+</body></html>
+""", "text/html", """
+<http://example.org/doc#a> <http://example.org/ns#knows> <http://example.org/doc#b> .
+<http://example.org/doc#b> <http://example.org/ns#name> "B" .
+<http://example.org/doc#a> <http://example.org/ns#knows> _:p .
+_:p <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://example.org/ns#Person> .
+_:p <http://example.org/ns#name> "Bob" .
+<http://example.org/doc#c> <http://example.org/ns#knownBy> <http://example.org/doc#a> .
+""")
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the streaming RDFa processor (see :py:mod:`rdfa_md.rdfa_stream`): for the XML host languages it must generate the same graph as the DOM based processor, XML Literals included.
+"""
+import pytest
+from rdflib import URIRef, Literal, RDF
+from rdflib.compare import isomorphic
+
+from rdfa_md.api import ServiceOptions, rdfa_graph
+from rdfa_md.pyrdfa.host import MediaTypes
+
+_ex = "http://example.org/"
+
+_xml = b'''<?xml version="1.0"?>
+<doc xmlns="http://example.org/doc" xmlns:ex="http://example.org/" prefix="ex: http://example.org/" about="http://example.org/doc">
+	<title property="ex:title" datatype="rdf:XMLLiteral">A <b xmlns:ex="http://example.org/b" ex:x="a &quot;b&quot;">bold</b> <i/> &amp; q &gt; <![CDATA[<c>]]></title>
+	<authors>
+		<name property="ex:author" inlist="">Alice</name>
+		<name property="ex:author" inlist="">Bob</name>
+		<ref rel="ex:cites" inlist="" resource="http://example.org/other"/>
+	</authors>
+	<section rel="ex:part">
+		<part typeof="ex:Part"><label property="ex:label" xml:lang="en">First</label></part>
+		<part about="http://example.org/part2" rel="ex:next"><item resource="http://example.org/part3" typeof="ex:Part"/></part>
+	</section>
+</doc>
+'''
+
+_svg = b'''<?xml version="1.0"?>
+<svg xmlns="http://www.w3.org/2000/svg" xmlns:dc="http://purl.org/dc/terms/" vocab="http://schema.org/">
+	<g typeof="ImageObject" resource="#logo">
+		<title property="name">Logo</title>
+		<desc property="description" datatype="rdf:XMLLiteral">The <tspan font-weight="bold" xmlns:ex="http://example.org/">W3C</tspan> logo<br/></desc>
+		<metadata rel="keywords" inlist=""><k property="keywords" inlist="">one</k><k property="keywords" inlist="">two</k></metadata>
+		<a rel="author"><g typeof="Person"><text property="name">Designer</text></g></a>
+	</g>
+</svg>
+'''
+
+_atom = b'''<?xml version="1.0"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:xhtml="http://www.w3.org/1999/xhtml" prefix="dc: http://purl.org/dc/terms/">
+	<title property="dc:title">Feed</title>
+	<id>http://example.org/feed</id>
+	<entry about="http://example.org/entry1" rel="dc:creator">
+		<title property="dc:title">Entry</title>
+		<author typeof="foaf:Person"><name property="foaf:name">Carol</name></author>
+		<content type="xhtml" property="dc:description" datatype="rdf:XMLLiteral"><xhtml:div><xhtml:p class="x">Text</xhtml:p></xhtml:div></content>
+	</entry>
+</feed>
+'''
+
+
+def _graphs(source, media_type):
+	return [rdfa_graph(source, ServiceOptions(media_type = media_type, streaming = streaming), base = "http://example.org/").graph for streaming in (False, True)]
+
+
+def _xml_literals(graph):
+	return sorted(o for o in graph.objects() if isinstance(o, Literal) and o.datatype == RDF.XMLLiteral)
+
+
+@pytest.mark.parametrize("source, media_type", [(_xml, MediaTypes.xml), (_svg, MediaTypes.svg), (_atom, MediaTypes.atom)], ids = ["xml", "svg", "atom"])
+def test_same_graph_as_dom(source, media_type):
+	(dom, stream) = _graphs(source, media_type)
+	assert len(dom) > 0
+	assert isomorphic(dom, stream)
+	# the literals are compared on their lexical forms, too
+	assert [str(o) for o in _xml_literals(dom)] == [str(o) for o in _xml_literals(stream)]
+	assert len(_xml_literals(dom)) == 1
+
+
+def test_xml_literal_markup():
+	(dom, stream) = _graphs(_xml, MediaTypes.xml)
+	literal = str(_xml_literals(stream)[0])
+	# the namespace declarations first, the default namespace before the prefixes
+	assert literal.startswith('A <b xmlns="http://example.org/doc" xmlns:ex="http://example.org/b" ex:x="a &quot;b&quot;">bold</b>')
+	assert '<i xmlns="http://example.org/doc" xmlns:ex="http://example.org/"/>' in literal
+	assert literal.endswith("&amp; q &gt; &lt;c&gt;")
+
+
+def test_lists_and_chaining():
+	(doc, part2, part3) = (URIRef("http://example.org/doc"), URIRef("http://example.org/part2"), URIRef("http://example.org/part3"))
+	for graph in _graphs(_xml, MediaTypes.xml):
+		assert list(graph.items(graph.value(doc, URIRef(_ex + "author")))) == [Literal("Alice"), Literal("Bob")]
+		assert list(graph.items(graph.value(doc, URIRef(_ex + "cites")))) == [URIRef(_ex + "other")]
+		# the incomplete triples of the section are completed by the typed part and by the part with a subject
+		parts = set(graph.objects(doc, URIRef(_ex + "part")))
+		assert len(parts) == 2 and part2 in parts
+		assert (parts - set([part2])).pop() in set(graph.subjects(RDF.type, URIRef(_ex + "Part")))
+		assert (part2, URIRef(_ex + "next"), part3) in graph
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the serializers of the package (see :py:mod:`rdfa_md.serializers`): the serializations must be read back, by the ``RDFLib`` parsers, into the same graph.
+"""
+import re
+import json
+
+import pytest
+from rdflib import Graph, URIRef, Literal, BNode, RDF, XSD
+from rdflib.compare import isomorphic
+
+from rdfa_md.serializers import serialize, serialize_turtle, TurtleWriter
+from rdfa_md.store import compact_graph
+
+_schema = "http://schema.org/"
+
+_formats = {
+	"nt"          : "nt",
+	"turtle-fast" : "turtle",
+	"xml"         : "xml",
+	"json-ld"     : "json-ld",
+}
+
+
+@pytest.fixture(scope = "module")
+def graph():
+	graph = compact_graph()
+	graph.bind("schema", _schema)
+	for i in range(50):
+		product, offer = BNode(), BNode()
+		graph.add((product, RDF.type, URIRef(_schema + "Product")))
+		graph.add((product, URIRef(_schema + "name"), Literal("Product <\"%d\">\n\\ é" % i, lang = "en")))
+		graph.add((product, URIRef(_schema + "sku"), Literal("sku-%d" % i)))
+		graph.add((product, URIRef(_schema + "url"), URIRef("http://example.org/product/%d" % i)))
+		graph.add((product, URIRef(_schema + "offers"), offer))
+		graph.add((offer, URIRef(_schema + "price"), Literal(i * 1.5)))
+		graph.add((offer, URIRef(_schema + "availability"), URIRef(_schema + "InStock")))
+		graph.add((offer, URIRef(_schema + "validFrom"), Literal("2020-01-%02d" % (i % 28 + 1), datatype = XSD.date)))
+	graph.add((URIRef("http://example.org/shop"), URIRef("http://example.org/vocab#rating"), Literal(5)))
+	return graph
+
+
+@pytest.mark.parametrize("output_format", sorted(_formats))
+def test_round_trip(graph, output_format):
+	result = Graph().parse(data = serialize(graph, output_format), format = _formats[output_format])
+	assert isomorphic(result, graph)
+
+
+def test_ntriples_as_rdflib(graph):
+	# the same lines as the RDFLib plugin (the blank node labels aside)
+	plain = Graph()
+	for triple in graph:
+		plain.add(triple)
+	assert sorted(serialize(graph, "nt").splitlines()) == sorted(line for line in plain.serialize(format = "nt").splitlines() if line)
+
+
+def test_turtle_is_written_while_the_graph_is_read(graph, monkeypatch):
+	monkeypatch.setattr(TurtleWriter, "buffer_statements", 10)
+	writes = []
+	class _Output(object):
+		def write(self, data):
+			writes.append(data)
+	serialize_turtle(graph, _Output())
+	assert len(writes) > 5
+	assert isomorphic(Graph().parse(data = "".join(writes), format = "turtle"), graph)
+	# the prefix is declared before its first use
+	text   = "".join(writes)
+	prefix = re.search(r"^@prefix (\w+): <%s> \.$" % _schema, text, re.MULTILINE)
+	assert prefix.start() < text.index(" %s:" % prefix.group(1))
+
+
+def test_jsonld_node_per_subject():
+	graph    = compact_graph()
+	products = [URIRef("http://example.org/product/%d" % i) for i in range(3)]
+	# the triples of each product are not consecutive in the graph
+	for p in (URIRef(_schema + "name"), URIRef(_schema + "sku"), RDF.type):
+		for (i, product) in enumerate(products):
+			graph.add((product, p, URIRef(_schema + "Product") if p == RDF.type else Literal("%s %d" % (p, i))))
+	nodes = json.loads(serialize(graph, "json-ld"))["@graph"]
+	assert sorted(node["@id"] for node in nodes) == sorted(str(product) for product in products)
+	assert all(sorted(node) == ["@id", "@type", "name", "sku"] for node in nodes)
+	assert isomorphic(Graph().parse(data = serialize(graph, "json-ld"), format = "json-ld"), graph)
+
+
+def test_jsonld_lexical_forms():
+	subject = URIRef("http://example.org/x")
+	values  = [
+		Literal("007", datatype = XSD.integer, normalize = False),
+		Literal("+7", datatype = XSD.integer, normalize = False),
+		Literal("-12", datatype = XSD.integer),
+		Literal("text", datatype = XSD.string),
+		Literal("plain"),
+		Literal(True),
+	]
+	graph = compact_graph()
+	for (i, value) in enumerate(values):
+		graph.add((subject, URIRef("http://example.org/p%d" % i), value))
+	node = json.loads(serialize(graph, "json-ld"))["@graph"][0]
+	assert node["http://example.org/p0"] == {"@value" : "007", "@type" : "xsd:integer"}
+	assert node["http://example.org/p1"] == {"@value" : "+7", "@type" : "xsd:integer"}
+	assert node["http://example.org/p2"] == -12
+	assert node["http://example.org/p3"] == {"@value" : "text", "@type" : "xsd:string"}
+	assert node["http://example.org/p4"] == "plain" and node["http://example.org/p5"] is True
+	# (the RDFLib parser normalizes the integers again, but keeps the datatype of the string)
+	result = Graph().parse(data = serialize(graph, "json-ld"), format = "json-ld")
+	assert len(result) == len(values)
+	assert (subject, URIRef("http://example.org/p3"), Literal("text", datatype = XSD.string)) in result
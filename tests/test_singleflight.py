@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the coalescing of identical requests across processes (see :py:mod:`rdfa_md.singleflight`).
+"""
+import os
+import time
+import multiprocessing
+
+import pytest
+
+from rdfa_md import singleflight
+from rdfa_md.singleflight import coalesce
+from rdfa_md.pyrdfa.utils import Deadline
+
+pytestmark = pytest.mark.skipif(singleflight.fcntl is None, reason = "the coordination of processes relies on fcntl")
+
+_key       = "a" * 40
+_other_key = "b" * 40
+
+
+def _request(key, results, hold = 0, budget = None):
+	start  = time.time()
+	result = coalesce(key, lambda: time.sleep(hold) or "%d" % os.getpid(), Deadline(budget) if budget is not None else None)
+	results.put((os.getpid(), result, time.time() - start))
+
+
+@pytest.fixture
+def context(tmp_path, monkeypatch):
+	# the children are forked, i.e., they inherit the environment
+	monkeypatch.setenv("PyRdfaCacheDir", str(tmp_path))
+	return multiprocessing.get_context("fork")
+
+
+def _run(context, *requests):
+	"""Start the requests (argument tuples of :py:func:`_request`) a short time after one another; return the outcomes, keyed by the process ids, in the order of the requests"""
+	results   = context.Queue()
+	processes = []
+	for args in requests:
+		processes.append(context.Process(target = _request, args = (args[0], results) + args[1:]))
+		processes[-1].start()
+		time.sleep(0.3)
+	for process in processes:
+		process.join(30)
+	outcomes = dict((pid, (result, elapsed)) for (pid, result, elapsed) in [results.get(timeout = 5) for process in processes])
+	return [outcomes[process.pid] for process in processes]
+
+
+def test_identical_requests_share_the_result(context):
+	(leader, follower) = _run(context, (_key, 1.5), (_key,))
+	assert follower[0] == leader[0]
+
+
+def test_unrelated_requests_do_not_wait(context):
+	(first, second) = _run(context, (_key, 2.0), (_other_key,))
+	assert second[1] < 0.5
+
+
+def test_wait_is_bounded_by_the_budget(context):
+	(leader, follower) = _run(context, (_key, 3.0), (_key, 0, 0.5))
+	assert follower[0] != leader[0]
+	assert follower[1] < 1.5
+
+
+def test_sweep_removes_unused_lock_files(tmp_path, monkeypatch):
+	directory = str(tmp_path)
+	old       = time.time() - 2 * singleflight.result_lifetime
+	paths     = [os.path.join(directory, name) for name in ("%s.lock" % _key, "%s.lock" % _other_key, "%s.result" % _key)]
+	for path in paths:
+		open(path, "w").close()
+		os.utime(path, (old, old))
+	monkeypatch.setattr(singleflight, "_last_sweep", [0])
+	with open(paths[1], "a") as lock:
+		singleflight.fcntl.flock(lock, singleflight.fcntl.LOCK_EX)
+		singleflight._sweep(directory)
+	assert [os.path.exists(path) for path in paths] == [False, True, False]
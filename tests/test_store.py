@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the compact store of the extraction results (see :py:mod:`rdfa_md.store`).
+"""
+import tracemalloc
+
+from rdflib import Graph, URIRef, Literal, BNode
+
+from rdfa_md.store import compact_graph
+
+_ex = "http://example.org/"
+
+
+def _triples(count):
+	predicates = [URIRef(_ex + p) for p in ("name", "price", "url", "description", "sku")]
+	retval = []
+	for i in range(count):
+		subject = BNode()
+		retval.extend((subject, p, Literal("%s %d" % (p, i))) for p in predicates)
+	return retval
+
+
+def test_same_content_as_the_default_store():
+	triples = _triples(100)
+	(compact, default) = (compact_graph(), Graph())
+	for graph in (compact, default):
+		for t in triples + triples[:10]:
+			graph.add(t)
+	assert len(compact) == len(default) == len(triples)
+	assert set(compact) == set(default)
+	(s, p, o) = triples[7]
+	for pattern in ((s, None, None), (None, p, None), (None, None, o), (s, p, None), (None, p, o), (s, p, o)):
+		assert set(compact.triples(pattern)) == set(default.triples(pattern))
+
+
+def test_remove():
+	triples = _triples(100)
+	graph   = compact_graph()
+	for t in triples:
+		graph.add(t)
+	# more than half of the rows, i.e., the columns are also compacted
+	for t in triples[:300]:
+		graph.remove(t)
+	graph.remove((triples[300][0], None, None))
+	remaining = set(triples[305:])
+	assert set(graph) == remaining and len(graph) == len(remaining)
+	assert set(graph.triples((None, triples[400][1], None))) == set(t for t in remaining if t[1] == triples[400][1])
+	graph.add(triples[0])
+	assert triples[0] in graph
+
+
+def test_memory_footprint():
+	triples = _triples(2000)
+	sizes   = []
+	for factory in (Graph, compact_graph):
+		graph = factory()
+		tracemalloc.start()
+		for t in triples:
+			graph.add(t)
+		sizes.append(tracemalloc.get_traced_memory()[0])
+		tracemalloc.stop()
+	assert sizes[1] < sizes[0] / 2
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the reading of WARC archives (see :py:mod:`rdfa_md.warc`), and of their processing by the bulk extraction (see :py:mod:`rdfa_md.bulk`).
+"""
+import os
+import gzip
+import zlib
+
+import pytest
+
+from rdfa_md.warc import open_archive, read_records, http_head, http_payload, _dechunk
+from rdfa_md.bulk import run, status_log_name
+
+_page = b'<html><body vocab="http://schema.org/"><div typeof="Product"><span property="name">Widget</span></div></body></html>'
+
+
+def _record(number, block, record_type = "response", uri = None):
+	uri     = "http://example.org/page%d" % number if uri is None else uri
+	headers = [b"WARC/1.0", b"WARC-Type: " + record_type.encode(), b"WARC-Record-ID: <urn:uuid:%d>" % number]
+	if uri:
+		headers.append(b"WARC-Target-URI: " + uri.encode())
+	headers.append(b"Content-Length: %d" % len(block))
+	return b"\r\n".join(headers) + b"\r\n\r\n" + block + b"\r\n\r\n"
+
+
+def _response(body, status = "200 OK", content_type = "text/html", extra = b""):
+	return (b"HTTP/1.1 " + status.encode() + b"\r\nContent-Type: " + content_type.encode() + b"\r\n" + extra + b"\r\n") + body
+
+
+def _chunked(body, size = 10):
+	chunks = [body[i:i + size] for i in range(0, len(body), size)]
+	return b"".join(b"%x;ext=1\r\n%s\r\n" % (len(chunk), chunk) for chunk in chunks) + b"0\r\n\r\n"
+
+
+def _deflate(body, wbits):
+	encoder = zlib.compressobj(6, zlib.DEFLATED, wbits)
+	return encoder.compress(body) + encoder.flush()
+
+
+def test_dechunk():
+	assert _dechunk(_chunked(_page)) == _page
+	assert _dechunk(_chunked(_page, 1000)) == _page
+	# some crawlers store the decoded body, with the header of the original response
+	assert _dechunk(_page) == _page
+
+
+@pytest.mark.parametrize("encoding, wbits", [("gzip", 31), ("x-gzip", 31), ("deflate", 15), ("deflate", -15)], ids = ["gzip", "x-gzip", "deflate", "raw deflate"])
+def test_payload_encodings(encoding, wbits):
+	block = _response(_deflate(_page, wbits), extra = b"Content-Encoding: " + encoding.encode() + b"\r\n")
+	(status, headers, offset) = http_head(block)
+	assert status == 200
+	assert http_payload(block, headers, offset) == _page
+	# the transfer encoding is removed before the content encoding
+	block = _response(_chunked(_deflate(_page, wbits)), extra = b"Content-Encoding: " + encoding.encode() + b"\r\nTransfer-Encoding: chunked\r\n")
+	(status, headers, offset) = http_head(block)
+	assert http_payload(block, headers, offset) == _page
+
+
+def test_payload_errors():
+	for (body, extra) in ((b"not compressed", b"Content-Encoding: gzip\r\n"), (_page, b"Content-Encoding: br\r\n")):
+		block = _response(body, extra = extra)
+		(status, headers, offset) = http_head(block)
+		with pytest.raises(ValueError):
+			http_payload(block, headers, offset)
+	block = _response(_deflate(_page, 31), extra = b"Content-Encoding: gzip\r\n")
+	(status, headers, offset) = http_head(block)
+	with pytest.raises(ValueError):
+		http_payload(block, headers, offset, max_size = 10)
+	with pytest.raises(ValueError):
+		http_head(b"GET / HTTP/1.1\r\n\r\n")
+
+
+def _archive(path, compressed):
+	records = [
+		_record(1, _response(_page)),
+		_record(2, b"GET /page2 HTTP/1.1\r\nHost: example.org\r\n\r\n", record_type = "request"),
+		_record(3, _response(b"Not found", status = "404 Not Found")),
+		_record(4, _response(b"\x89PNG", content_type = "image/png")),
+		_record(5, _response(_page), uri = ""),
+		_record(6, b"not an HTTP response"),
+		_record(7, _response(_chunked(_deflate(_page, 31)), extra = b"Content-Encoding: gzip\r\nTransfer-Encoding: chunked\r\n")),
+	]
+	if compressed:
+		# a gzip member per record, as usual
+		with open(path, "wb") as f:
+			for record in records:
+				f.write(gzip.compress(record))
+	else:
+		with open(path, "wb") as f:
+			f.write(b"".join(records))
+	return path
+
+
+@pytest.mark.parametrize("compressed", [False, True], ids = ["warc", "warc.gz"])
+def test_read_records(tmp_path, compressed):
+	path   = _archive(str(tmp_path / ("crawl.warc.gz" if compressed else "crawl.warc")), compressed)
+	stream = open_archive(path)
+	try:
+		records = list(read_records(stream, path, max_size = 100))
+	finally:
+		stream.close()
+	assert [record.type for record in records] == ["response", "request"] + ["response"] * 5
+	assert records[0].target_uri == "http://example.org/page1" and records[0].record_id == "<urn:uuid:1>"
+	# the blocks of the other types, and of the records that are too large, are not read
+	assert records[1].block is None
+	responses = [record for record in records if record.type == "response"]
+	assert [record.block is None for record in responses] == [record.length > 100 for record in responses]
+	assert any(record.block is None for record in responses) and any(record.block is not None for record in responses)
+
+
+def test_skip_reasons(tmp_path):
+	path   = _archive(str(tmp_path / "crawl.warc.gz"), True)
+	output = str(tmp_path / "output")
+	statistics = run([path], output, jobs = 1)
+	assert (statistics.documents, statistics.skipped, statistics.errors) == (2, 4, 0)
+	with open(os.path.join(output, status_log_name)) as f:
+		status = dict((line.split("\t")[0].split("#")[1], line.rstrip("\n").split("\t")[2:]) for line in f)
+	assert status == {
+		"<urn:uuid:1>" : ["ok", "3", ""],
+		"<urn:uuid:3>" : ["skipped", "0", "HTTP status 404"],
+		"<urn:uuid:4>" : ["skipped", "0", "content type image/png"],
+		"<urn:uuid:5>" : ["skipped", "0", "no target URI"],
+		"<urn:uuid:6>" : ["skipped", "0", "not an HTTP response"],
+		"<urn:uuid:7>" : ["ok", "3", ""],
+	}